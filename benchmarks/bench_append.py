@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+# --------------------------------------------------------------------------------- #
+# "LMT opacity library". Benchmark of the appended lines
+# A synthetic 2013-2020 archive gets one more hour of lines at a time, as a
+# radiometer writing to it. Every hour is taken by tau_lmt.append (binary
+# cache and statistics cube updated), against parsing the whole file again.
+# The appended data is checked against a full load at the end.
+#
+# Usage: python -m benchmarks.bench_append [appends]
+#
+# --------------------------------------------------------------------------------- #
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+import numpy as np
+
+from tau_lmt import tau_lmt
+from benchmarks.synthetic import synthetic_tau, tau_lines
+
+
+def main(appends=48):
+    n_points = int((2020-2013)*365.25*1440)
+    date, tau = synthetic_tau(n_points + 60*appends)
+    tmp_dir = tempfile.mkdtemp()
+    path = os.path.join(tmp_dir, 'tau.csv')
+    with open(path, 'wb') as f:
+        f.write(tau_lines(date[:n_points], tau[:n_points]))
+
+    data = tau_lmt(path)
+    data.get_cube()
+    print('Samples: '+str(data.n_points))
+
+    elapsed = []
+    for i in range(n_points, n_points + 60*appends, 60):
+        with open(path, 'ab') as f:
+            f.write(tau_lines(date[i:i+60], tau[i:i+60]))
+        t0 = time.perf_counter()
+        data.append()
+        elapsed.append(time.perf_counter() - t0)
+    print('Append of one hour (60 lines, cache and cube): '+'{:.1f}'.format(1e3*np.median(elapsed))+' ms median, '+
+          '{:.1f}'.format(1e3*np.max(elapsed))+' ms max')
+
+    t0 = time.perf_counter()
+    full = tau_lmt(path, cache=False)
+    print('Whole file parsed again: '+'{:.2f}'.format(time.perf_counter()-t0)+' s')
+
+    same = np.array_equal(data.timestamps, full.timestamps) and np.array_equal(data.raw_data['Tau'].values, full.raw_data['Tau'].values)
+    same &= np.array_equal(data.get_cube().summary.count, full.get_cube().summary.count)
+    print('Appended rows '+('equal to' if same else 'DIFFERENT from')+' the full load')
+
+    shutil.rmtree(tmp_dir)
+    if not same:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+# --------------------------------------------------------------------------------- #
+# "LMT opacity library". Benchmark of the compact samples
+# Memory per million rows of raw_data and of filtered samples, dataframes
+# vs compact samples (see tau_compact), over a synthetic archive. The memory
+# kept by every instance and sample is traced once it is built, the memory
+# maps of the binary cache are not counted (they are shared pages).
+#
+# Usage: python -m benchmarks.bench_compact [n_points]
+#
+# --------------------------------------------------------------------------------- #
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import tracemalloc
+
+from tau_lmt import tau_lmt
+from benchmarks.synthetic import write_synthetic_csv
+
+
+def traced(function):
+    """
+        Result of a function, the bytes it keeps allocated and the time
+    """
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - t0
+    kept = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    return result, kept, elapsed
+
+
+def main(n_points=3600000):
+    tmp_dir = tempfile.mkdtemp()
+    path = os.path.join(tmp_dir, 'tau.csv')
+    write_synthetic_csv(path, n_points)
+
+    # Binary cache written once
+    tau_lmt(path)
+
+    for compact in [False, True]:
+        name = 'compact' if compact else 'dataframe'
+        # Without the binary cache every column lives in memory, with it
+        # the columns are memory maps of the cache
+        for cache in [False, True]:
+            tau, kept, _ = traced(lambda: tau_lmt(path, cache=cache, compact=compact))
+            print(name+' instance, '+('cache' if cache else 'no cache')+': '+
+                  '{:.1f}'.format(kept/tau.n_points)+' MB per million rows')
+        data = tau.raw_data
+        data_bytes = data.nbytes if compact else data.memory_usage(index=True).sum()
+        print(name+' raw_data: '+'{:.1f}'.format(data_bytes/tau.n_points)+' MB per million rows')
+
+        for chain in ['-hr 19-6', '-yr 2016 -mn 1-6']:
+            sample, kept, elapsed = traced(lambda: tau.filter(tau.raw_data, chain))
+            print(name+' '+chain+': '+'{:.1f}'.format(kept/len(sample))+' MB per million rows, '+
+                  str(len(sample))+' rows, '+'{:.3f}'.format(elapsed)+' s')
+
+        stats, _, elapsed = traced(lambda: tau.statistics_sample(sample, '-dy 1'))
+        print(name+' statistics -dy 1: '+'{:.3f}'.format(elapsed)+' s')
+        del tau, data, sample
+
+    shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+# --------------------------------------------------------------------------------- #
+# "LMT opacity library". Benchmark of the statistics cube
+# Month x hour quartiles of one year (12 x 24 queries, -yr 1 groups) from the
+# cube and scanning the filtered samples, over a synthetic 2013-2020 archive.
+#
+# Usage: python -m benchmarks.bench_cube [cadence_seconds]
+#
+# --------------------------------------------------------------------------------- #
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+import numpy as np
+
+from tau_lmt import tau_lmt, STAT_COLUMNS
+from benchmarks.synthetic import write_synthetic_csv
+
+
+YEAR = 2016
+
+
+def month_hour(tau, cube):
+    """
+        Statistics of every month and hour of YEAR
+        Parameters
+        ----------
+        tau : tau_lmt
+            Tau object
+        cube : boolean
+            Answer from the cube, or from the filtered samples
+        ----------
+    """
+    stats = []
+    for mn in range(1, 13):
+        for hr in range(24):
+            chain = '-yr '+str(YEAR)+' -mn '+str(mn)+' -hr '+str(hr)
+            sample = chain if cube else tau.filter(tau.raw_data, chain)
+            stats.append(tau.statistics_sample(sample, '-yr 1', quantiles='sketch')[STAT_COLUMNS[1:]].values)
+
+    return np.concatenate(stats)
+
+
+def main(cadence=60):
+    n_points = int((2020-2013)*365.25*86400/cadence)
+    tmp_dir = tempfile.mkdtemp()
+    path = os.path.join(tmp_dir, 'tau.csv')
+    write_synthetic_csv(path, n_points, cadence=cadence)
+
+    tau = tau_lmt(path)
+    print('Samples: '+str(tau.n_points))
+
+    t0 = time.perf_counter()
+    tau.get_cube()
+    print('Cube built: '+'{:.2f}'.format(time.perf_counter()-t0)+' s, '+str(len(tau.cube.hours))+' cells')
+    tau.cube = None
+    t0 = time.perf_counter()
+    tau.get_cube()
+    print('Cube loaded: '+'{:.3f}'.format(time.perf_counter()-t0)+' s')
+
+    t0 = time.perf_counter()
+    scan = month_hour(tau, False)
+    t1 = time.perf_counter()
+    cube = month_hour(tau, True)
+    t2 = time.perf_counter()
+
+    print('Month x hour, '+str(YEAR)+': scan '+'{:.2f}'.format(t1-t0)+' s, cube '+'{:.2f}'.format(t2-t1)+
+          ' s ('+'{:.1f}'.format(1000*(t2-t1)/len(cube))+' ms per query), same: '+str(np.allclose(scan, cube, equal_nan=True)))
+
+    shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+# --------------------------------------------------------------------------------- #
+# "LMT opacity library". Benchmark of the filters
+# Runs the filter calls of the former tau_per_year_night.py (8 years x 12
+# months, up to 3 calls per month) over a synthetic 2013-2020 archive, and
+# the same windows with window_statistics, in a single pass.
+#
+# Usage: python -m benchmarks.bench_filter [cadence_seconds]
+#
+# --------------------------------------------------------------------------------- #
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+from tau_lmt import tau_lmt, seasonal_windows
+from benchmarks.synthetic import write_synthetic_csv
+from benchmarks.workloads import per_year_filters, NIGHT_HOURS, NIGHT_30MIN
+
+
+def main(cadence=60):
+    n_points = int((2020-2013)*365.25*86400/cadence)
+    tmp_dir = tempfile.mkdtemp()
+    path = os.path.join(tmp_dir, 'tau.csv')
+    write_synthetic_csv(path, n_points, cadence=cadence)
+
+    tau = tau_lmt(path)
+    print('Samples: '+str(tau.n_points))
+
+    t0 = time.perf_counter()
+    samples = per_year_filters(tau)
+    print('Night workload filters: '+'{:.2f}'.format(time.perf_counter()-t0)+' s, '+
+          str(sum([len(sample.index) for sample in samples]))+' rows selected')
+
+    t0 = time.perf_counter()
+    stats = tau.window_statistics(seasonal_windows(NIGHT_HOURS, NIGHT_30MIN))
+    print('Night windows statistics: '+'{:.2f}'.format(time.perf_counter()-t0)+' s, '+
+          str(int(stats['tau_count'].sum()))+' rows selected')
+
+    shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+# --------------------------------------------------------------------------------- #
+# "LMT opacity library". Benchmark of the import time
+# Import time of tau_lmt alone (filters and statistics) and with the
+# plotting layer (tau_plot, matplotlib), as reported by python -X importtime.
+# Every import runs in a new interpreter, the best of some runs is kept.
+#
+# Usage: python -m benchmarks.bench_import [runs]
+#
+# --------------------------------------------------------------------------------- #
+
+import os
+import sys
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_time(statement):
+    """
+        Cumulative import times of the modules imported by a statement
+        Parameters
+        ----------
+        statement : string
+            Python statement, as 'import tau_lmt'
+        ----------
+        Returns a dictionary of microseconds per top level module, and
+        the set of all the imported modules
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement], cwd=ROOT,
+                            stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    times = {}
+    modules = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        # The imported modules are indented two spaces per level
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not cumulative.strip().isdigit():
+            continue
+        modules.add(name.strip())
+        if not name[1:].startswith(' '):
+            times[name.strip()] = int(cumulative)
+
+    return times, modules
+
+
+def main(runs=5):
+    for statement in ['import tau_lmt', 'import tau_lmt, tau_plot']:
+        best = None
+        for _ in range(runs):
+            times, modules = import_time(statement)
+            if best is None or sum(times.values()) < best:
+                best = sum(times.values())
+        print(statement+': '+'{:.0f}'.format(best/1e3)+' ms, matplotlib '+
+              ('imported' if 'matplotlib' in modules else 'not imported'))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+# --------------------------------------------------------------------------------- #
+# "LMT opacity library". Benchmark of the astronomical nights
+# Filters a synthetic 2013-2020 archive by the nights between twilights
+# (-ng sun, civil, nautical, astro) and by the fixed hours of the night (-ng),
+# and checks the masks against the dusk and dawn computed for every row.
+#
+# Usage: python -m benchmarks.bench_night [cadence_seconds]
+#
+# --------------------------------------------------------------------------------- #
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+import numpy as np
+
+from tau_lmt import tau_lmt, solar_events, twilight_year, TWILIGHTS, NS_DAY, NS_MINUTE
+from benchmarks.synthetic import write_synthetic_csv
+
+
+def main(cadence=60):
+    n_points = int((np.datetime64('2021-01-01', 's') - np.datetime64('2013-01-01', 's')).astype(np.int64)//cadence)
+    tmp_dir = tempfile.mkdtemp()
+    path = os.path.join(tmp_dir, 'tau.csv')
+    write_synthetic_csv(path, n_points, start='2013-01-01', cadence=cadence)
+
+    tau = tau_lmt(path)
+    print('Samples: '+str(tau.n_points))
+
+    # Dusk and dawn of every date, all the twilights
+    twilight_year.cache_clear()
+    t0 = time.perf_counter()
+    for twilight in TWILIGHTS:
+        for year in range(2013, 2021):
+            twilight_year(twilight, year)
+    print('Twilight tables (4 x 8 years): '+'{:.1f}'.format(1e3*(time.perf_counter()-t0))+' ms')
+
+    t0 = time.perf_counter()
+    mask = tau.filter(tau.raw_data, '-ng', output='mask')
+    print('-ng: '+'{:.3f}'.format(time.perf_counter()-t0)+' s, '+str(int(mask.sum()))+' rows selected')
+
+    days = tau.timestamps//NS_DAY
+    minutes = (tau.timestamps % NS_DAY)//NS_MINUTE
+    failed = False
+    for twilight in TWILIGHTS:
+        t0 = time.perf_counter()
+        mask = tau.filter(tau.raw_data, '-ng '+twilight, output='mask')
+        elapsed = time.perf_counter() - t0
+
+        dawn, dusk = solar_events(days, TWILIGHTS[twilight])
+        expected = (minutes >= np.round(dusk)) | (minutes < np.round(dawn))
+        same = np.array_equal(mask, expected)
+        failed |= not same
+        print('-ng '+twilight+': '+'{:.3f}'.format(elapsed)+' s, '+str(int(mask.sum()))+' rows selected'+
+              ('' if same else ', MISMATCH'))
+
+    shutil.rmtree(tmp_dir)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+# --------------------------------------------------------------------------------- #
+# "LMT opacity library". Benchmark of the parallel statistics
+# Daily night statistics of every year and month (the jobs of the per-year
+# scripts) over a synthetic 2013-2020 archive, run by pools of 1, 2, 4 and
+# 8 processes attached to the binary cache. The speedup is bounded by the
+# cores of the machine, they are printed first.
+#
+# Usage: python -m benchmarks.bench_parallel [cadence_seconds]
+#
+# --------------------------------------------------------------------------------- #
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+from tau_lmt import tau_lmt
+from benchmarks.synthetic import write_synthetic_csv
+
+
+def main(cadence=60):
+    n_points = int((2020-2013)*365.25*86400/cadence)
+    tmp_dir = tempfile.mkdtemp()
+    path = os.path.join(tmp_dir, 'tau.csv')
+    write_synthetic_csv(path, n_points, cadence=cadence)
+
+    tau = tau_lmt(path)
+    print('Samples: '+str(tau.n_points)+', cores: '+str(os.cpu_count()))
+
+    jobs = [('-yr '+str(year)+' -mn '+str(month)+' -hr 19-6', '-dy 1') for year in range(2013, 2021) for month in range(1, 13)]
+
+    reference = None
+    for workers in [1, 2, 4, 8]:
+        t0 = time.perf_counter()
+        stats = tau.statistics_jobs(jobs, workers=workers)
+        elapsed = time.perf_counter() - t0
+        if reference is None:
+            reference = (stats, elapsed)
+        same = stats.equals(reference[0])
+        print(str(workers)+' workers: '+'{:.2f}'.format(elapsed)+' s, speedup '+
+              '{:.2f}'.format(reference[1]/elapsed)+('' if same else ', MISMATCH'))
+
+    shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
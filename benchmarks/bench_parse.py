@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+# --------------------------------------------------------------------------------- #
+# "LMT opacity library". Benchmark of the csv parsers
+# Compares the 'infer' parser (pandas, inferred date format) with the 'fast'
+# parser (fixed radiometer layout) on a synthetic file.
+#
+# Usage: python -m benchmarks.bench_parse [n_rows]
+#
+# --------------------------------------------------------------------------------- #
+
+import os
+import sys
+import time
+import tempfile
+
+import numpy as np
+
+from tau_lmt import read_tau_csv
+from benchmarks.synthetic import write_synthetic_csv
+
+
+def main(n_rows=10000000):
+    path = os.path.join(tempfile.mkdtemp(), 'tau.csv')
+    print('Writing '+str(n_rows)+' rows to '+path)
+    write_synthetic_csv(path, n_rows)
+
+    results = {}
+    for parser in ['infer', 'fast']:
+        t0 = time.perf_counter()
+        results[parser] = read_tau_csv(path, parser=parser)
+        print(parser.ljust(6)+' parser: '+'{:.2f}'.format(time.perf_counter()-t0)+' s')
+
+    same = all(np.array_equal(a, b) for a, b in zip(results['infer'], results['fast']))
+    print('Same output: '+str(same))
+
+    os.remove(path)
+    os.rmdir(os.path.dirname(path))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+# --------------------------------------------------------------------------------- #
+# "LMT opacity library". Benchmark of the partitioned store
+# Synthetic archives of 7 to 56 years, written as partitioned stores. Times
+# the load of one month of the store, and the filter of one month over the
+# whole archive scanning all the rows (as before the partitions) and only
+# the rows of the month.
+#
+# Usage: python -m benchmarks.bench_partitions [cadence_seconds]
+#
+# --------------------------------------------------------------------------------- #
+
+import sys
+import time
+import shutil
+import tempfile
+
+from tau_lmt import tau_lmt, calendar_fields, save_tau_partitions, filter_rows, filter_luts, parse_filter_chain
+from benchmarks.synthetic import synthetic_tau
+
+
+ARCHIVE_YEARS = [7, 14, 28, 56]
+MONTH_FILTER = '-yr 2012 -mn 3'
+
+
+def best_time(function, repeat=5):
+    elapsed = []
+    for k in range(repeat):
+        t0 = time.perf_counter()
+        function()
+        elapsed.append(time.perf_counter() - t0)
+
+    return min(elapsed)
+
+
+def main(cadence=300):
+    spec = parse_filter_chain(MONTH_FILTER)
+    for years in ARCHIVE_YEARS:
+        tmp_dir = tempfile.mkdtemp()
+        date, tau = synthetic_tau(int(years*365.25*86400/cadence), start=str(2013-years//2)+'-01-01', cadence=cadence)
+        columns = calendar_fields(date)
+        columns.update({'Date': date, 'Tau': tau})
+        save_tau_partitions(tmp_dir, columns)
+
+        t_load = best_time(lambda: tau_lmt(tmp_dir, partitions=MONTH_FILTER))
+        data = tau_lmt(tmp_dir)
+        t_scan = best_time(lambda: filter_rows(data.n_points, spec, columns['Tau'], filter_luts(spec), data.calendar))
+        t_pruned = best_time(lambda: data.filter(data.raw_data, spec, output='positions'))
+
+        print(str(years).rjust(3)+' years, '+str(data.n_points).rjust(9)+' rows: one month load '+'{:.1f}'.format(1e3*t_load)+
+              ' ms, filter scanning all '+'{:.1f}'.format(1e3*t_scan)+' ms, pruned '+'{:.1f}'.format(1e3*t_pruned)+' ms')
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+# --------------------------------------------------------------------------------- #
+# "LMT opacity library". Benchmark of the figure rendering
+# The yearly report: the monthly statistics of every year and of several
+# daily windows, written as PNG files. One pyplot figure per frame through
+# tau_plotter_hughes_format (Agg backend), against render_batch with one
+# template per process, serial and over a pool of processes.
+#
+# Usage: python -m benchmarks.bench_render [windows] [cadence_seconds]
+#
+# --------------------------------------------------------------------------------- #
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+from tau_lmt import tau_lmt, seasonal_windows
+from tau_plot import tau_plotter_hughes_format, render_batch, MONTH_NAMES, RENDER_STYLE
+from benchmarks.synthetic import write_synthetic_csv
+from benchmarks.workloads import NIGHT_HOURS, NIGHT_30MIN, YEARS
+
+
+def pyplot_figures(jobs):
+    """
+        One pyplot figure per frame, as the per-year scripts
+        Parameters
+        ----------
+        jobs : list
+            (stats, path, title) list
+        ----------
+    """
+    with plt.rc_context(RENDER_STYLE):
+        for stats, path, title in jobs:
+            figs = plt.subplots(nrows=1, ncols=1, figsize=(6, 6), sharey=True)
+            tau_plotter_hughes_format(stats, figs, show_limits=True)
+            figs[1].set_xticklabels([MONTH_NAMES[date.month-1] for date in stats['Date']])
+            figs[1].set_title(title)
+            figs[0].savefig(path)
+            plt.close(figs[0])
+
+
+def main(windows=4, cadence=600):
+    n_points = int((2020-2013)*365.25*86400/cadence)
+    tmp_dir = tempfile.mkdtemp()
+    path = os.path.join(tmp_dir, 'tau.csv')
+    write_synthetic_csv(path, n_points, cadence=cadence)
+    tau = tau_lmt(path)
+
+    # The night window, shifted by one hour per window
+    jobs = []
+    for shift in range(windows):
+        hours = [[(hr + shift) % 24 for hr in month] for month in NIGHT_HOURS]
+        stats = tau.window_statistics(seasonal_windows(hours, NIGHT_30MIN), years=[int(year) for year in YEARS])
+        for year in YEARS:
+            stat = stats[stats['Date'].dt.year == int(year)]
+            jobs.append((stat, os.path.join(tmp_dir, year+'_'+str(shift)+'.png'), 'Window '+str(shift)+' '+year))
+    print('Figures: '+str(len(jobs))+', cores: '+str(os.cpu_count()))
+
+    t0 = time.perf_counter()
+    pyplot_figures(jobs)
+    print('pyplot figure per frame: '+'{:.2f}'.format(time.perf_counter()-t0)+' s')
+
+    for workers in sorted(set([1, os.cpu_count() or 1])):
+        t0 = time.perf_counter()
+        render_batch(jobs, workers=workers)
+        print('render_batch, '+str(workers)+' processes: '+'{:.2f}'.format(time.perf_counter()-t0)+' s')
+
+    shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
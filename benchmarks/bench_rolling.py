@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+# --------------------------------------------------------------------------------- #
+# "LMT opacity library". Benchmark of the rolling statistics
+# Times tau_lmt.rolling_statistics with a 3 h window at every sample of a
+# synthetic 2013-2020 archive, against pandas rolling (one call per
+# statistic) and, over the first samples, a loop that computes every window
+# on its own. The results are checked against pandas.
+#
+# Usage: python -m benchmarks.bench_rolling [window] [naive_windows]
+#
+# --------------------------------------------------------------------------------- #
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from tau_lmt import tau_lmt, STAT_COLUMNS
+from benchmarks.synthetic import write_synthetic_csv
+
+
+def reference_rolling(sample, window):
+    """
+        Rolling statistics with pandas, one rolling call per statistic
+        Parameters
+        ----------
+        sample : pandas dataframe
+            Datetime data sample
+        window : string
+            Length of the window
+        ----------
+    """
+    rolling = pd.Series(sample['Tau'].values, index=pd.DatetimeIndex(sample['Date'].values)).rolling(window)
+    stats = {'tau_count': rolling.count(), 'tau_mean': rolling.mean(), 'tau_std': rolling.std(),
+             'tau_25': rolling.quantile(0.25), 'tau_50': rolling.median(), 'tau_75': rolling.quantile(0.75),
+             'tau_max': rolling.max(), 'tau_min': rolling.min()}
+
+    return pd.DataFrame({name: stats[name].values for name in STAT_COLUMNS[1:]})
+
+
+def naive_rolling(sample, window, n_windows):
+    """
+        Rolling statistics of the first windows, one window at a time
+        Parameters
+        ----------
+        sample : pandas dataframe
+            Datetime data sample
+        window : string
+            Length of the window
+        n_windows : int
+            Windows to compute
+        ----------
+    """
+    date = sample['Date'].values
+    tau = sample['Tau'].values
+    width = np.timedelta64(pd.Timedelta(window))
+    stats = []
+    for i, end in enumerate(date[:n_windows]):
+        values = tau[np.searchsorted(date, end - width, side='right'):i+1]
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            stats.append([0]+[np.nan]*7)
+            continue
+        stats.append([len(values), np.mean(values), np.std(values, ddof=1),
+                      *np.percentile(values, [25, 50, 75]), np.max(values), np.min(values)])
+
+    return stats
+
+
+def main(window='3h', naive_windows=2000):
+    n_points = int((2020-2013)*365.25*1440)
+    tmp_dir = tempfile.mkdtemp()
+    path = os.path.join(tmp_dir, 'tau.csv')
+    write_synthetic_csv(path, n_points)
+
+    data = tau_lmt(path)
+    sample = data.raw_data
+    print('Samples: '+str(len(sample.index))+', window: '+window)
+
+    t0 = time.perf_counter()
+    stats = data.rolling_statistics(sample, window)
+    print('tau_lmt rolling_statistics: '+'{:.2f}'.format(time.perf_counter()-t0)+' s')
+
+    t0 = time.perf_counter()
+    reference = reference_rolling(sample, window)
+    print('pandas rolling: '+'{:.2f}'.format(time.perf_counter()-t0)+' s')
+
+    t0 = time.perf_counter()
+    naive_rolling(sample, window, naive_windows)
+    elapsed = time.perf_counter() - t0
+    print('Window by window: '+'{:.2f}'.format(elapsed*len(sample.index)/naive_windows)+' s (from '+
+          str(naive_windows)+' windows)')
+
+    same = True
+    for name in STAT_COLUMNS[1:]:
+        same &= np.allclose(stats[name].values, reference[name].values, rtol=1e-9, atol=1e-12, equal_nan=True)
+    print('Rolling statistics '+('equal to' if same else 'DIFFERENT from')+' pandas')
+
+    shutil.rmtree(tmp_dir)
+    if not same:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:2], *[int(arg) for arg in sys.argv[2:]])
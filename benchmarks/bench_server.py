@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+# --------------------------------------------------------------------------------- #
+# "LMT opacity library". Benchmark of the query server
+# A script that loads the tau file (binary cache) and asks a filter and its
+# statistics, against the same query to a tau server started once: the first
+# time (computed by the server) and again (from its result cache), and several
+# clients at the same time.
+#
+# Usage: python -m benchmarks.bench_server [n_points] [clients]
+#
+# --------------------------------------------------------------------------------- #
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+import subprocess
+
+from tau_lmt import tau_lmt
+from tau_server import tau_client
+from benchmarks.synthetic import write_synthetic_csv
+
+
+BENCH_PORT = 8649
+QUERY_FILTERS = ['-yr 2015 -hr 19-6', '-yr 2016 -mn 1-3 -t 0.2', '-ng', '-hr 0-6 -t 0.1']
+
+
+def local_query(path, filter_chain):
+    """
+        Load the tau file and ask a query, as a script does
+    """
+    tau = tau_lmt(path)
+    return tau.statistics_sample(tau.filter(tau.raw_data, filter_chain), '-dy 1')
+
+
+def client_query(client, filter_chain):
+    """
+        The same query to the server
+    """
+    return client.statistics_sample(client.filter(client.raw_data, filter_chain), '-dy 1')
+
+
+def main(n_points=int((2020-2013)*365.25*1440), clients=4):
+    tmp_dir = tempfile.mkdtemp()
+    path = os.path.join(tmp_dir, 'tau.csv')
+    write_synthetic_csv(path, n_points, outages=12)
+    tau_lmt(path)
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    server = subprocess.Popen([sys.executable, os.path.join(root, 'tau_server.py'), path, str(BENCH_PORT)],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        client = None
+        for k in range(600):
+            try:
+                client = tau_client(port=BENCH_PORT)
+                break
+            except (ConnectionError, OSError):
+                time.sleep(0.1)
+        t0 = time.perf_counter()
+        tau_lmt(path, cache=False)
+        print('Samples: '+str(client.n_points)+', load without the binary cache: '+'{:.2f}'.format(time.perf_counter()-t0)+' s')
+
+        for filter_chain in QUERY_FILTERS:
+            t0 = time.perf_counter()
+            local = local_query(path, filter_chain)
+            t_local = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            remote = client_query(client, filter_chain)
+            t_first = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            client_query(client, filter_chain)
+            t_cached = time.perf_counter() - t0
+
+            same = local.equals(remote)
+            print(filter_chain.ljust(26)+'load and query: '+'{:.3f}'.format(t_local)+' s, server: '+
+                  '{:.3f}'.format(t_first)+' s, cached: '+'{:.3f}'.format(t_cached)+' s'+('' if same else ' DIFFERENT'))
+
+        # Several clients, every one with its own connection
+        threads = [threading.Thread(target=client_query, args=(client, '-yr '+str(2014+k % 6)+' -t 0.'+str(k+1)))
+                   for k in range(clients)]
+        t0 = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        print(str(clients)+' clients at the same time: '+'{:.3f}'.format(time.perf_counter()-t0)+' s')
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
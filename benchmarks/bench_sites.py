@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+# --------------------------------------------------------------------------------- #
+# "LMT opacity library". Benchmark of the multiple series
+# Two synthetic radiometers of 2013-2020, one sample per minute and one
+# every 5 minutes with outages. Times the as-of alignment of tau_sites
+# against pandas merge_asof (the results are checked), and the side by
+# side statistics per day against a pandas groupby per series.
+#
+# Usage: python -m benchmarks.bench_sites [direction]
+#
+# --------------------------------------------------------------------------------- #
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from tau_lmt import tau_sites
+from benchmarks.synthetic import write_synthetic_csv
+
+
+def pandas_align(sites, at, tolerance, direction):
+    """
+        The same alignment with pandas merge_asof, one merge per series
+    """
+    aligned = pd.DataFrame({'Date': at})
+    for name in sites.names:
+        sample = sites[name].raw_data.rename(columns={'Tau': name})
+        aligned = pd.merge_asof(aligned, sample, on='Date', direction=direction, tolerance=tolerance)
+
+    return aligned
+
+
+def pandas_statistics(sites):
+    """
+        Statistics per day of every series with pandas, side by side
+    """
+    frames = []
+    for name in sites.names:
+        sample = sites[name].raw_data
+        groups = sample.groupby(sample['Date'].dt.floor('D'))['Tau']
+        stats = groups.agg(['count', 'mean', 'std', 'max', 'min'])
+        stats[['q25', 'q50', 'q75']] = groups.quantile([0.25, 0.5, 0.75]).unstack()
+        frames.append(stats.add_prefix(name+'_'))
+
+    return pd.concat(frames, axis=1)
+
+
+def main(direction='backward'):
+    tmp_dir = tempfile.mkdtemp()
+    paths = {'lmt': os.path.join(tmp_dir, 'lmt.csv'), 'second': os.path.join(tmp_dir, 'second.csv')}
+    write_synthetic_csv(paths['lmt'], int((2020-2013)*365.25*1440))
+    write_synthetic_csv(paths['second'], int((2020-2013)*365.25*288), cadence=300, seed=1, outages=12)
+    sites = tau_sites(paths)
+    print('Samples: '+', '.join([name+' '+str(sites[name].n_points) for name in sites.names]))
+
+    t0 = time.perf_counter()
+    aligned = sites.align(direction=direction, complete=False)
+    print('tau_sites align: '+'{:.3f}'.format(time.perf_counter()-t0)+' s, '+str(len(aligned.index))+' instants')
+
+    t0 = time.perf_counter()
+    reference = pandas_align(sites, aligned['Date'], pd.Timedelta(max(sites.cadences().values())), direction)
+    print('pandas merge_asof: '+'{:.3f}'.format(time.perf_counter()-t0)+' s')
+
+    same = all([np.array_equal(aligned[name].values, reference[name].values, equal_nan=True) for name in sites.names])
+    print('Alignment '+('equal to' if same else 'DIFFERENT from')+' merge_asof')
+
+    t0 = time.perf_counter()
+    sites.statistics_sample(None, '-dy 1')
+    print('tau_sites statistics per day: '+'{:.3f}'.format(time.perf_counter()-t0)+' s')
+
+    t0 = time.perf_counter()
+    pandas_statistics(sites)
+    print('pandas groupby per day: '+'{:.3f}'.format(time.perf_counter()-t0)+' s')
+
+    shutil.rmtree(tmp_dir)
+    if not same:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
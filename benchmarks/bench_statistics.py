@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+# --------------------------------------------------------------------------------- #
+# "LMT opacity library". Benchmark of the statistics
+# Times statistics_sample over a synthetic 2013-2020 archive at -dy 1, -hr 1
+# and -mt 10, and checks every group against pandas groupby + describe.
+#
+# Usage: python -m benchmarks.bench_statistics [cadence_seconds]
+#
+# --------------------------------------------------------------------------------- #
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from tau_lmt import tau_lmt, STAT_COLUMNS
+from benchmarks.synthetic import write_synthetic_csv
+
+
+# Frequency of every time group, for pandas
+FREQUENCIES = {'dy': 'D', 'hr': 'h', 'mt': 'min'}
+
+
+def reference_statistics(sample, cmd, value):
+    """
+        Statistics of the groups with pandas, as describe() gives them
+        Parameters
+        ----------
+        sample : pandas dataframe
+            Datetime data sample
+        cmd : string
+            Time group: dy, hr, mt
+        value : int
+            Time units per group
+        ----------
+        Returns the statistics indexed by group number
+    """
+    unit = pd.Timedelta(1, FREQUENCIES[cmd])
+    init = sample['Date'].iloc[0]
+    end = sample['Date'].iloc[-1]
+    units = (sample['Date'].dt.floor(unit) - init.floor(unit)) // unit
+    # Units of the sample period: the complete days from the time of the
+    # first date, the hours and minutes up to the last date
+    if cmd == 'dy':
+        n_units = (end - init) // unit
+    else:
+        n_units = -((init - end) // unit)
+
+    valid = units < n_units
+    stats = sample['Tau'][valid].groupby(units[valid] // value).describe()
+    stats.columns = ['tau_count', 'tau_mean', 'tau_std', 'tau_min', 'tau_25', 'tau_50', 'tau_75', 'tau_max']
+
+    return stats
+
+
+def main(cadence=60):
+    n_points = int((2020-2013)*365.25*86400/cadence)
+    tmp_dir = tempfile.mkdtemp()
+    path = os.path.join(tmp_dir, 'tau.csv')
+    write_synthetic_csv(path, n_points, cadence=cadence)
+
+    tau = tau_lmt(path)
+    print('Samples: '+str(tau.n_points))
+
+    for group in ['-dy 1', '-hr 1', '-mt 10']:
+        t0 = time.perf_counter()
+        stats = tau.statistics_sample(tau.raw_data, group)
+        elapsed = time.perf_counter()-t0
+
+        # Groups counted from the first date, the last one included
+        cmd, value = group[1:3], int(group[4:])
+        unit = pd.Timedelta(value, FREQUENCIES[cmd]).value
+        init = pd.Timestamp(tau.raw_data['Date'].iloc[0]).floor(FREQUENCIES[cmd]).value
+        groups = (stats['Date'].values.astype(np.int64) - init) // unit
+        reference = reference_statistics(tau.raw_data, cmd, value)
+        same = np.array_equal(reference.index.values, groups) and \
+            np.allclose(stats[STAT_COLUMNS[1:]].values, reference.loc[groups, STAT_COLUMNS[1:]].values, rtol=1e-9, equal_nan=True)
+
+        print(group.ljust(7)+': '+'{:.3f}'.format(elapsed)+' s, '+str(len(stats.index))+' groups, same as pandas: '+str(same))
+
+    shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+# --------------------------------------------------------------------------------- #
+# "LMT opacity library". Benchmark of the streaming loader
+# Night statistics per day (-hr 19-6, -dy 1) of a synthetic archive, loading
+# the whole file or streaming it by chunks. Every run goes to its own process
+# to measure its peak memory.
+#
+# Usage: python -m benchmarks.bench_stream [n_points]
+#
+# --------------------------------------------------------------------------------- #
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import subprocess
+
+import numpy as np
+
+from tau_lmt import tau_lmt, read_tau_chunks, stream_filter, stream_statistics, STAT_COLUMNS
+from benchmarks.synthetic import write_synthetic_csv
+
+
+FILTER_CHAIN = '-hr 19-6'
+GROUP_CHAIN = '-dy 1'
+
+
+def peak_memory():
+    """
+        Peak resident memory of the process in MB, from /proc (linux). The
+        getrusage maximum keeps the one of the parent process after exec.
+    """
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1])//1024
+
+
+def run(path, mode):
+    """
+        Night statistics of a tau file
+        Parameters
+        ----------
+        path : string
+            Opacity data path
+        mode : string
+            'load': whole file in memory, 'stream': chunks of the file
+        ----------
+    """
+    t0 = time.perf_counter()
+    if mode == 'load':
+        tau = tau_lmt(path, cache=False)
+        stats = tau.statistics_sample(tau.filter(tau.raw_data, FILTER_CHAIN), GROUP_CHAIN)
+    else:
+        stats = stream_statistics(stream_filter(read_tau_chunks(path), FILTER_CHAIN), GROUP_CHAIN)
+    elapsed = time.perf_counter() - t0
+
+    print(mode.ljust(7)+': '+'{:.2f}'.format(elapsed)+' s, peak RSS '+str(peak_memory())+' MB, '+str(len(stats.index))+' groups')
+    np.save(path+'.'+mode+'.npy', stats[STAT_COLUMNS[1:]].values)
+
+
+def main(n_points=10000000):
+    tmp_dir = tempfile.mkdtemp()
+    path = os.path.join(tmp_dir, 'tau.csv')
+    write_synthetic_csv(path, n_points, cadence=60)
+    print('Samples: '+str(n_points)+', file: '+str(os.path.getsize(path)//(1024*1024))+' MB')
+
+    for mode in ['load', 'stream']:
+        subprocess.check_call([sys.executable, '-m', 'benchmarks.bench_stream', path, mode])
+
+    same = np.allclose(np.load(path+'.load.npy'), np.load(path+'.stream.npy'), equal_nan=True)
+    print('Same statistics: '+str(same))
+
+    shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 3:
+        run(sys.argv[1], sys.argv[2])
+    else:
+        main(*[int(arg) for arg in sys.argv[1:]])
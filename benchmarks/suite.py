@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+# --------------------------------------------------------------------------------- #
+# "LMT opacity library". Benchmark suite
+# Wall time (time_*) and peak memory (peakmem_*) of the load, every filter
+# clause, one month of the partitioned store, the time spans, every
+# statistics granularity, the workload of the per-year scripts and the
+# figures, over a synthetic archive with outages
+# (TAU_SUITE_POINTS samples, 1M by default, up to 100M).
+#
+# The classes follow the conventions of asv (airspeed velocity), see
+# asv.conf.json:  asv run -E existing --set-commit-hash $(git rev-parse HEAD)
+# Without asv, every benchmark runs in its own process and the results are
+# compared with a former run:
+#
+# Usage: python -m benchmarks.suite [results.json] [former_results.json] [pattern]
+#
+# --------------------------------------------------------------------------------- #
+
+import os
+import sys
+import json
+import time
+import shutil
+import inspect
+import itertools
+import tempfile
+import subprocess
+
+import numpy as np
+import pandas as pd
+
+from tau_lmt import tau_lmt, seasonal_windows
+from benchmarks.synthetic import write_synthetic_csv
+from benchmarks.workloads import per_year_filters, NIGHT_HOURS, NIGHT_30MIN, YEARS
+
+
+# Samples of the time grid of the archive, and outages per year
+SUITE_POINTS = int(os.environ.get('TAU_SUITE_POINTS', 1000000))
+SUITE_OUTAGES = 12
+# One clause per filter chain
+FILTER_CHAINS = ['-yr 2014', '-mn 2', '-dy 15', '-hr 19-6', '-mt 30-59', '-tm 19:30-06:29', '-t 0.2', '-ng', '-ng astro']
+# Time groups of the statistics
+GROUP_CHAINS = ['-yr 1', '-mn 1', '-dy 1', '-hr 1', '-mt 10']
+# Slower results than this ratio of the former run are regressions, when
+# they change by more than the noise (s for the times, MB for the memory)
+REGRESSION_RATIO = 1.2
+REGRESSION_NOISE = {'time_': 0.01, 'peakmem_': 5.}
+
+
+class archive():
+    """
+        Synthetic archive shared by the benchmarks of a class, written once
+        (asv setup_cache) with its binary cache
+    """
+    timeout = 600
+
+    def setup_cache(self):
+        path = os.path.abspath('tau.csv')
+        write_synthetic_csv(path, SUITE_POINTS, outages=SUITE_OUTAGES)
+        tau_lmt(path)
+        return path
+
+
+class Load(archive):
+    def time_parse(self, path):
+        tau_lmt(path, cache=False)
+
+    def peakmem_parse(self, path):
+        tau_lmt(path, cache=False)
+
+    def time_cache(self, path):
+        tau_lmt(path)
+
+    def peakmem_cache(self, path):
+        tau_lmt(path)
+
+
+class Filter(archive):
+    params = [FILTER_CHAINS]
+    param_names = ['filter_chain']
+
+    def setup(self, path, filter_chain):
+        self.tau = tau_lmt(path)
+
+    def time_filter(self, path, filter_chain):
+        self.tau.filter(self.tau.raw_data, filter_chain)
+
+    def peakmem_filter(self, path, filter_chain):
+        self.tau.filter(self.tau.raw_data, filter_chain)
+
+
+class Partitions(archive):
+    def setup(self, path):
+        self.store_dir = tempfile.mkdtemp()
+        self.tau = tau_lmt(path)
+        self.tau.save_partitions(self.store_dir)
+        middle = self.tau.first_date + (self.tau.last_date - self.tau.first_date)/2
+        self.month_chain = '-yr '+str(middle.year)+' -mn '+str(middle.month)
+
+    def teardown(self, path):
+        shutil.rmtree(self.store_dir)
+
+    def time_load_month(self, path):
+        tau_lmt(self.store_dir, partitions=self.month_chain)
+
+    def time_filter_month(self, path):
+        self.tau.filter(self.tau.raw_data, self.month_chain)
+
+
+class TimeSpan(archive):
+    def setup(self, path):
+        self.tau = tau_lmt(path)
+        rng = np.random.default_rng(0)
+        dates = self.tau.first_date + (self.tau.last_date - self.tau.first_date)*rng.random(1000)
+        self.from_dates = pd.DatetimeIndex(np.sort(dates))
+        self.to_dates = self.from_dates + pd.Timedelta(1, 'D')
+
+    def time_time_span(self, path):
+        self.tau.time_span(self.from_dates[0], self.to_dates[0])
+
+    def time_time_spans(self, path):
+        self.tau.time_spans(self.from_dates, self.to_dates)
+
+
+class Statistics(archive):
+    params = [GROUP_CHAINS, ['exact', 'sketch']]
+    param_names = ['group_chain', 'quantiles']
+
+    def setup(self, path, group_chain, quantiles):
+        self.tau = tau_lmt(path)
+
+    def time_statistics(self, path, group_chain, quantiles):
+        self.tau.statistics_sample(self.tau.raw_data, group_chain, quantiles=quantiles)
+
+    def peakmem_statistics(self, path, group_chain, quantiles):
+        self.tau.statistics_sample(self.tau.raw_data, group_chain, quantiles=quantiles)
+
+
+class Scripts(archive):
+    def setup(self, path):
+        self.tau = tau_lmt(path)
+        self.window = seasonal_windows(NIGHT_HOURS, NIGHT_30MIN)
+
+    def time_window_statistics(self, path):
+        self.tau.window_statistics(self.window, years=[int(year) for year in YEARS])
+
+    def peakmem_window_statistics(self, path):
+        self.tau.window_statistics(self.window, years=[int(year) for year in YEARS])
+
+    def time_per_year_filters(self, path):
+        per_year_filters(self.tau)
+
+
+class Render(archive):
+    timeout = 600
+
+    def setup(self, path):
+        tau = tau_lmt(path)
+        stats = tau.window_statistics(seasonal_windows(NIGHT_HOURS, NIGHT_30MIN), years=[int(year) for year in YEARS])
+        self.out_dir = tempfile.mkdtemp()
+        self.jobs = [(stats[stats['Date'].dt.year == int(year)], os.path.join(self.out_dir, year+'.png'), year)
+                     for year in YEARS if (stats['Date'].dt.year == int(year)).any()]
+
+    def teardown(self, path):
+        shutil.rmtree(self.out_dir)
+
+    def time_render_batch(self, path):
+        from tau_plot import render_batch
+        render_batch(self.jobs, workers=1)
+
+    def time_pyplot_figures(self, path):
+        from benchmarks.bench_render import pyplot_figures
+        pyplot_figures(self.jobs)
+
+
+def peak_memory():
+    """
+        Peak resident memory of the process in MB, from /proc (linux)
+    """
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1])/1024.
+
+
+def suite_benchmarks(pattern=''):
+    """
+        Benchmarks of the suite: name, class, method and parameters
+        Parameters
+        ----------
+        pattern : string
+            Part of the names to run
+        ----------
+    """
+    benchmarks = []
+    for cls_name, cls in inspect.getmembers(sys.modules[__name__], inspect.isclass):
+        if not issubclass(cls, archive) or cls is archive:
+            continue
+        combinations = list(itertools.product(*cls.params)) if hasattr(cls, 'params') else [()]
+        for method in sorted(vars(cls)):
+            if not method.startswith(('time_', 'peakmem_')):
+                continue
+            for params in combinations:
+                name = cls_name+'.'+method+('('+', '.join(params)+')' if params else '')
+                if pattern in name:
+                    benchmarks.append((name, cls_name, method, params))
+
+    return benchmarks
+
+
+def run(path, cls_name, method, params, repeat=3):
+    """
+        Run one benchmark in this process, the result is printed as json:
+        the best wall time of the repeats (s) or the peak memory (MB)
+    """
+    bench = getattr(sys.modules[__name__], cls_name)()
+    if hasattr(bench, 'setup'):
+        bench.setup(path, *params)
+
+    function = getattr(bench, method)
+    if method.startswith('peakmem_'):
+        function(path, *params)
+        result = peak_memory()
+    else:
+        elapsed = []
+        for k in range(repeat):
+            t0 = time.perf_counter()
+            function(path, *params)
+            elapsed.append(time.perf_counter() - t0)
+        result = min(elapsed)
+
+    if hasattr(bench, 'teardown'):
+        bench.teardown(path)
+    print(json.dumps(result))
+
+
+def main(results_path='suite_results.json', former_path=None, pattern=''):
+    tmp_dir = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    os.chdir(tmp_dir)
+    try:
+        paths = {}
+        results = {}
+        for name, cls_name, method, params in suite_benchmarks(pattern):
+            # One archive per class, as asv
+            if cls_name not in paths:
+                os.makedirs(cls_name)
+                os.chdir(cls_name)
+                paths[cls_name] = getattr(sys.modules[__name__], cls_name)().setup_cache()
+                os.chdir(tmp_dir)
+            output = subprocess.check_output([sys.executable, '-m', 'benchmarks.suite', '--run', paths[cls_name], cls_name, method, json.dumps(params)],
+                                             stderr=subprocess.DEVNULL, cwd=cwd)
+            results[name] = json.loads(output.decode().splitlines()[-1])
+            unit = ' MB' if method.startswith('peakmem_') else ' s'
+            print(name.ljust(60)+'{:10.3f}'.format(results[name])+unit)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(tmp_dir)
+
+    with open(results_path, 'w') as f:
+        json.dump({'points': SUITE_POINTS, 'results': results}, f, indent=1)
+
+    if former_path is not None:
+        with open(former_path) as f:
+            former = json.load(f)['results']
+        regressions = 0
+        for name in results:
+            noise = REGRESSION_NOISE['peakmem_' if '.peakmem_' in name else 'time_']
+            if name in former and results[name] > max(REGRESSION_RATIO*former[name], former[name] + noise):
+                print('Regression: '+name+' '+'{:.2f}'.format(results[name]/former[name])+'x')
+                regressions += 1
+        print(str(regressions)+' regressions against '+former_path)
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--run']:
+        run(sys.argv[2], sys.argv[3], sys.argv[4], json.loads(sys.argv[5]))
+    else:
+        main(*sys.argv[1:])
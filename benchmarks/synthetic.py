@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+# --------------------------------------------------------------------------------- #
+# "LMT opacity library". Synthetic radiometer archives for the benchmarks
+# The opacity follows the wet summer and the afternoon maximum of the site,
+# with weather that lasts for hours (an AR(1) process in log tau, one node
+# every 3 hours) and outages of the radiometer, from minutes to weeks. The archive
+# is written by chunks, so it scales to 100M lines with the memory of a chunk.
+#
+# --------------------------------------------------------------------------------- #
+
+from collections import namedtuple
+
+import numpy as np
+
+
+# Synthetic archive, the samples come from synthetic_chunk
+#   start : int, first date, seconds since epoch
+#   cadence : int, seconds between samples
+#   n_points : int, samples of the time grid, including the outages
+#   seed : int, random seed
+#   weather : float array, log tau of the weather, one node every WEATHER_STEP
+#   outages : int arrays (2, n), first and last+1 grid samples of every outage
+synthetic_archive = namedtuple('synthetic_archive', ['start', 'cadence', 'n_points', 'seed', 'weather', 'outages'])
+# Seconds between the nodes of the weather
+WEATHER_STEP = 3*3600
+# Correlation between consecutive nodes and spread of the weather (log tau)
+WEATHER_PHI = 0.9
+WEATHER_SIGMA = 0.35
+# Shortest and longest outages, seconds
+OUTAGE_LIMITS = (600, 30*86400)
+# Samples with their own random noise, the samples do not depend on the chunks
+NOISE_BLOCK = 1000000
+
+
+def synthetic_model(n_points, start='2013-06-01', cadence=60, seed=0, outages=0):
+    """
+        Weather and outages of a synthetic archive
+        Parameters
+        ----------
+        n_points : int
+            Samples of the time grid
+        start : string
+            First date
+        cadence : float
+            Seconds between samples
+        seed : int
+            Random seed
+        outages : float
+            Outages per year, their lengths are log uniform within
+            OUTAGE_LIMITS
+        ----------
+        Returns a synthetic_archive
+    """
+    rng = np.random.default_rng(seed)
+    start = int(np.datetime64(start, 's').astype(np.int64))
+    cadence = int(cadence)
+    seconds = n_points*cadence
+
+    # Weather: stationary AR(1) of the nodes
+    n_nodes = seconds//WEATHER_STEP + 2
+    steps = WEATHER_SIGMA*np.sqrt(1 - WEATHER_PHI**2)*rng.standard_normal(n_nodes)
+    weather = np.empty(n_nodes)
+    weather[0] = WEATHER_SIGMA*rng.standard_normal()
+    for i in range(1, n_nodes):
+        weather[i] = WEATHER_PHI*weather[i-1] + steps[i]
+
+    n_outages = rng.poisson(outages*seconds/(365.25*86400))
+    first = np.sort(rng.integers(0, max(n_points, 1), n_outages))
+    length = np.exp(rng.uniform(*np.log(OUTAGE_LIMITS), n_outages))/cadence
+    last = first + np.maximum(length.astype(np.int64), 1)
+
+    return synthetic_archive(start, cadence, n_points, seed, weather, np.array([first, last]))
+
+
+def synthetic_chunk(archive, first, last):
+    """
+        Samples of a synthetic archive between two positions of its grid,
+        without the ones in the outages
+        Parameters
+        ----------
+        archive : synthetic_archive
+            Archive, see synthetic_model
+        first, last : int
+            First and last+1 samples of the grid
+        ----------
+        Returns the timestamps as int64 nanoseconds since epoch and tau as float64
+    """
+    grid = np.arange(first, last, dtype=np.int64)
+    # Samples out of the outages, they may overlap
+    starts, ends = archive.outages
+    if len(starts) > 0:
+        k = np.searchsorted(starts, grid, side='right') - 1
+        reach = np.maximum.accumulate(ends)
+        grid = grid[(k < 0) | (grid >= reach[np.maximum(k, 0)])]
+
+    seconds = archive.start + grid*archive.cadence
+    elapsed = (grid*archive.cadence).astype(np.float64)
+    # Wet season in summer, afternoon maximum
+    season = np.cos(2*np.pi*(seconds/86400. - 200.)/365.25)
+    day = np.cos(2*np.pi*(seconds % 86400 - 15*3600)/86400.)
+    node = elapsed/WEATHER_STEP
+    weather = np.interp(node, np.arange(len(archive.weather)), archive.weather)
+
+    noise = np.empty(len(grid))
+    blocks = grid//NOISE_BLOCK
+    for block in np.unique(blocks):
+        rows = np.flatnonzero(blocks == block)
+        rng = np.random.default_rng([archive.seed, int(block)])
+        noise[rows] = rng.standard_normal(NOISE_BLOCK)[grid[rows] - block*NOISE_BLOCK]
+
+    tau = np.exp(np.log(0.2) + 0.45*season + 0.15*day + weather + 0.08*noise)
+    tau = np.clip(np.round(tau, 3), 0.01, 9.999)
+
+    return seconds*1000000000, tau
+
+
+def synthetic_tau(n_points, start='2013-06-01', cadence=60, seed=0, outages=0):
+    """
+        Synthetic opacity series
+        Parameters
+        ----------
+        n_points : int
+            Samples of the time grid, see synthetic_model
+        start : string
+            First date
+        cadence : float
+            Seconds between samples
+        seed : int
+            Random seed
+        outages : float
+            Outages per year
+        ----------
+        Returns the timestamps as int64 nanoseconds since epoch and tau as float64
+    """
+    archive = synthetic_model(n_points, start=start, cadence=cadence, seed=seed, outages=outages)
+    return synthetic_chunk(archive, 0, n_points)
+
+
+def tau_lines(date, tau):
+    """
+        Lines in the radiometer layout: YYYY-MM-DD,HH:MM:SS,t.ttt
+        Parameters
+        ----------
+        date : int64 array
+            Timestamps, nanoseconds since epoch
+        tau : float array
+            Opacity, from 0 to 9.999
+        ----------
+        Returns the lines as bytes
+    """
+    n = len(date)
+    lines = np.empty((n, 26), dtype=np.uint8)
+
+    stamps = np.datetime_as_string(date.astype('datetime64[ns]'), unit='s').astype('S19')
+    lines[:, :19] = stamps.view(np.uint8).reshape(n, 19)
+    lines[:, 10] = ord(',')
+    lines[:, 19] = ord(',')
+
+    milli = np.round(tau*1000).astype(np.int64)
+    lines[:, 20] = ord('0') + milli//1000
+    lines[:, 21] = ord('.')
+    lines[:, 22] = ord('0') + milli//100 % 10
+    lines[:, 23] = ord('0') + milli//10 % 10
+    lines[:, 24] = ord('0') + milli % 10
+    lines[:, 25] = ord('\n')
+
+    return lines.tobytes()
+
+
+def write_synthetic_csv(path, n_points, chunk=1000000, **kwargs):
+    """
+        Write a synthetic tau file, one chunk of the grid at a time
+        Parameters
+        ----------
+        path : string
+            File path
+        n_points : int
+            Samples of the time grid
+        chunk : int
+            Samples written at once
+        **kwargs : arguments of synthetic_model
+        ----------
+        Returns the number of lines written (the grid without the outages)
+    """
+    archive = synthetic_model(n_points, **kwargs)
+    n_lines = 0
+    with open(path, 'wb') as f:
+        for i in range(0, n_points, chunk):
+            date, tau = synthetic_chunk(archive, i, min(i + chunk, n_points))
+            f.write(tau_lines(date, tau))
+            n_lines += len(date)
+
+    return n_lines
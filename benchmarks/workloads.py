@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+# --------------------------------------------------------------------------------- #
+# "LMT opacity library". Workloads of the example scripts, for the benchmarks
+#
+# --------------------------------------------------------------------------------- #
+
+import pandas as pd
+
+
+# Hours averaged per month in tau_per_year_night.py
+NIGHT_HOURS = [[19,20,21,22,23,0,1,2,3,4,5,6],  # January
+               [20,21,22,23,0,1,2,3,4,5,6],     # February
+               [20,21,22,23,0,1,2,3,4,5],       # March
+               [21,22,23,0,1,2,3,4,5,6],        # April
+               [21,22,23,0,1,2,3,4,5,6],        # May
+               [21,22,23,0,1,2,3,4,5,6],        # June
+               [21,22,23,0,1,2,3,4,5,6],        # July
+               [21,22,23,0,1,2,3,4,5,6],        # August
+               [21,22,23,0,1,2,3,4,5,6],        # September
+               [20,21,22,23,0,1,2,3,4,5,6],     # October
+               [19,20,21,22,23,0,1,2,3,4,5,6],  # November
+               [19,20,21,22,23,0,1,2,3,4,5,6]]  # December
+
+# Additional 30 min at the beginning and at the end of the period
+NIGHT_30MIN = [[False, False], [True, False], [True, True], [True, False],
+               [False, False], [False, False], [False, False], [False, False],
+               [True, False], [False, True], [False, False], [False, False]]
+
+YEARS = ['2013','2014','2015','2016','2017','2018','2019','2020']
+
+
+def per_year_filters(tau, hours=NIGHT_HOURS, mask_30min=NIGHT_30MIN, years=YEARS):
+    """
+        Filter calls of the former tau_per_year_night.py loops, one sample
+        per year
+        Parameters
+        ----------
+        tau : tau_lmt
+            Tau object
+        hours : list
+            Hours per month
+        mask_30min : list
+            30 min extensions per month
+        years : list
+            Years
+        ----------
+    """
+    samples = []
+    for year in years:
+        data = pd.DataFrame()
+        for m in range(12):
+            hrs_string = ','.join([str(hr) for hr in hours[m]])
+            chain = '-yr '+year+' -mn '+str(m+1)
+            period = tau.filter(tau.raw_data, chain+' -hr '+hrs_string)
+
+            if mask_30min[m][0]:
+                corr = tau.filter(tau.raw_data, chain+' -hr '+str(hours[m][0]-1)+' -mt 30-59')
+                period = pd.concat([corr, period])
+
+            if mask_30min[m][1]:
+                corr = tau.filter(tau.raw_data, chain+' -hr '+str(hours[m][-1]+1)+' -mt 0-29')
+                period = pd.concat([period, corr])
+
+            data = pd.concat([data, period])
+        samples.append(data)
+
+    return samples
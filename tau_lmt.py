@@ -15,41 +15,3395 @@
 # --------------------------------------------------------------------------------- #
 
 
+import os
+import io
+import sys
+import json
+import time
+import zlib
+import logging
+import multiprocessing
+import concurrent.futures
+from functools import lru_cache, wraps
+from contextlib import contextmanager
+from collections import namedtuple
+
 import numpy as np
-from matplotlib.pyplot import *
-import matplotlib.dates as md
+import pandas as pd
+
+# Path of the tau lmt file
+FILE_TAU_PATH = "./data/Tau_LMT_Site_(2013-06-01)_(2020-03-21).csv"
+
+# Version of the binary cache layout. Increase it if the layout changes
+CACHE_VERSION = 5
+# Version of the statistics cube layout
+CUBE_VERSION = 2
+# Version of the partitioned store layout
+STORE_VERSION = 1
+# Calendar fields, named as the filter commands. tm: minutes since midnight
+CALENDAR_FIELDS = ['yr', 'mn', 'dy', 'hr', 'mt', 'tm']
+CALENDAR_DTYPES = {'yr': np.uint16, 'mn': np.uint8, 'dy': np.uint8, 'hr': np.uint8, 'mt': np.uint8, 'tm': np.uint16}
+# Calendar fields filtered through lookup tables
+LUT_FIELDS = ['yr', 'mn', 'dy', 'hr', 'mt']
+# Columns stored in the binary cache
+CACHE_COLUMNS = ['Date', 'Tau'] + CALENDAR_FIELDS
+
+# Nanoseconds per day, per hour and per minute
+NS_DAY = 86400*1000000000
+NS_HOUR = 3600*1000000000
+NS_MINUTE = 60*1000000000
+# Minutes per day
+DAY_MINUTES = 1440
+
+# Fixed layout of the radiometer lines: YYYY-MM-DD,HH:MM:SS,tau
+# First character of the tau value
+TAU_OFFSET = 20
+# Lines parsed at once by the fast parser
+PARSE_BLOCK = 1 << 16
+# Rows evaluated at once by the filters
+FILTER_BLOCK = 1 << 16
+# Bytes of the file read at once by the streaming loader
+STREAM_CHUNK = 1 << 24
+# Growth factor of the arrays that take appended rows
+GROWTH_FACTOR = 1.5
+
+# Night definition. From 21:00 pm - 8:00 am
+NIGHT_HOURS = [21, 22, 23, 0, 1, 2, 3, 4, 5, 6, 7, 8]
+
+# LMT site, Sierra Negra. Latitude and longitude in degrees (east positive),
+# offset of the radiometer clock from UTC in hours
+SITE_LATITUDE = 18.9858
+SITE_LONGITUDE = -97.3147
+SITE_UTC_OFFSET = -6
+# Nights of the -ng clause, as the zenith angle of the Sun (degrees) at dusk
+# and dawn: sunset/sunrise, civil, nautical and astronomical twilights
+TWILIGHTS = {'sun': 90.833, 'civil': 96., 'nautical': 102., 'astro': 108.}
+
+# MISCELLANEOUS FUNCTIONS
+# Messages go through the logger of the module. As a library it only has a
+# NullHandler, the scripts print them to stdout with the color of their kind
+# (see log_to_console); below the level of the logger a message costs a level
+# check.
+logger = logging.getLogger('tau_lmt')
+logger.addHandler(logging.NullHandler())
+# Kind of message: logging level and color
+MSG_KINDS = {'info': (logging.INFO, '\033[94m'), 'ok': (logging.INFO, '\033[92m'), 'warning': (logging.WARNING, '\033[93m'),
+             'error': (logging.ERROR, '\033[91m'), 'verb': (logging.INFO, '')}
+# Handler of the console, see log_to_console
+console_handler = None
+
+
+class color_formatter(logging.Formatter):
+    """
+        Messages with the color of their kind
+    """
+    def format(self, record):
+        return getattr(record, 'color', '') + record.getMessage() + '\033[0m'
+
+
+def log_to_console(enable=True, level=logging.INFO):
+    """
+        Print the messages of the library to stdout, with colors. Without
+        the console the messages go to the handlers of the application
+        Parameters
+        ----------
+        enable : bool
+            Print the messages (True) or leave them to the root logger
+        level : int
+            Level of the messages, as logging.WARNING
+        ----------
+    """
+    global console_handler
+    if console_handler is not None:
+        logger.removeHandler(console_handler)
+        console_handler = None
+
+    if enable:
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setFormatter(color_formatter())
+        logger.addHandler(console_handler)
+    logger.propagate = not enable
+    logger.setLevel(level)
+
+
+# Printing Messages
+def print_msg(msg, alarm_type):
+    """
+        Messages
+        Parameters
+        ----------
+        msg : string
+            Message to show
+        alarm_type : string
+            Kind of message: info, ok, warning, error or verb
+        ----------
+    """
+    if alarm_type not in MSG_KINDS:
+        logger.error('Type of message not recognized: '+str(alarm_type))
+        return
+
+    level, color = MSG_KINDS[alarm_type]
+    if logger.isEnabledFor(level):
+        logger.log(level, msg, extra={'color': color})
+
+
+# INSTRUMENTATION
+# Time of the stages (read, parse, mask, gather, reduce, render) and counters
+# of rows, recorded inside a profile() block only. Out of it every probe is
+# the test of a global.
+# Profile being recorded
+active_profile = None
+
+
+class tau_profile():
+    """
+        Timers of the stages and counters of a profile() block
+    """
+    def __init__(self):
+        # Seconds and calls of every stage, and the stages running
+        self.seconds = {}
+        self.calls = {}
+        self.running = {}
+        # Counters: rows_parsed, rows_scanned, rows_returned, groups
+        self.counters = {}
+
+
+    def frame(self):
+        """
+            Seconds and calls of the stages, as a data frame
+        """
+        return pd.DataFrame({'stage': list(self.seconds), 'calls': [self.calls[name] for name in self.seconds],
+                             'seconds': [self.seconds[name] for name in self.seconds]}, columns=['stage', 'calls', 'seconds'])
+
+
+    def __repr__(self):
+        stages = ', '.join([name+': '+'{:.4f}'.format(self.seconds[name])+' s ('+str(self.calls[name])+')' for name in self.seconds])
+        counters = ', '.join([name+': '+str(self.counters[name]) for name in self.counters])
+        return 'tau_profile('+stages+('; '+counters if counters else '')+')'
+
+
+class profile_stage():
+    """
+        Timer of a stage of the active profile, as a context manager. A
+        stage inside the same stage (a reduction made of reductions) is
+        timed once
+        Parameters
+        ----------
+        name : string
+            Stage: read, parse, mask, gather, reduce, render
+        ----------
+    """
+    __slots__ = ('name', 'profile', 't0')
+
+    def __init__(self, name):
+        self.name = name
+
+
+    def __enter__(self):
+        self.profile = active_profile
+        if self.profile is not None:
+            running = self.profile.running
+            running[self.name] = running.get(self.name, 0) + 1
+            self.t0 = time.perf_counter()
+
+
+    def __exit__(self, *args):
+        profile = self.profile
+        if profile is not None:
+            running = profile.running
+            running[self.name] -= 1
+            if running[self.name] == 0:
+                profile.seconds[self.name] = profile.seconds.get(self.name, 0.) + time.perf_counter() - self.t0
+                profile.calls[self.name] = profile.calls.get(self.name, 0) + 1
+
+
+def profile_count(name, n):
+    """
+        Add to a counter of the active profile
+        Parameters
+        ----------
+        name : string
+            Counter: rows_parsed, rows_scanned, rows_returned, groups
+        n : int
+            Amount
+        ----------
+    """
+    if active_profile is not None:
+        active_profile.counters[name] = active_profile.counters.get(name, 0) + int(n)
+
+
+def profiled(name):
+    """
+        Decorator: the calls of a function are a stage of the profile
+        Parameters
+        ----------
+        name : string
+            Stage, see profile_stage
+        ----------
+    """
+    def decorator(function):
+        @wraps(function)
+        def staged(*args, **kwargs):
+            if active_profile is None:
+                return function(*args, **kwargs)
+            with profile_stage(name):
+                return function(*args, **kwargs)
+        return staged
+
+    return decorator
+
+
+@contextmanager
+def profile():
+    """
+        Record the time of the stages and the rows of the calls inside the
+        block, of this process:
+            with tau_lmt.profile() as prof:
+                tau.statistics_sample('-yr 2016 -hr 19-6', '-dy 1')
+            print(prof.frame(), prof.counters)
+        Yields a tau_profile, the blocks can be nested (the inner one
+        records its own calls only)
+    """
+    global active_profile
+    previous = active_profile
+    active_profile = tau_profile()
+    try:
+        yield active_profile
+    finally:
+        active_profile = previous
+
+
+# LOADING FUNCTIONS
+def read_tau_csv(path, parser='fast', size=None):
+    """
+        Parse the radiometer csv file
+        Parameters
+        ----------
+        path : string
+            Opacity data path
+        parser : string
+            'fast': parse the fixed radiometer layout (YYYY-MM-DD,HH:MM:SS,tau)
+            straight from the bytes of the file. If a line does not follow
+            that layout the file is read again with the 'infer' parser.
+            'infer': pandas reader, the date format is inferred.
+        size : int
+            Bytes of the file to parse (None: the whole file)
+        ----------
+        Returns the timestamps as int64 nanoseconds since epoch and tau as float64
+    """
+    if parser not in ['fast', 'infer']:
+        raise ValueError('Parser not valid: '+str(parser))
+    if parser == 'infer' and size is None:
+        with profile_stage('parse'):
+            date, tau = infer_tau_csv(path)
+        profile_count('rows_parsed', len(date))
+        return date, tau
+
+    # The file is read with 8 bytes of padding at the end
+    if size is None:
+        size = os.path.getsize(path)
+    with profile_stage('read'):
+        buf = np.zeros(size+8, dtype=np.uint8)
+        with open(path, 'rb') as f:
+            size = f.readinto(memoryview(buf)[:size])
+
+    return parse_tau_buffer(buf, size, parser)
+
+
+def parse_tau_buffer(buf, size, parser='fast'):
+    """
+        Parse the radiometer lines of a buffer
+        Parameters
+        ----------
+        buf : uint8 array
+            Bytes of the lines, with at least 8 bytes of padding after size
+        size : int
+            Bytes of the lines
+        parser : string
+            Csv parser: 'fast' or 'infer' (see read_tau_csv)
+        ----------
+        Returns the timestamps as int64 nanoseconds since epoch and tau as float64
+    """
+    with profile_stage('parse'):
+        parsed = None
+        if parser == 'fast':
+            try:
+                parsed = parse_tau_bytes(buf, size)
+            except ValueError as e:
+                print_msg('Fixed layout not recognized ('+str(e)+'), inferring the format', 'warning')
+        if parsed is None:
+            parsed = infer_tau_csv(io.BytesIO(buf[:size].tobytes()))
+    profile_count('rows_parsed', len(parsed[0]))
+
+    return parsed
+
+
+def infer_tau_csv(source):
+    """
+        Parse radiometer lines with the pandas reader, the date format is
+        inferred
+        Parameters
+        ----------
+        source : string or file object
+            Opacity data path or buffer
+        ----------
+        Returns the timestamps as int64 nanoseconds since epoch and tau as float64
+    """
+    data = pd.read_csv(source, names=['Date', 'Time', 'Tau'], header=None)
+    # Unifying time columns
+    date = pd.to_datetime(data['Date']+'T'+data['Time'])
+
+    date = date.values.astype('datetime64[ns]').view(np.int64)
+    tau = data['Tau'].values.astype(np.float64)
+
+    return date, tau
+
+
+def line_bounds(buf):
+    """
+        First and last+1 byte of every non-empty line
+        Parameters
+        ----------
+        buf : uint8 array
+            Bytes of the file
+        ----------
+    """
+    ends = np.flatnonzero(buf == ord('\n'))
+    if len(buf) > 0 and buf[-1] != ord('\n'):
+        ends = np.append(ends, len(buf))
+    starts = np.empty_like(ends)
+    starts[:1] = 0
+    starts[1:] = ends[:-1] + 1
+
+    # Windows line endings
+    if len(ends) > 0:
+        cr = buf[np.maximum(ends-1, 0)] == ord('\r')
+        ends = ends - (cr & (ends > starts))
+
+    not_empty = ends > starts
+    return starts[not_empty], ends[not_empty]
+
+
+# WORD (SWAR) FUNCTIONS
+# Eight characters of a line are read at once as a little endian uint64
+# word, the first character in the lowest byte.
+def byte_words(buf):
+    """
+        View of the buffer as uint64 words starting at every byte, so eight
+        characters of a line are read with a single gather. The last 8 bytes
+        of buf are padding and they do not start a word.
+        Parameters
+        ----------
+        buf : uint8 array
+            Bytes of the file, plus 8 bytes of padding
+        ----------
+    """
+    return np.ndarray(shape=(len(buf)-7,), dtype='<u8', buffer=buf, strides=(1,))
+
+
+def word_mask(positions, value=0xFF):
+    """
+        Word with the byte value at the given byte positions
+        Parameters
+        ----------
+        positions : list of int
+            Byte positions, 0-7
+        value : int
+            Byte value
+        ----------
+    """
+    mask = 0
+    for pos in positions:
+        mask |= value << (8*pos)
+    return np.uint64(mask)
+
+
+# Mask of the k first bytes of a word, k = 0..8
+FIRST_BYTES = np.array([(1 << 8*k) - 1 for k in range(9)], dtype=np.uint64)
+# Powers of ten, k = 0..8
+POWERS_10 = 10**np.arange(9, dtype=np.int64)
+ALL_BYTES = list(range(8))
+
+
+def word_is_digit(word, mask):
+    """
+        True where every byte selected by mask is an ASCII digit
+        Parameters
+        ----------
+        word : uint64 array
+            Words
+        mask : uint64 or uint64 array
+            Bytes to check
+        ----------
+    """
+    high = mask & word_mask(ALL_BYTES, 0xF0)
+    low = mask & word_mask(ALL_BYTES, 0x0F)
+    # The high nibble is 3 and the low nibble is 9 or less
+    digits = (word & high) == (mask & word_mask(ALL_BYTES, 0x30))
+    digits &= (((word & low) + (mask & word_mask(ALL_BYTES, 0x06))) & high) == 0
+
+    return digits
+
+
+def word_shift(word, n_bytes, left=True):
+    """
+        Shift words a number of bytes. Shifting 8 bytes or more gives 0.
+        Parameters
+        ----------
+        word : uint64 array
+            Words
+        n_bytes : int array
+            Bytes to shift
+        left : boolean
+            Shift direction, left moves the characters to later positions
+        ----------
+    """
+    bits = (8*np.minimum(n_bytes, 7)).astype(np.uint64)
+    shifted = word << bits if left else word >> bits
+
+    return np.where(n_bytes < 8, shifted, np.uint64(0))
+
+
+def word_to_int(word):
+    """
+        Value of eight ASCII digits (leading zeros or null bytes allowed)
+        Parameters
+        ----------
+        word : uint64 array
+            Words
+        ----------
+    """
+    # Pairs of digits, then groups of four, then eight
+    word = ((word & word_mask([1, 3, 5, 7], 0x0F)) >> np.uint64(8)) + (word & word_mask([0, 2, 4, 6], 0x0F))*np.uint64(10)
+    word = ((word & word_mask([2, 6])) >> np.uint64(16)) + (word & word_mask([0, 4]))*np.uint64(100)
+    word = ((word & word_mask([4, 5])) >> np.uint64(32)) + (word & word_mask([0, 1]))*np.uint64(10000)
+
+    return word.astype(np.int64)
+
+
+def parse_short_decimals(word, length):
+    """
+        Read plain decimal numbers ([-]ddd.ddd) of up to 8 characters with
+        word arithmetic
+        Parameters
+        ----------
+        word : uint64 array
+            Words starting at the first character of the numbers
+        length : int array
+            Number of characters, 0-8
+        ----------
+        Returns the values and a mask of the numbers with other notations
+    """
+    word = word & FIRST_BYTES[length]
+
+    # Sign
+    negative = (word & np.uint64(0xFF)) == ord('-')
+    word = np.where(negative, word >> np.uint64(8), word)
+    length = length - negative
+
+    # Decimal point. The bytes equal to '.' become zero after the xor, and
+    # only those get the high bit set in 'point_bit'
+    diff = word ^ word_mask(ALL_BYTES, ord('.'))
+    low7 = word_mask(ALL_BYTES, 0x7F)
+    point_bit = ~(((diff & low7) + low7) | diff | low7) & FIRST_BYTES[length]
+    first_bit = point_bit & (~point_bit + np.uint64(1))
+    # The exponent of a power of two is its bit position+1
+    bit = np.frexp(first_bit.astype(np.float64))[1]
+    point = np.where(point_bit > 0, (bit - 8)//8, length)
+
+    n_frac = np.maximum(length - point - 1, 0)
+    digit_mask = FIRST_BYTES[length] & ~((point_bit >> np.uint64(7))*np.uint64(0xFF))
+
+    other = (point_bit != first_bit) | (point + n_frac == 0)
+    other |= ~word_is_digit(word, digit_mask)
+
+    # Integer and fractional digits aligned to the end of a word
+    int_part = word_shift(word & FIRST_BYTES[point], 8 - point)
+    frac_part = word_shift(word_shift(word, point + 1, left=False), 8 - n_frac)
+
+    power = POWERS_10[n_frac]
+    mantissa = word_to_int(int_part)*power + word_to_int(frac_part)
+    # Below 2^53 the division is exact to the last bit
+    tau = mantissa / power
+    tau[negative] = -tau[negative]
+    tau[length == 0] = np.nan
+
+    return tau, other
+
+
+def parse_decimals(buf, starts, ends):
+    """
+        Read decimal numbers of any length, character by character. Other
+        notations (exponents, nan, ...) are passed to the float conversion
+        of python.
+        Parameters
+        ----------
+        buf : uint8 array
+            Bytes of the file
+        starts : int array
+            First character of the numbers
+        ends : int array
+            Last character+1 of the numbers
+        ----------
+    """
+    n = len(starts)
+    width = int(np.max(ends - starts)) if n > 0 else 0
+
+    mantissa = np.zeros(n, dtype=np.int64)
+    decimals = np.zeros(n, dtype=np.int64)
+    n_digits = np.zeros(n, dtype=np.int64)
+    point = np.zeros(n, dtype=bool)
+    other = np.zeros(n, dtype=bool)
+
+    negative = (buf[starts] == ord('-')) & (ends > starts)
+
+    for k in range(width):
+        inside = starts + k < ends
+        char = buf[np.where(inside, starts+k, 0)].astype(np.int64)
+
+        digit = char - ord('0')
+        is_digit = inside & (digit >= 0) & (digit <= 9)
+        is_point = inside & (char == ord('.'))
+
+        mantissa = np.where(is_digit, mantissa*10 + digit, mantissa)
+        n_digits += is_digit
+        decimals += is_digit & point
+        other |= is_point & point
+        point |= is_point
+        other |= inside & ~(is_digit | is_point | (negative & (k == 0)))
+
+    # Up to 15 digits the division is exact to the last bit
+    other |= (n_digits > 15) | (n_digits == 0) & (ends > starts)
+
+    tau = mantissa / 10.**decimals
+    tau[negative] = -tau[negative]
+    tau[ends == starts] = np.nan
+
+    for i in np.flatnonzero(other):
+        tau[i] = float(buf[starts[i]:ends[i]].tobytes())
+
+    return tau
+
+
+def parse_tau_bytes(buf, size=None, block=PARSE_BLOCK):
+    """
+        Parse the radiometer lines (YYYY-MM-DD,HH:MM:SS,tau) with integer
+        arithmetic over the bytes of the file, no strings are created.
+        Parameters
+        ----------
+        buf : uint8 array
+            Bytes of the file. If size is given, buf[size:] is padding of
+            at least 8 bytes, otherwise buf is copied to add it.
+        size : int
+            Size of the file
+        block : int
+            Lines parsed at once
+        ----------
+        Returns the timestamps as int64 nanoseconds since epoch and tau as float64
+    """
+    if size is None:
+        size = len(buf)
+        buf = np.concatenate([buf, np.zeros(8, dtype=np.uint8)])
+
+    starts, ends = line_bounds(buf[:size])
+
+    if np.any(ends - starts < TAU_OFFSET):
+        raise ValueError('line too short')
+
+    words = byte_words(buf)
+
+    date = np.empty(len(starts), dtype=np.int64)
+    tau = np.empty(len(starts), dtype=np.float64)
+    # Blocks of lines keep the temporal arrays small
+    for i in range(0, len(starts), block):
+        date[i:i+block], tau[i:i+block] = parse_tau_lines(buf, words, starts[i:i+block], ends[i:i+block])
+
+    return date, tau
+
+
+def parse_tau_lines(buf, words, starts, ends):
+    """
+        Parse a block of radiometer lines, see parse_tau_bytes
+        Parameters
+        ----------
+        buf : uint8 array
+            Bytes of the file, plus 8 bytes of padding
+        words : uint64 array
+            Words of the file, see byte_words
+        starts : int array
+            First byte of the lines
+        ends : int array
+            Last byte+1 of the lines
+        ----------
+    """
+
+    # D A T E S
+    # 'YYYY-MM-' and 'DD,'. Consecutive lines share the date, only the
+    # first line of every run is decoded
+    date_head = words[starts]
+    date_tail = words[starts+8] & word_mask([0, 1, 2])
+    new_date = np.ones(len(starts), dtype=bool)
+    new_date[1:] = (date_head[1:] != date_head[:-1]) | (date_tail[1:] != date_tail[:-1])
+    runs = np.flatnonzero(new_date)
+    date_head = date_head[runs]
+    date_tail = date_tail[runs]
+
+    if np.any((date_head & word_mask([4, 7])) != word_mask([4, 7], ord('-'))) or \
+       np.any((date_tail & word_mask([2])) != word_mask([2], ord(','))):
+        raise ValueError('date separators expected')
+    if not (np.all(word_is_digit(date_head, word_mask([0, 1, 2, 3, 5, 6]))) and
+            np.all(word_is_digit(date_tail, word_mask([0, 1])))):
+        raise ValueError('date digits expected')
+
+    digits = [((date_head >> np.uint64(8*k)) & np.uint64(0x0F)).astype(np.int64) for k in range(8)]
+    yr = 1000*digits[0] + 100*digits[1] + 10*digits[2] + digits[3]
+    mn = 10*digits[5] + digits[6]
+    dy = 10*(date_tail & np.uint64(0x0F)).astype(np.int64) + ((date_tail >> np.uint64(8)) & np.uint64(0x0F)).astype(np.int64)
+
+    if np.any((mn < 1) | (mn > 12) | (dy < 1) | (dy > 31)):
+        raise ValueError('date out of range')
+
+    # Calendar arithmetic on datetime64: years -> months -> days
+    days = ((yr - 1970).astype('datetime64[Y]') + (mn - 1).astype('timedelta64[M]')).astype('datetime64[D]')
+    days = days + (dy - 1).astype('timedelta64[D]')
+    # A day beyond the end of the month moves to the next one
+    if np.any(days.astype('datetime64[M]').astype(np.int64) != (yr - 1970)*12 + mn - 1):
+        raise ValueError('day out of range')
+
+    lengths = np.diff(np.append(runs, len(starts)))
+    seconds = np.repeat(days.astype(np.int64)*86400, lengths)
+
+    # T I M E S
+    # 'HH:MM:SS' and ','
+    time_word = words[starts+11]
+    if np.any((time_word & word_mask([2, 5])) != word_mask([2, 5], ord(':'))) or \
+       np.any(buf[starts+19] != ord(',')):
+        raise ValueError('time separators expected')
+    if not np.all(word_is_digit(time_word, word_mask([0, 1, 3, 4, 6, 7]))):
+        raise ValueError('time digits expected')
+
+    # Two digits values in the bytes 0, 3 and 6
+    time_word = time_word & word_mask(ALL_BYTES, 0x0F)
+    time_word = time_word*np.uint64(10) + (time_word >> np.uint64(8))
+    hr = (time_word & np.uint64(0xFF)).astype(np.int64)
+    mt = ((time_word >> np.uint64(24)) & np.uint64(0xFF)).astype(np.int64)
+    sc = ((time_word >> np.uint64(48)) & np.uint64(0xFF)).astype(np.int64)
+
+    if np.any((hr > 23) | (mt > 59) | (sc > 60)):
+        raise ValueError('time out of range')
+
+    seconds += hr*3600 + mt*60 + sc
+    date = seconds*1000000000
+
+    # T A U
+    tau_starts = starts + TAU_OFFSET
+    tau_lengths = ends - tau_starts
+    tau, other = parse_short_decimals(words[tau_starts], np.minimum(tau_lengths, 8))
+
+    # Longer numbers and other notations, character by character
+    other |= tau_lengths > 8
+    if np.any(other):
+        tau[other] = parse_decimals(buf, tau_starts[other], ends[other])
+
+    return date, tau
+
+
+def cache_paths(path):
+    """
+        Paths of the binary cache of a tau file. The cache lives next to the
+        csv file, in the directory <path>.cache
+        Parameters
+        ----------
+        path : string
+            Opacity data path
+        ----------
+    """
+    cache_dir = path + '.cache'
+    columns = {}
+    for name in CACHE_COLUMNS:
+        columns[name] = os.path.join(cache_dir, name + '.npy')
+
+    return cache_dir, columns, os.path.join(cache_dir, 'meta.json')
+
+
+def source_signature(path):
+    """
+        Signature of the csv file used to invalidate the cache
+        Parameters
+        ----------
+        path : string
+            Opacity data path
+        ----------
+    """
+    st = os.stat(path)
+    return {'version': CACHE_VERSION, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+
+def prefix_checksum(path, offset, start=0, crc=0):
+    """
+        CRC-32 of the bytes of a file up to an offset. If it is the same,
+        the lines after the offset are taken as appended lines.
+        Parameters
+        ----------
+        path : string
+            Opacity data path
+        offset : int
+            Bytes of the file
+        start : int
+            Bytes already in the checksum
+        crc : int
+            Checksum of the bytes up to start
+        ----------
+    """
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while start < offset:
+            block = f.read(min(STREAM_CHUNK, offset - start))
+            if len(block) == 0:
+                break
+            crc = zlib.crc32(block, crc)
+            start += len(block)
+
+    return crc
+
+
+def data_signature(path, n_points, offset, previous=None):
+    """
+        Signature of the data of a tau file: the csv file, the bytes of it
+        parsed (and their checksum) and the rows they gave. It is the
+        metadata of the binary cache, and invalidates the statistics cube.
+        Parameters
+        ----------
+        path : string
+            Opacity data path
+        n_points : int
+            Number of rows
+        offset : int
+            Bytes of the file parsed
+        previous : dictionary
+            Signature of the bytes before the new lines, their checksum is
+            not computed again
+        ----------
+    """
+    meta = source_signature(path)
+    if previous is None:
+        crc = prefix_checksum(path, offset)
+    else:
+        crc = prefix_checksum(path, offset, previous['offset'], previous['crc'])
+    meta.update({'n_points': int(n_points), 'offset': int(offset), 'crc': crc})
+    return meta
+
+
+def load_tau_cache(path):
+    """
+        Load the binary cache as read-only memory maps
+        Parameters
+        ----------
+        path : string
+            Opacity data path
+        ----------
+        Returns a dictionary with the CACHE_COLUMNS and the metadata of the
+        cache (see data_signature), or None if the cache is missing or out
+        of date. A csv file that only got new lines after the cached ones
+        (it grew and the checksum of the cached bytes is the same) keeps
+        its cache, the lines are appended by tau_lmt.append. Any other
+        change of the file parses it again.
+    """
+    cache_dir, paths, meta_path = cache_paths(path)
+
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+    except (IOError, ValueError):
+        return None
+
+    signature = source_signature(path)
+    try:
+        if meta['version'] != signature['version']:
+            return None
+        if meta['size'] != signature['size'] or meta['mtime_ns'] != signature['mtime_ns']:
+            # Only new lines after the cached ones
+            if signature['size'] <= meta['size'] or prefix_checksum(path, meta['offset']) != meta['crc']:
+                return None
+    except (IOError, KeyError):
+        return None
+
+    try:
+        n_points = meta['n_points']
+        columns = {}
+        for name in CACHE_COLUMNS:
+            columns[name] = np.load(paths[name], mmap_mode='r')[:n_points]
+    except (IOError, ValueError, KeyError):
+        return None
+
+    for name in CACHE_COLUMNS:
+        if len(columns[name]) != n_points:
+            return None
+
+    return columns, meta
+
+
+def save_tau_cache(path, columns, meta):
+    """
+        Write the binary cache of a tau file. Every file is written to a
+        temporal name and then renamed, so concurrent readers never see a
+        partial cache. The metadata goes last.
+        Parameters
+        ----------
+        path : string
+            Opacity data path
+        columns : dictionary
+            Arrays of the CACHE_COLUMNS
+        meta : dictionary
+            Metadata of the cache, see data_signature
+        ----------
+    """
+    cache_dir, paths, meta_path = cache_paths(path)
+
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+
+    tmp_suffix = '.tmp' + str(os.getpid())
+    for name in CACHE_COLUMNS:
+        tmp_path = paths[name] + tmp_suffix
+        with open(tmp_path, 'wb') as f:
+            np.save(f, columns[name])
+        os.replace(tmp_path, paths[name])
+
+    save_cache_meta(meta_path, meta)
+
+
+def save_cache_meta(meta_path, meta):
+    """
+        Write the metadata of a binary cache, through a temporal name
+        Parameters
+        ----------
+        meta_path : string
+            Path of the metadata
+        meta : dictionary
+            Metadata of the cache, see data_signature
+        ----------
+    """
+    tmp_path = meta_path + '.tmp' + str(os.getpid())
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, meta_path)
+
+
+def append_tau_cache(path, columns, meta):
+    """
+        Append rows to the binary cache of a tau file. The files keep room
+        for GROWTH_FACTOR times the rows they had when they are rewritten,
+        the rows that fit are written in place, after the rows of the cache
+        (see store_rows). The metadata goes last.
+        Parameters
+        ----------
+        path : string
+            Opacity data path
+        columns : dictionary
+            Arrays of the CACHE_COLUMNS of the new rows
+        meta : dictionary
+            Metadata of the cache with the new rows, see data_signature
+        ----------
+        Returns the memory maps of all the rows, as load_tau_cache
+    """
+    cache_dir, paths, meta_path = cache_paths(path)
+    n_points = meta['n_points']
+    n_old = n_points - len(columns['Date'])
+    # Rows that other processes may have mapped
+    known = stored_meta(meta_path).get('n_points', n_old)
+
+    for name in CACHE_COLUMNS:
+        store_rows(paths[name], n_old, columns[name], known)
+    save_cache_meta(meta_path, meta)
+
+    return {name: np.load(paths[name], mmap_mode='r')[:n_points] for name in CACHE_COLUMNS}
+
+
+def stored_meta(meta_path):
+    """
+        Metadata of a binary cache or statistics cube as it is on disk, an
+        empty dictionary if there is none
+    """
+    try:
+        with open(meta_path) as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return {}
+
+
+def store_rows(npy_path, start, values, known=0):
+    """
+        Write rows of a .npy file from a position on, the rows before it are
+        kept. The rows are written in place when they fit and they do not
+        change the rows known by the readers, which may have the file
+        mapped. Otherwise the file is written again with room for
+        GROWTH_FACTOR times its rows, through a temporal name: the readers
+        keep the former file.
+        Parameters
+        ----------
+        npy_path : string
+            Path of the .npy file
+        start : int
+            First row written
+        values : array
+            Rows
+        known : int
+            Rows of the file in the metadata, the readers may know them
+        ----------
+    """
+    stored = np.load(npy_path, mmap_mode='r+')
+    needed = start + len(values)
+    overlap = max(0, min(known, needed) - start)
+    changed = overlap > 0 and not np.array_equal(stored[start:start+overlap], values[:overlap])
+    if len(stored) >= needed and not changed:
+        stored[start:needed] = values
+        stored.flush()
+    else:
+        tmp_path = npy_path + '.tmp' + str(os.getpid())
+        grown = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=stored.dtype,
+                                          shape=(max(needed, int(GROWTH_FACTOR*len(stored))),))
+        grown[:start] = stored[:start]
+        grown[start:needed] = values
+        grown.flush()
+        del grown
+        os.replace(tmp_path, npy_path)
+    del stored
+
+
+def load_tau_file(path, cache=True, parser='fast'):
+    """
+        Load a tau file, through the binary cache if it is enabled.
+        Parameters
+        ----------
+        path : string
+            Opacity data path
+        cache : boolean or 'read'
+            Use (and build if needed) the binary cache. 'read' uses it
+            without writing it
+        parser : string
+            Csv parser: 'fast' or 'infer' (see read_tau_csv)
+        ----------
+        Returns a dictionary with the CACHE_COLUMNS: 'Date' (int64 nanoseconds
+        since epoch, sorted), 'Tau' (float64) and the calendar fields (see
+        calendar_fields), and the signature of the data (see data_signature).
+        Its offset is the end of the rows, the lines after it are new.
+    """
+    if cache:
+        loaded = load_tau_cache(path)
+        if loaded is not None:
+            return loaded
+
+    # The size is taken first, the lines written meanwhile are new lines
+    offset = os.path.getsize(path)
+    date, tau = read_tau_csv(path, parser=parser, size=offset)
+
+    # The rest of the library relies on time sorted data
+    if np.any(date[1:] < date[:-1]):
+        print_msg('Tau file not sorted by date, sorting it', 'warning')
+        order = np.argsort(date, kind='stable')
+        date = date[order]
+        tau = tau[order]
+
+    columns = calendar_fields(date)
+    columns.update({'Date': date, 'Tau': tau})
+    meta = data_signature(path, len(date), offset)
+
+    if cache and cache != 'read':
+        try:
+            save_tau_cache(path, columns, meta)
+        except (IOError, OSError) as e:
+            print_msg('Binary cache not written: '+str(e), 'warning')
+
+    return columns, meta
+
+
+def read_tau_tail(path, offset, parser='fast'):
+    """
+        Parse the whole lines of a tau file after an offset, the last
+        partial line waits for the next read
+        Parameters
+        ----------
+        path : string
+            Opacity data path
+        offset : int
+            Bytes of the file already parsed
+        parser : string
+            Csv parser: 'fast' or 'infer' (see read_tau_csv)
+        ----------
+        Returns a dictionary with the CACHE_COLUMNS of the new lines (as
+        load_tau_file) and the new offset. Raises ValueError if the file
+        is shorter than the offset.
+    """
+    size = os.path.getsize(path)
+    if size < offset:
+        raise ValueError('Tau file shorter than the lines already loaded, it has to be loaded again')
+
+    # 8 bytes of padding for the fast parser
+    with profile_stage('read'):
+        buf = np.zeros(size - offset + 8, dtype=np.uint8)
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            size = f.readinto(memoryview(buf)[:size-offset])
+
+    newlines = np.flatnonzero(buf[:size] == ord('\n'))
+    n_bytes = newlines[-1] + 1 if len(newlines) > 0 else 0
+    # End of line of a file that was loaded without it
+    first = 0
+    while first < n_bytes and int(buf[first]) in b'\r\n':
+        first += 1
+
+    if first < n_bytes:
+        date, tau = parse_tau_buffer(buf[first:], n_bytes - first, parser)
+    else:
+        date, tau = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)
+
+    columns = calendar_fields(date)
+    columns.update({'Date': date, 'Tau': tau})
+
+    return columns, offset + n_bytes
+
+
+def grow_array(buffer, n_points, values):
+    """
+        Append values after the first rows of a buffer. The buffer grows by
+        GROWTH_FACTOR when it is full, the copies are amortized.
+        Parameters
+        ----------
+        buffer : array
+            Buffer, its first n_points rows are kept
+        n_points : int
+            Rows of the buffer in use
+        values : array
+            New rows
+        ----------
+        Returns the buffer, or a new one if it was full
+    """
+    needed = n_points + len(values)
+    if len(buffer) < needed or not buffer.flags.writeable:
+        grown = np.empty(max(needed, int(GROWTH_FACTOR*len(buffer))), dtype=buffer.dtype)
+        grown[:n_points] = buffer[:n_points]
+        buffer = grown
+    buffer[n_points:needed] = values
+
+    return buffer
+
+
+def read_tau_chunks(path, chunk_size=STREAM_CHUNK, parser='fast'):
+    """
+        Read a tau file by chunks of whole lines. Only one chunk is in
+        memory at a time, whatever the size of the file.
+        Parameters
+        ----------
+        path : string
+            Opacity data path
+        chunk_size : int
+            Bytes of the file per chunk
+        parser : string
+            Csv parser: 'fast' or 'infer' (see read_tau_csv). The fast parser
+            falls back to 'infer' chunk by chunk.
+        ----------
+        Yields dictionaries with the CACHE_COLUMNS of consecutive lines, as
+        load_tau_file. The file has to be sorted by date.
+    """
+    if parser not in ['fast', 'infer']:
+        raise ValueError('Parser not valid: '+str(parser))
+
+    # 8 bytes of padding for the fast parser
+    buf = np.zeros(chunk_size+8, dtype=np.uint8)
+    last_date = None
+    n_left = 0
+
+    with open(path, 'rb') as f:
+        while True:
+            with profile_stage('read'):
+                n_read = f.readinto(memoryview(buf)[n_left:chunk_size])
+            size = n_left + n_read
+            if size == 0:
+                break
+
+            # Whole lines only, the last partial line waits for the next chunk
+            if n_read == 0:
+                n_bytes = size
+            else:
+                newlines = np.flatnonzero(buf[:size] == ord('\n'))
+                if len(newlines) == 0:
+                    raise ValueError('Line longer than the chunk size')
+                n_bytes = newlines[-1] + 1
+
+            date, tau = parse_tau_buffer(buf, n_bytes, parser)
+
+            if len(date) > 0:
+                if np.any(date[1:] < date[:-1]) or (last_date is not None and date[0] < last_date):
+                    raise ValueError('Tau file not sorted by date, it can not be streamed')
+                last_date = date[-1]
+
+                columns = calendar_fields(date)
+                columns.update({'Date': date, 'Tau': tau})
+                yield columns
+
+            if n_read == 0:
+                break
+
+            # The partial line goes to the beginning of the buffer
+            n_left = size - n_bytes
+            buf[:n_left] = buf[n_bytes:size]
+
+
+# PARTITIONED STORE
+# The tau file split by year and month: one directory per month
+# (<store>/YYYY-MM) with the CACHE_COLUMNS of its rows as .npy files, and
+# the rows of every partition in <store>/partitions.json. The rows are
+# sorted by date, so a partition is also a span of rows of raw_data (see
+# calendar_spans): the -yr and -mn clauses of a filter only open, or scan,
+# the matching months.
+def store_paths(store_dir, name):
+    """
+        Paths of the columns of a partition
+        Parameters
+        ----------
+        store_dir : string
+            Directory of the store
+        name : string
+            Partition, YYYY-MM
+        ----------
+    """
+    return {column: os.path.join(store_dir, name, column + '.npy') for column in CACHE_COLUMNS}
+
+
+def month_keys(years, months):
+    """
+        Months since 1970-01 of the years and months of a filter
+        Parameters
+        ----------
+        years : int list
+            Years (empty: all of them)
+        months : int list
+            Months (empty: all of them)
+        ----------
+        Returns the first and last+1 month of every span, sorted
+    """
+    years = np.asarray(years, dtype=np.int64)
+    if len(months) == 0:
+        first = (years - 1970)*12
+        return first, first + 12
+
+    first = ((years[:, None] - 1970)*12 + np.asarray(months, dtype=np.int64)[None, :] - 1).ravel()
+    first.sort()
+    return first, first + 1
+
+
+def calendar_spans(timestamps, years, months):
+    """
+        Spans of rows of the years and months of a filter
+        Parameters
+        ----------
+        timestamps : int64 array
+            Timestamps, nanoseconds since epoch, sorted
+        years : int list
+            Years (empty: all of them)
+        months : int list
+            Months (empty: all of them)
+        ----------
+        Returns the first and last+1 rows of every span, without empty or
+        contiguous spans
+    """
+    if len(timestamps) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    limits = np.array([timestamps[0], timestamps[-1]]).astype('datetime64[ns]').astype('datetime64[Y]').astype(np.int64) + 1970
+    if len(years) == 0:
+        years = np.arange(limits[0], limits[1]+1)
+    years = np.asarray(years, dtype=np.int64)
+    years = years[(years >= limits[0]) & (years <= limits[1])]
+
+    first, last = month_keys(years, months)
+    edges = np.concatenate([first, last]).astype('datetime64[M]').astype('datetime64[ns]').view(np.int64)
+    bounds = np.searchsorted(timestamps, edges, side='left')
+    first, last = bounds[:len(first)], bounds[len(first):]
+
+    # Without empty spans, the contiguous ones are joined
+    keep = last > first
+    first, last = first[keep], last[keep]
+    starts = np.ones(len(first), dtype=bool)
+    starts[1:] = first[1:] != last[:-1]
+    ends = np.ones(len(first), dtype=bool)
+    ends[:-1] = starts[1:]
+    return first[starts], last[ends]
+
+
+def save_tau_partitions(store_dir, columns):
+    """
+        Write the partitioned store of a tau file. Every file is written to
+        a temporal name and then renamed, the list of partitions goes last.
+        Parameters
+        ----------
+        store_dir : string
+            Directory of the store
+        columns : dictionary
+            Arrays of the CACHE_COLUMNS, sorted by date
+        ----------
+        Returns the partitions written: {YYYY-MM: rows}
+    """
+    keys = columns['yr'].astype(np.int64)*12 + columns['mn'] - 1
+    starts = np.flatnonzero(np.diff(keys)) + 1
+    firsts = np.concatenate([[0], starts]).astype(np.int64)
+    lasts = np.append(starts, len(keys)).astype(np.int64)
+
+    tmp_suffix = '.tmp' + str(os.getpid())
+    partitions = {}
+    for first, last in zip(firsts, lasts):
+        if last == first:
+            continue
+        name = '{:04d}-{:02d}'.format(keys[first]//12, keys[first] % 12 + 1)
+        paths = store_paths(store_dir, name)
+        os.makedirs(os.path.join(store_dir, name), exist_ok=True)
+        for column in CACHE_COLUMNS:
+            with open(paths[column] + tmp_suffix, 'wb') as f:
+                np.save(f, columns[column][first:last])
+            os.replace(paths[column] + tmp_suffix, paths[column])
+        partitions[name] = int(last - first)
+
+    save_cache_meta(os.path.join(store_dir, 'partitions.json'), {'version': STORE_VERSION, 'partitions': partitions})
+
+    return partitions
+
+
+def load_tau_partitions(store_dir, filter_chain=None):
+    """
+        Load the partitions of a store, as read-only memory maps. Only the
+        partitions of the -yr and -mn clauses of a filter are opened, the
+        rest of the clauses are not applied.
+        Parameters
+        ----------
+        store_dir : string
+            Directory of the store
+        filter_chain : string or filter_spec
+            Filter chain, as '-yr 2016 -mn 3' (None: all the partitions)
+        ----------
+        Returns a dictionary with the CACHE_COLUMNS (memory maps for one
+        partition, arrays for more) and the metadata of the store: the
+        partitions loaded and the rows. Raises ValueError if the store is
+        not valid.
+    """
+    try:
+        with open(os.path.join(store_dir, 'partitions.json')) as f:
+            meta = json.load(f)
+    except (IOError, ValueError):
+        raise ValueError('Partitioned store not valid: '+store_dir)
+    if meta.get('version') != STORE_VERSION:
+        raise ValueError('Partitioned store of another version: '+store_dir)
+
+    names = sorted(meta['partitions'])
+    if filter_chain is not None:
+        spec = filter_chain if isinstance(filter_chain, filter_spec) else parse_filter_chain(filter_chain)
+        names = [name for name in names if (not spec.yr or int(name[:4]) in spec.yr) and
+                 (not spec.mn or int(name[5:]) in spec.mn)]
+
+    with profile_stage('read'):
+        parts = [{column: np.load(path, mmap_mode='r') for column, path in store_paths(store_dir, name).items()}
+                 for name in names]
+    if len(parts) == 1:
+        columns = parts[0]
+    elif len(parts) > 1:
+        columns = {column: np.concatenate([part[column] for part in parts]) for column in CACHE_COLUMNS}
+    else:
+        columns = {'Date': np.zeros(0, dtype=np.int64), 'Tau': np.zeros(0)}
+        columns.update({name: np.zeros(0, dtype=CALENDAR_DTYPES[name]) for name in CALENDAR_FIELDS})
+
+    return columns, {'store': store_dir, 'partitions': names, 'n_points': len(columns['Date'])}
+
+
+# COMPACT SAMPLES
+# Samples in 8 bytes per row (12 with the rows of raw_data) instead of the
+# 16 bytes of the Date and Tau columns of a dataframe (24 with the index of
+# the filtered samples). The dates are kept to the second, within 68 years
+# of the epoch of the sample, and tau to 7 significant digits.
+NS_SECOND = 1000000000
+
+
+class tau_compact():
+    """
+        Opacity sample with int32 seconds since an epoch and float32 tau
+        Parameters
+        ----------
+        epoch : int
+            Epoch of the sample, seconds since 1970-01-01
+        seconds : int32 array
+            Dates, seconds since the epoch of the sample
+        tau : float32 array
+            Opacity
+        rows : int32 array
+            Rows of raw_data (None: not taken from raw_data)
+        ----------
+    """
+    __slots__ = ('epoch', 'seconds', 'tau', 'rows')
+
+    def __init__(self, epoch, seconds, tau, rows=None):
+        self.epoch = int(epoch)
+        self.seconds = seconds
+        self.tau = tau
+        self.rows = rows
+
+
+    def __len__(self):
+        return len(self.seconds)
+
+
+    @property
+    def nbytes(self):
+        """
+            Bytes held by the arrays of the sample
+        """
+        rows = 0 if self.rows is None else self.rows.nbytes
+        return self.seconds.nbytes + self.tau.nbytes + rows
+
+
+    def dates(self):
+        """
+            Dates of the sample, int64 nanoseconds since epoch
+        """
+        return (self.seconds.astype(np.int64) + self.epoch)*NS_SECOND
+
+
+    def take(self, positions):
+        """
+            Rows of the sample at some positions (a copy)
+            Parameters
+            ----------
+            positions : int array
+                Positions of the rows
+            ----------
+        """
+        rows = None if self.rows is None else self.rows[positions]
+        return tau_compact(self.epoch, self.seconds[positions], self.tau[positions], rows)
+
+
+    def span(self, first, last):
+        """
+            Rows of the sample from first to last+1 (a view)
+            Parameters
+            ----------
+            first : int
+                First row
+            last : int
+                Last row + 1
+            ----------
+        """
+        rows = None if self.rows is None else self.rows[first:last]
+        return tau_compact(self.epoch, self.seconds[first:last], self.tau[first:last], rows)
+
+
+    def to_frame(self):
+        """
+            The sample as a dataframe with the Date and Tau columns, indexed
+            by the rows of raw_data when they are known
+        """
+        frame = pd.DataFrame({'Date': self.dates().view('datetime64[ns]'), 'Tau': self.tau.astype(np.float64)})
+        if self.rows is not None:
+            frame.index = self.rows.astype(np.int64)
+        return frame
+
+
+def compact_sample(date, tau, rows=None):
+    """
+        Compact sample of timestamps and tau
+        Parameters
+        ----------
+        date : int64 array
+            Timestamps, nanoseconds since epoch, sorted
+        tau : float array
+            Opacity
+        rows : int array
+            Rows of raw_data (None: not taken from raw_data)
+        ----------
+        Returns a tau_compact. Raises ValueError if the dates do not fit in
+        int32 seconds
+    """
+    seconds = np.asarray(date, dtype=np.int64)//NS_SECOND
+    epoch = int(seconds[0]) if len(seconds) > 0 else 0
+    seconds = seconds - epoch
+    if len(seconds) > 0 and seconds[-1] > np.iinfo(np.int32).max:
+        raise ValueError('The dates span more than 68 years, too long for a compact sample')
+    if rows is not None:
+        rows = np.asarray(rows).astype(np.int32)
+
+    return tau_compact(epoch, seconds.astype(np.int32), np.asarray(tau, dtype=np.float32), rows)
+
+
+def is_sample(sample):
+    """
+        Check if a sample is held in memory, as a dataframe or as a compact
+        sample, and not a stream of chunks
+        Parameters
+        ----------
+        sample : 
+            Datetime data sample or stream of chunks
+        ----------
+    """
+    return isinstance(sample, (pd.DataFrame, tau_compact))
+
+
+# CALENDAR FUNCTIONS
+def sample_dates(sample):
+    """
+        Timestamps of a sample
+        Parameters
+        ----------
+        sample : pandas dataframe or tau_compact
+            Datetime data sample
+        ----------
+        Returns int64 nanoseconds since epoch
+    """
+    if isinstance(sample, tau_compact):
+        return sample.dates()
+    return sample['Date'].values.astype('datetime64[ns]').view(np.int64)
+
+
+def sample_tau(sample):
+    """
+        Opacity of a sample
+        Parameters
+        ----------
+        sample : pandas dataframe or tau_compact
+            Datetime data sample
+        ----------
+        Returns a float array, float32 for the compact samples
+    """
+    if isinstance(sample, tau_compact):
+        return sample.tau
+    return sample['Tau'].values
+
+
+def sample_span(sample, first, last):
+    """
+        Rows of a sample from first to last+1, without copies
+        Parameters
+        ----------
+        sample : pandas dataframe or tau_compact
+            Datetime data sample
+        first : int
+            First row
+        last : int
+            Last row + 1
+        ----------
+    """
+    if isinstance(sample, tau_compact):
+        return sample.span(first, last)
+    return sample.iloc[first:last]
+
+
+def print_sample(sample):
+    """
+        Print the size and the dates of a sample
+        Parameters
+        ----------
+        sample : pandas dataframe or tau_compact
+            Datetime data sample
+        ----------
+    """
+    n_points = len(sample)
+    print_msg('No. of sample points: '+str(n_points), 'verb')
+    if n_points > 0:
+        date = sample_dates(sample)
+        print_msg('Data from: '+ str(pd.Timestamp(date[0])) + ' to: ' + str(pd.Timestamp(date[n_points-1])), 'verb')
+
+
+def calendar_fields(date):
+    """
+        Calendar fields of timestamps
+        Parameters
+        ----------
+        date : int64 array
+            Timestamps, nanoseconds since epoch
+        ----------
+        Returns a dictionary with the fields, named as the filter commands:
+        'yr' (uint16), 'mn', 'dy', 'hr', 'mt' (uint8) and 'tm' (uint16,
+        minutes since midnight)
+    """
+    date = np.asarray(date, dtype=np.int64)
+
+    days = date // NS_DAY
+    minutes = (date - days*NS_DAY) // NS_MINUTE
+
+    # Consecutive samples share the day, only the first of every run is
+    # converted to a calendar date
+    new_day = np.ones(len(days), dtype=bool)
+    new_day[1:] = days[1:] != days[:-1]
+    runs = np.flatnonzero(new_day)
+    lengths = np.diff(np.append(runs, len(days)))
+
+    run_days = days[runs].astype('datetime64[D]')
+    run_months = run_days.astype('datetime64[M]')
+    run_years = run_months.astype('datetime64[Y]')
+
+    fields = {
+        'yr': np.repeat((run_years.astype(np.int64) + 1970).astype(CALENDAR_DTYPES['yr']), lengths),
+        'mn': np.repeat((run_months.astype(np.int64) % 12 + 1).astype(CALENDAR_DTYPES['mn']), lengths),
+        'dy': np.repeat(((run_days - run_months).astype(np.int64) + 1).astype(CALENDAR_DTYPES['dy']), lengths),
+        'hr': (minutes // 60).astype(CALENDAR_DTYPES['hr']),
+        'mt': (minutes % 60).astype(CALENDAR_DTYPES['mt']),
+        'tm': minutes.astype(CALENDAR_DTYPES['tm'])
+    }
+
+    return fields
+
+
+# FILTER CHAINS
+# Valid values of every filter command
+FIELD_LIMITS = {'t': (0, None), 'yr': (0, 9999), 'mn': (1, 12), 'dy': (1, 31), 'hr': (0, 23), 'mt': (0, 59), 'tm': (0, DAY_MINUTES)}
+FIELD_NAMES = {'t': 'Tau value', 'yr': 'Year', 'mn': 'Month', 'dy': 'Day', 'hr': 'Hour', 'mt': 'Minute', 'tm': 'Time of day'}
+# Fields whose ranges wrap around, as -hr 19-6
+CYCLIC_FIELDS = ['mn', 'dy', 'hr', 'mt']
+# Time groups of the statistics
+TIME_GROUPS = ['yr', 'mn', 'dy', 'ng', 'hr', 'mt']
+# Filter and group chains kept parsed
+CHAIN_CACHE_SIZE = 1024
+
+# Parsed filter chain
+#   t : maximum tau (None: no filter)
+#   yr, mn, dy, hr, mt : tuples with the accepted values (empty: no filter)
+#   ng : filter per nights. True: the hours of the night, or the name of a
+#   twilight (see TWILIGHTS): from the dusk to the dawn of every date
+#   tm : tuple with the accepted time of day intervals, (first, end) minutes
+#   since midnight, see parse_intervals (empty: no filter)
+filter_spec = namedtuple('filter_spec', ['t', 'yr', 'mn', 'dy', 'hr', 'mt', 'ng', 'tm'])
+filter_spec.__new__.__defaults__ = ((),)
+
+# Parsed group chain of the statistics
+#   cmd : time group (yr, mn, dy, hr, mt)
+#   value : number of time units per group
+group_spec = namedtuple('group_spec', ['cmd', 'value'])
+
+
+def valid_value(value, field):
+    """
+        Check a value of a filter command
+        Parameters
+        ----------
+        value : int or float
+            Value
+        field : string
+            Filter command: t, yr, mn, dy, hr, mt
+        ----------
+    """
+    low, high = FIELD_LIMITS[field]
+    if value < low or (high is not None and value > high):
+        print_msg(FIELD_NAMES[field]+' not valid! It will be ignored', 'error')
+        return False
+
+    return True
+
+
+def parse_values(token, field):
+    """
+        Values of a filter command: comma separated numbers and ranges
+        (first-last). The ranges of months, days, hours and minutes wrap
+        around, -hr 19-6 goes from 19 to 23 and from 0 to 6.
+        Parameters
+        ----------
+        token : string
+            Values, as 2,3,4 or 19-6
+        field : string
+            Filter command: t, yr, mn, dy, hr, mt
+        ----------
+    """
+    values = []
+    for item in token.split(','):
+        if item == '':
+            continue
+
+        if field == 't':
+            try:
+                value = float(item)
+            except ValueError:
+                print_msg('Value: '+item+' is not valid', 'error')
+                continue
+            if valid_value(value, field):
+                values.append(value)
+            continue
+
+        # Numbers, negative ones are rejected by the validation
+        try:
+            bounds = [int(item)]
+        except ValueError:
+            try:
+                bounds = [int(bound) for bound in item.split('-')]
+            except ValueError:
+                bounds = []
+            if len(bounds) != 2:
+                print_msg('Value: '+item+' is not valid', 'error')
+                continue
+
+        if not all([valid_value(bound, field) for bound in bounds]):
+            continue
+
+        first, last = bounds[0], bounds[-1]
+        if first <= last:
+            values.extend(range(first, last+1))
+        elif field in CYCLIC_FIELDS:
+            low, high = FIELD_LIMITS[field]
+            values.extend(range(first, high+1))
+            values.extend(range(low, last+1))
+        else:
+            print_msg('Range: '+item+' is not valid', 'error')
+
+    return values
+
+
+def day_minute(text):
+    """
+        Minutes since midnight of a time of day, HH:MM
+        Parameters
+        ----------
+        text : string
+            Time of day, from 00:00 to 24:00
+        ----------
+    """
+    hr, mt = text.split(':')
+    hr, mt = int(hr), int(mt)
+    if mt < 0 or mt > 59:
+        raise ValueError('Minute out of range')
+
+    return 60*hr + mt
+
+
+def parse_intervals(token):
+    """
+        Time of day intervals of the -tm command: comma separated
+        first-end times (HH:MM-HH:MM), from the first time up to the end
+        one, not included. The intervals wrap around midnight, 19:30-06:30
+        goes from 19:30 to 23:59 and from 00:00 to 06:29. Equal times take
+        the whole day.
+        Parameters
+        ----------
+        token : string
+            Intervals, as 19:30-06:30 or 07:00-09:00,12:00-13:30
+        ----------
+        Returns a list of (first, end) minutes since midnight, 0-1439
+    """
+    intervals = []
+    for item in token.split(','):
+        if item == '':
+            continue
+
+        try:
+            bounds = [day_minute(bound) for bound in item.split('-')]
+        except ValueError:
+            bounds = []
+        if len(bounds) != 2:
+            print_msg('Interval: '+item+' is not valid', 'error')
+            continue
+
+        if all([valid_value(bound, 'tm') for bound in bounds]):
+            intervals.append((bounds[0] % DAY_MINUTES, bounds[1] % DAY_MINUTES))
+
+    return intervals
+
+
+@lru_cache(maxsize=CHAIN_CACHE_SIZE)
+def parse_filter_chain(filter_chain):
+    """
+        Parse a filter chain once, the result is cached
+        Parameters
+        ----------
+        filter_chain : string
+            Filter chain, as '-yr 2018 -mn 12 -hr 19-6'
+        ----------
+        Returns a filter_spec
+    """
+    values = {'t': [], 'yr': [], 'mn': [], 'dy': [], 'hr': [], 'mt': [], 'tm': []}
+    night = False
+
+    cmd = None
+    for token in filter_chain.split():
+        # Commands start with '-' and a letter, '-25' is a value
+        if token[0] == '-' and token[1:2].isalpha():
+            cmd = token[1:]
+            if cmd == 'ng':
+                night = True
+            elif cmd not in values:
+                print_msg('Command: '+cmd+' is not valid', 'error')
+        elif cmd == 'ng':
+            if token in TWILIGHTS:
+                night = token
+            else:
+                print_msg('Twilight: '+token+' is not valid', 'error')
+        elif cmd == 'tm':
+            values[cmd].extend(parse_intervals(token))
+        elif cmd in values:
+            values[cmd].extend(parse_values(token, cmd))
+
+    t = np.min(values['t']) if values['t'] else None
+    fields = [tuple(sorted(set(values[name]))) for name in LUT_FIELDS]
+
+    return filter_spec(t, *fields, ng=night, tm=tuple(sorted(set(values['tm']))))
+
+
+@lru_cache(maxsize=CHAIN_CACHE_SIZE)
+def parse_group_chain(group_string):
+    """
+        Parse a group chain of the statistics once, the result is cached
+        Parameters
+        ----------
+        group_string : string
+            Group chain, as '-mn 1'
+        ----------
+        Returns a group_spec. Raises ValueError if the chain is not valid
+    """
+    tokens = group_string.split()
+    cmd = tokens[0][1:] if tokens and tokens[0][0] == '-' else ''
+
+    # Check the command is valid
+    if cmd not in TIME_GROUPS:
+        raise ValueError('Command: '+ cmd +' is not valid')
+
+    # Check that value is valid
+    val = tokens[1] if len(tokens) > 1 else ''
+    try:
+        value = int(val)
+    except ValueError:
+        raise ValueError('Value: '+ val +' is not valid')
+    if value < 1:
+        raise ValueError('Value: '+ val +' is not valid')
+
+    return group_spec(cmd, value)
+
+
+def filter_luts(spec, night=NIGHT_HOURS):
+    """
+        Lookup tables of the calendar clauses of a filter
+        Parameters
+        ----------
+        spec : filter_spec
+            Filter
+        night : int list
+            Hours of the night, for the ng clause
+        ----------
+        Returns a list of (field, boolean table indexed by the field value)
+    """
+    hrs = spec.hr
+    # Defining nights. The twilights are evaluated per date in filter_rows
+    if spec.ng and spec.ng not in TWILIGHTS:
+        hrs = night
+
+    luts = []
+    for name, values in zip(LUT_FIELDS, [spec.yr, spec.mn, spec.dy, hrs, spec.mt]):
+        if len(values) > 0:
+            lut = np.zeros(np.iinfo(CALENDAR_DTYPES[name]).max+1, dtype=bool)
+            lut[np.asarray(values, dtype=np.int64)] = True
+            luts.append((name, lut))
+
+    return luts
+
+
+def interval_mask(minutes, intervals):
+    """
+        Mask of the times of day inside any of the intervals. Every interval
+        is a single comparison of unsigned differences, which wrap around
+        as the intervals through midnight do.
+        Parameters
+        ----------
+        minutes : uint16 array
+            Minutes since midnight
+        intervals : list
+            (first, end) minutes since midnight, see parse_intervals
+        ----------
+    """
+    mask = np.zeros(len(minutes), dtype=bool)
+    for first, end in intervals:
+        if first < end:
+            # minutes in [first, end)
+            mask |= (minutes - np.uint16(first)) < np.uint16(end - first)
+        else:
+            # minutes not in [end, first)
+            mask |= (minutes - np.uint16(end)) >= np.uint16(first - end)
+
+    return mask
+
+
+def filter_rows(n_points, spec, tau, luts, fields, rows=None):
+    """
+        Mask of the rows accepted by a filter, evaluated by blocks of rows
+        Parameters
+        ----------
+        n_points : int
+            Number of rows
+        spec : filter_spec
+            Filter, for the tau, time of day and twilight clauses
+        tau : float array
+            Opacity of the rows
+        luts : list
+            Calendar clauses, see filter_luts
+        fields : dictionary
+            Calendar fields of the rows, or of the rows of raw_data
+        rows : int array
+            Rows of raw_data (None: the fields are the ones of the rows)
+        ----------
+    """
+    def field_block(name):
+        if rows is None:
+            return fields[name][start:stop]
+        return fields[name][rows[start:stop]]
+
+    mask = np.ones(n_points, dtype=bool)
+    for start in range(0, n_points, FILTER_BLOCK):
+        stop = start + FILTER_BLOCK
+        block = mask[start:stop]
+        # For tau
+        if spec.t is not None:
+            block &= tau[start:stop] < spec.t
+        # For times of day
+        if spec.tm:
+            block &= interval_mask(field_block('tm'), spec.tm)
+        # For nights between twilights
+        if spec.ng in TWILIGHTS:
+            calendar = {name: field_block(name) for name in ['yr', 'mn', 'dy', 'tm']}
+            block &= twilight_mask(calendar, spec.ng)
+        # For years, months, days, hours and minutes. A block without
+        # rows left skips the rest of the clauses
+        for name, lut in luts:
+            if rows is None:
+                block &= lut[fields[name][start:stop]]
+            else:
+                block &= lut[fields[name][rows[start:stop]]]
+            if not block.any():
+                break
+
+    return mask
+
+
+# ASTRONOMICAL NIGHTS
+# Dusk and dawn at the LMT site from the closed-form solar position of the
+# NOAA (fractional year series of the equation of time and the declination),
+# good to a minute or so. They are computed for all the dates of a year at
+# once, kept per year, and stored by date: (month - 1)*31 + day - 1, the
+# days that do not exist are never read.
+
+
+def solar_events(days, zenith):
+    """
+        Local times of the dawn and the dusk at the LMT site, where the
+        Sun crosses a zenith angle
+        Parameters
+        ----------
+        days : int array
+            Dates, days since epoch
+        zenith : float
+            Zenith angle of the Sun, degrees, see TWILIGHTS
+        ----------
+        Returns the dawn and the dusk, minutes since midnight (float)
+    """
+    date = np.asarray(days, dtype=np.int64).astype('datetime64[D]')
+    year = date.astype('datetime64[Y]')
+    year_days = ((year + 1).astype('datetime64[D]') - year.astype('datetime64[D]')).astype(np.int64)
+    day_of_year = (date - year.astype('datetime64[D]')).astype(np.int64)
+
+    # Fractional year at the local noon, radians
+    gamma = 2*np.pi/year_days*(day_of_year + (12 - SITE_UTC_OFFSET - 12)/24.)
+    # Equation of time, minutes
+    eqtime = 229.18*(0.000075 + 0.001868*np.cos(gamma) - 0.032077*np.sin(gamma)
+                     - 0.014615*np.cos(2*gamma) - 0.040849*np.sin(2*gamma))
+    # Declination, radians
+    decl = (0.006918 - 0.399912*np.cos(gamma) + 0.070257*np.sin(gamma) - 0.006758*np.cos(2*gamma)
+            + 0.000907*np.sin(2*gamma) - 0.002697*np.cos(3*gamma) + 0.00148*np.sin(3*gamma))
+
+    # Hour angle of the Sun at the zenith angle, degrees. Polar days and
+    # nights can not happen at the site, the clip only guards the rounding
+    lat = np.radians(SITE_LATITUDE)
+    cos_ha = np.cos(np.radians(zenith))/(np.cos(lat)*np.cos(decl)) - np.tan(lat)*np.tan(decl)
+    ha = np.degrees(np.arccos(np.clip(cos_ha, -1, 1)))
+
+    # Solar noon, local minutes
+    noon = 720 - 4*SITE_LONGITUDE - eqtime + 60*SITE_UTC_OFFSET
+
+    return noon - 4*ha, noon + 4*ha
+
+
+@lru_cache(maxsize=None)
+def twilight_year(twilight, year):
+    """
+        Dawn and dusk of every date of a year, computed once
+        Parameters
+        ----------
+        twilight : string
+            Twilight, see TWILIGHTS
+        year : int
+            Year
+        ----------
+        Returns the dawn and the dusk, uint16 minutes since midnight,
+        indexed by (month - 1)*31 + day - 1
+    """
+    months = np.arange(np.datetime64(str(year)+'-01'), np.datetime64(str(year+1)+'-01'))
+    days = (months.astype('datetime64[D]').astype(np.int64)[:, None] + np.arange(31)).ravel()
+    dawn, dusk = solar_events(days, TWILIGHTS[twilight])
+
+    return np.round(dawn).astype(np.uint16), np.round(dusk).astype(np.uint16)
+
+
+def twilight_mask(fields, twilight):
+    """
+        Mask of the rows between the dusk and the dawn of their date: one
+        lookup of the date and one interval per row. The resolution is the
+        minute.
+        Parameters
+        ----------
+        fields : dictionary
+            Calendar fields of the rows: yr, mn, dy, tm
+        twilight : string
+            Twilight, see TWILIGHTS
+        ----------
+    """
+    years = fields['yr']
+    if len(years) == 0:
+        return np.zeros(0, dtype=bool)
+
+    first = int(years.min())
+    tables = [twilight_year(twilight, year) for year in range(first, int(years.max())+1)]
+    dawn = np.concatenate([table[0] for table in tables])
+    dusk = np.concatenate([table[1] for table in tables])
+
+    slot = ((years.astype(np.int32) - first)*12 + fields['mn'] - 1)*31 + fields['dy'] - 1
+    minutes = fields['tm']
+
+    return (minutes >= dusk[slot]) | (minutes < dawn[slot])
+
+
+# SEASONAL WINDOWS
+# Daily time window of every month
+#   minutes : boolean array (12, DAY_MINUTES), the minutes of the day in the
+#   window of every month
+window_spec = namedtuple('window_spec', ['minutes'])
+
+
+def seasonal_windows(hours, mask_30min=None):
+    """
+        Daily time window of every month, from its hours and the half hour
+        extensions at both ends
+        Parameters
+        ----------
+        hours : list
+            Hours of every month (12 lists). The hours of a month follow
+            each other and may go through midnight: [20,21,22,23,0,1,...]
+        mask_30min : boolean array (12, 2)
+            Per month, add the half hour before the first hour (minutes
+            30-59 of the hour before) and after the last hour (minutes 0-29
+            of the hour after). Example: hours [12,13,14] and [True, True]
+            give the window 11:30 - 15:30
+        ----------
+        Returns a window_spec
+    """
+    if len(hours) != 12:
+        raise ValueError('Hours of 12 months expected')
+
+    minutes = np.zeros((12, DAY_MINUTES), dtype=bool)
+    for m in range(12):
+        month_hours = [int(hr) for hr in hours[m] if valid_value(hr, 'hr')]
+        for hr in month_hours:
+            minutes[m, 60*hr:60*hr+60] = True
+
+        if mask_30min is None or len(month_hours) == 0:
+            continue
+        # At the beginning
+        if mask_30min[m][0]:
+            hr = (month_hours[0] - 1) % 24
+            minutes[m, 60*hr+30:60*hr+60] = True
+        # At the end
+        if mask_30min[m][1]:
+            hr = (month_hours[-1] + 1) % 24
+            minutes[m, 60*hr:60*hr+30] = True
+
+    return window_spec(minutes)
+
+
+@lru_cache(maxsize=1)
+def morning_window():
+    """
+        Morning window (07:00 - 10:59) of every month, built the first time
+        it is asked for
+    """
+    return seasonal_windows([[7, 8, 9, 10]]*12)
+
+
+def window_rows(fields, window):
+    """
+        Mask of the rows inside the window of their month
+        Parameters
+        ----------
+        fields : dictionary
+            Calendar fields of the rows
+        window : window_spec
+            Daily window of every month
+        ----------
+    """
+    lut = window.minutes.ravel()
+    n_points = len(fields['mn'])
+
+    mask = np.empty(n_points, dtype=bool)
+    for start in range(0, n_points, FILTER_BLOCK):
+        stop = start + FILTER_BLOCK
+        minute = (fields['mn'][start:stop].astype(np.int32) - 1)*DAY_MINUTES + fields['tm'][start:stop]
+        mask[start:stop] = lut[minute]
+
+    return mask
+
+
+# SERIES INDEX
+# Segments of the tau series sampled without gaps, and rows that repeat the
+# date of the row before. Built once from the timestamps, O(n), then the
+# coverage of every year or month comes from binary searches over it.
+#   cadence : int, sampling period, median of the steps between dates (ns)
+#   starts, ends : int arrays, first and last+1 rows of every segment
+#   duplicates : int array, rows with the same date as the row before
+series_index = namedtuple('series_index', ['cadence', 'starts', 'ends', 'duplicates'])
+# Steps longer than these cadences break the segments
+GAP_CADENCES = 5
+# Columns of the coverage
+COVERAGE_COLUMNS = ['Date', 'n_points', 'duplicates', 'n_gaps', 'gap_time', 'coverage']
+
+
+def index_series(date, gap=None):
+    """
+        Segments, gaps and duplicates of a series of dates
+        Parameters
+        ----------
+        date : int64 array
+            Timestamps, nanoseconds since epoch, sorted
+        gap : int
+            Shortest gap, nanoseconds (None: GAP_CADENCES times the cadence)
+        ----------
+        Returns a series_index
+    """
+    steps = np.diff(date)
+    duplicates = np.flatnonzero(steps == 0) + 1
+    positive = steps[steps > 0]
+    cadence = int(np.median(positive)) if len(positive) > 0 else 0
+    if gap is None:
+        gap = GAP_CADENCES*cadence
+
+    breaks = np.flatnonzero(steps > gap) + 1
+    starts = np.concatenate([np.zeros(min(len(date), 1), dtype=np.int64), breaks])
+    ends = np.append(breaks, len(date)) if len(date) > 0 else breaks
+
+    return series_index(cadence, starts, ends, duplicates)
+
+
+def gap_time(date, index, bounds):
+    """
+        Time inside the gaps before every bound, by binary search over the
+        gaps, O(log(gaps)) per bound
+        Parameters
+        ----------
+        date : int64 array
+            Timestamps, nanoseconds since epoch, sorted
+        index : series_index
+            Index of the dates
+        bounds : int64 array
+            Dates, nanoseconds since epoch
+        ----------
+    """
+    # Gaps from the last date of a segment to the first one of the next
+    gap_from = date[index.ends[:-1] - 1]
+    gap_to = date[index.starts[1:]]
+    before = np.concatenate([[0], np.cumsum(gap_to - gap_from)])
+
+    # Whole gaps before the bound, and the part of the gap it falls in
+    k = np.searchsorted(gap_to, bounds, side='right')
+    inside = np.maximum(bounds - gap_from[np.minimum(k, len(gap_from) - 1)], 0) if len(gap_from) > 0 else 0
+
+    return before[k] + np.where(k < len(gap_from), inside, 0)
+
+
+def coverage_frame(date, index, cmd='mn'):
+    """
+        Coverage of every year or month between the first and last dates
+        Parameters
+        ----------
+        date : int64 array
+            Timestamps, nanoseconds since epoch, sorted (not empty)
+        index : series_index
+            Index of the dates
+        cmd : string
+            yr or mn
+        ----------
+        Returns a frame with the COVERAGE_COLUMNS, dated the first day of
+        the year or month: the samples, the duplicated ones, the gaps that
+        end in it, their time and the samples found over the samples
+        expected at the cadence (between the first and last dates).
+    """
+    if cmd not in ['yr', 'mn']:
+        raise ValueError('Coverage per year (yr) or month (mn)')
+
+    freq = 'YS' if cmd == 'yr' else 'MS'
+    first = pd.Timestamp(date[0])
+    init = first.to_period('Y' if cmd == 'yr' else 'M').to_timestamp()
+    labels = pd.date_range(init, pd.Timestamp(date[-1]), freq=freq)
+    bounds = pd.date_range(init, periods=len(labels)+1, freq=freq).values.astype('datetime64[ns]').view(np.int64)
+
+    # Rows of every period, and the duplicates and segment breaks in them
+    rows = np.searchsorted(date, bounds)
+    n_points = np.diff(rows)
+    duplicates = np.diff(np.searchsorted(index.duplicates, rows))
+    n_gaps = np.diff(np.searchsorted(index.starts[1:], rows))
+
+    # Time of the periods inside the data, and of its gaps
+    covered = np.clip(bounds, date[0], date[-1] + index.cadence)
+    gaps = np.diff(gap_time(date, index, covered))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        coverage = (n_points - duplicates)/(np.diff(covered)/index.cadence)
+
+    return pd.DataFrame({'Date': labels.values, 'n_points': n_points, 'duplicates': duplicates, 'n_gaps': n_gaps,
+                         'gap_time': gaps.view('timedelta64[ns]'), 'coverage': coverage}, columns=COVERAGE_COLUMNS)
+
+
+# STATISTICS FUNCTIONS
+# Columns of the statistics
+STAT_COLUMNS = ['Date', 'tau_count', 'tau_mean', 'tau_std', 'tau_25', 'tau_50', 'tau_75', 'tau_max', 'tau_min']
+# Nanoseconds per time unit of the fixed length groups
+NS_UNITS = {'dy': NS_DAY, 'hr': NS_HOUR, 'mt': NS_MINUTE}
+
+
+def time_units(date, cmd, init_ns, end_ns, fields=None):
+    """
+        Time unit (year, month, day, hour or minute) of every sample,
+        counted from the unit of the first date. All the units start at
+        their calendar boundaries, the days at midnight. The number of days
+        is the number of complete days between the first and last dates.
+        Parameters
+        ----------
+        date : int64 array
+            Timestamps, nanoseconds since epoch
+        cmd : string
+            Time group: yr, mn, dy, hr, mt
+        init_ns : int
+            First date of the sample, nanoseconds since epoch
+        end_ns : int
+            Last date of the sample, nanoseconds since epoch
+        fields : dictionary
+            Calendar fields of the samples (only yr and mn are used)
+        ----------
+        Returns the units and the number of units in the sample period.
+        Samples outside of [0, number of units) do not belong to any group.
+    """
+    if cmd in ['yr', 'mn']:
+        if fields is None:
+            fields = calendar_fields(date)
+        init = calendar_fields(np.array([init_ns, end_ns]))
+        years = fields['yr'].astype(np.int64) - int(init['yr'][0])
+        n_years = int(init['yr'][1]) - int(init['yr'][0]) + 1
+        if cmd == 'yr':
+            return years, n_years
+        months = years*12 + fields['mn'].astype(np.int64) - int(init['mn'][0])
+        n_months = (n_years - 1)*12 + int(init['mn'][1]) - int(init['mn'][0]) + 1
+        return months, n_months
+
+    unit = NS_UNITS[cmd]
+    if cmd == 'dy':
+        # Calendar days, only the complete days after the first date count
+        units = date//unit - init_ns//unit
+        n_units = (end_ns - init_ns)//unit
+    else:
+        # Calendar hours or minutes, up to the last date
+        units = date//unit - init_ns//unit
+        n_units = -((init_ns - end_ns)//unit)
+
+    return units, int(n_units)
+
+
+def lerp(low, high, frac):
+    """
+        Linear interpolation, computed as numpy does for the percentiles
+        Parameters
+        ----------
+        low, high : float arrays
+            Values
+        frac : float array
+            Fraction, 0-1
+        ----------
+    """
+    diff = high - low
+    return np.where(frac >= 0.5, high - diff*(1 - frac), low + diff*frac)
+
+
+@profiled('reduce')
+def bin_statistics(bins, tau):
+    """
+        Count, mean, standard deviation, quartiles, maximum and minimum of
+        tau per bin. Sort based segmented reductions, without loops.
+        Parameters
+        ----------
+        bins : int array
+            Bin of every sample
+        tau : float array
+            Opacity of every sample, without nan
+        ----------
+        Returns the bins with samples and a dictionary with the statistics
+        (STAT_COLUMNS, except Date)
+    """
+    order = np.lexsort((tau, bins))
+    bins = bins[order]
+    tau = tau[order]
+
+    starts = np.flatnonzero(np.concatenate([[True], bins[1:] != bins[:-1]])) if len(bins) > 0 else np.zeros(0, dtype=np.int64)
+    counts = np.diff(np.append(starts, len(bins)))
+
+    mean = np.add.reduceat(tau, starts) / counts if len(bins) > 0 else np.zeros(0)
+    dev = tau - np.repeat(mean, counts)
+    sqr = np.add.reduceat(dev*dev, starts) if len(bins) > 0 else np.zeros(0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        std = np.sqrt(sqr / (counts - 1))
+
+    stats = {'tau_count': counts.astype(np.float64), 'tau_mean': mean, 'tau_std': std}
+    for name, q in [('tau_25', 0.25), ('tau_50', 0.5), ('tau_75', 0.75)]:
+        pos = q*(counts - 1)
+        low = np.floor(pos).astype(np.int64)
+        high = np.minimum(low + 1, counts - 1)
+        stats[name] = lerp(tau[starts + low], tau[starts + high], pos - low)
+    stats['tau_max'] = tau[starts + counts - 1]
+    stats['tau_min'] = tau[starts]
+    profile_count('groups', len(starts))
+
+    return bins[starts], stats
+
+
+def bin_labels(init_ns, cmd, value, bins):
+    """
+        Date of every group: the first date plus the time units of the
+        groups before it
+        Parameters
+        ----------
+        init_ns : int
+            First date of the sample, nanoseconds since epoch
+        cmd : string
+            Time group: yr, mn, dy, hr, mt
+        value : int
+            Time units per group
+        bins : int array
+            Groups
+        ----------
+    """
+    if cmd in NS_UNITS:
+        labels = init_ns + bins*value*NS_UNITS[cmd]
+        return labels.astype('datetime64[ns]')
+
+    # Months and years are added one group at a time, as the dates move
+    # when the day does not exist in the next month (31st -> 30th)
+    if cmd == 'yr':
+        delta = pd.DateOffset(years=value)
+    else:
+        delta = pd.DateOffset(months=value)
+    labels = []
+    label = pd.Timestamp(init_ns)
+    for k in range(int(np.max(bins))+1 if len(bins) > 0 else 0):
+        labels.append(label)
+        label = label + delta
+
+    return pd.DatetimeIndex(labels).values.astype('datetime64[ns]')[bins]
+
+
+def statistics_frame(init_ns, cmd, value, bins, stats):
+    """
+        Data frame of the statistics of the groups
+        Parameters
+        ----------
+        init_ns : int
+            First date of the sample, nanoseconds since epoch
+        cmd : string
+            Time group: yr, mn, dy, hr, mt
+        value : int
+            Time units per group
+        bins : int array
+            Groups
+        stats : dictionary
+            Statistics of the groups, see bin_statistics
+        ----------
+    """
+    stats['Date'] = bin_labels(init_ns, cmd, value, bins)
+    return pd.DataFrame(stats, columns=STAT_COLUMNS)
+
+
+def group_statistics(date, tau, cmd, value, init_ns, end_ns, fields=None, quantiles='exact'):
+    """
+        Statistics of the time groups of a sample, counted from a first
+        date
+        Parameters
+        ----------
+        date : int64 array
+            Timestamps, nanoseconds since epoch
+        tau : float64 array
+            Opacity
+        cmd : string
+            Time group: yr, mn, dy, hr, mt
+        value : int
+            Time units per group
+        init_ns, end_ns : int
+            First and last dates of the groups, nanoseconds since epoch
+        fields : dictionary
+            Calendar fields of the samples, see time_units
+        quantiles : string
+            'exact' or 'sketch', see tau_lmt.statistics_sample
+        ----------
+        Returns the groups with samples, their statistics (see
+        bin_statistics) and the number of time units
+    """
+    units, n_units = time_units(date, cmd, init_ns, end_ns, fields)
+
+    valid = (units >= 0) & (units < n_units) & ~np.isnan(tau)
+    if quantiles == 'exact':
+        bins, stats = bin_statistics(units[valid]//value, tau[valid])
+    else:
+        bins, stats = summary_statistics(summarize_groups(units[valid]//value, tau[valid]))
+
+    return bins, stats, n_units
+
+
+# ROLLING STATISTICS
+# Statistics of the samples in a time window that ends at every date,
+# (date - window, date]. Count, mean and std come from cumulative sums. The
+# order statistics (min, quartiles, max) come from a wavelet matrix of the
+# ranks of tau: the k-th value of every window is found with one pass over
+# the bits of the ranks, for all the windows at once, O(log n) per window.
+# Rows of the windows evaluated at once by the rolling statistics
+ROLLING_BLOCK = 1 << 20
+
 
-import pandas as pd
+def wavelet_matrix(ranks, n_bits):
+    """
+        Wavelet matrix of integers: for every bit, from the highest one,
+        the values are stably split by the bit (zeros first), and the
+        number of zeros before every position is kept.
+        Parameters
+        ----------
+        ranks : int array
+            Values, from 0 to 2**n_bits - 1
+        n_bits : int
+            Bits of the values
+        ----------
+        Returns a list with the counts of zeros of every bit (int arrays of
+        len(ranks) + 1 entries)
+    """
+    levels = []
+    current = np.asarray(ranks, dtype=np.int64)
+    dtype = np.int32 if len(current) < 2**31 else np.int64
+    for bit in range(n_bits-1, -1, -1):
+        ones = ((current >> bit) & 1).astype(bool)
+        levels.append(np.concatenate([np.zeros(1, dtype=dtype), np.cumsum(~ones, dtype=dtype)]))
+        current = np.concatenate([current[~ones], current[ones]])
 
-# Interactive plots
-ion()
+    return levels
 
-# Path of the tau lmt file
-FILE_TAU_PATH = "./data/Tau_LMT_Site_(2013-06-01)_(2020-03-21).csv"
 
-# MISCELLANEOUS FUNCTIONS
-# Printing Messages
-def print_msg(msg, alarm_type):
+def wavelet_select(levels, left, right, k):
     """
-        Messages
+        k-th smallest value of ranges of a wavelet matrix
         Parameters
         ----------
-        msg : string
-            Message to show
-        alarm_type : string
-            Kind of message: info, ok, warning, error or verb
+        levels : list
+            Wavelet matrix, see wavelet_matrix
+        left, right : int arrays
+            Ranges, [left, right) (not empty)
+        k : int array
+            Order of the value in every range, from 0
         ----------
     """
-    # Color alarm
-    color_alarms = ['\033[94m', '\033[92m', '\033[93m', '\033[91m', '']
-    # Types of alarms
-    alarms = ['info', 'ok', 'warning', 'error', 'verb']
-    for i, alarm in enumerate(alarms):
-        if alarm == alarm_type:
-            print (color_alarms[i] + msg + '\033[0m')
-            return
+    n_bits = len(levels)
+    dtype = levels[0].dtype
+    left = left.astype(dtype)
+    right = right.astype(dtype)
+    k = k.astype(dtype)
+    value = np.zeros(len(left), dtype=dtype)
+    # Buffers of the level, reused, and steps by arithmetic on 0/1 (masked
+    # steps cost several times more)
+    next_left = np.empty_like(left)
+    next_right = np.empty_like(right)
+    n_zeros = np.empty_like(k)
+    one = np.empty_like(k)
+    for i, zeros in enumerate(levels):
+        np.take(zeros, left, out=next_left)
+        np.take(zeros, right, out=next_right)
+        np.subtract(next_right, next_left, out=n_zeros)
+        # The value has the bit when it is not among the zeros of the range,
+        # the ranges of the ones follow all the zeros of the level
+        np.greater_equal(k, n_zeros, out=one, casting='unsafe')
+        n_zeros *= one
+        k -= n_zeros
+        value |= one << (n_bits - 1 - i)
+        for current, following in [(left, next_left), (right, next_right)]:
+            # following + one*(zeros[-1] + current - 2*following)
+            current -= following
+            current -= following
+            current += zeros[-1]
+            current *= one
+            following += current
+        left, next_left = next_left, left
+        right, next_right = next_right, right
+
+    return value
+
+
+@profiled('reduce')
+def rolling_statistics(date, tau, window_ns, at=None):
+    """
+        Statistics of tau in the time window that ends at every date
+        Parameters
+        ----------
+        date : int64 array
+            Timestamps, nanoseconds since epoch, sorted
+        tau : float array
+            Opacity
+        window_ns : int
+            Length of the window, nanoseconds
+        at : int64 array
+            Ends of the windows, nanoseconds since epoch, in any order
+            (None: the dates)
+        ----------
+        Returns a dictionary with the statistics of every window
+        (STAT_COLUMNS, except Date), in the order of the ends, nan for the
+        windows without samples
+    """
+    date = np.asarray(date, dtype=np.int64)
+    ends = date if at is None else np.asarray(at, dtype=np.int64)
+    # The blocks of windows take consecutive samples: the ends are sorted,
+    # the statistics go back to the order of at
+    order = None
+    if np.any(ends[1:] < ends[:-1]):
+        order = np.argsort(ends, kind='stable')
+        ends = ends[order]
+    valid = ~np.isnan(tau)
+    date = date[valid]
+    tau = np.asarray(tau, dtype=np.float64)[valid]
+
+    # Samples of every window, (end - window, end]
+    first = np.searchsorted(date, ends - window_ns, side='right')
+    last = np.searchsorted(date, ends, side='right')
+    counts = last - first
+
+    # Sums around the mean, in extended precision: the differences of the
+    # sums of long series keep the digits of the small windows
+    shift = np.mean(tau) if len(tau) > 0 else 0.
+    centered = (tau - shift).astype(np.longdouble)
+    sums = np.concatenate([[0.], np.cumsum(centered)])
+    squares = np.concatenate([[0.], np.cumsum(centered**2)])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        total = sums[last] - sums[first]
+        mean = total/counts
+        var = (squares[last] - squares[first] - total*mean)/(counts - 1)
+    stats = {'tau_count': counts.astype(np.float64),
+             'tau_mean': mean.astype(np.float64) + shift,
+             'tau_std': np.sqrt(np.maximum(var, 0)).astype(np.float64)}
+    stats['tau_std'][counts < 2] = np.nan
+
+    # Order statistics over the ranks of tau
+    values, ranks = np.unique(tau, return_inverse=True)
+    n_bits = max(1, int(len(values) - 1).bit_length())
+    names = ['tau_min', 'tau_25', 'tau_50', 'tau_75', 'tau_max']
+    for name in names:
+        stats[name] = np.full(len(ends), np.nan)
+
+    for start in range(0, len(ends), ROLLING_BLOCK):
+        stop = min(start + ROLLING_BLOCK, len(ends))
+        full = np.flatnonzero(counts[start:stop] > 0) + start
+        if len(full) == 0:
+            continue
+        # Samples of the windows of the block
+        base = first[full[0]]
+        levels = wavelet_matrix(ranks[base:last[full[-1]]], n_bits)
+        left = first[full] - base
+        right = last[full] - base
+        n_full = counts[full]
+
+        def select(k, rows=slice(None)):
+            return values[wavelet_select(levels, left[rows], right[rows], k)]
+
+        stats['tau_min'][full] = select(np.zeros(len(full), dtype=np.int64))
+        stats['tau_max'][full] = select(n_full - 1)
+        for name, q in [('tau_25', 0.25), ('tau_50', 0.5), ('tau_75', 0.75)]:
+            pos = q*(n_full - 1)
+            k_low = np.floor(pos).astype(np.int64)
+            frac = pos - k_low
+            low = select(k_low)
+            # The next value only matters between two samples
+            high = low.copy()
+            between = frac > 0
+            high[between] = select(k_low[between] + 1, between)
+            stats[name][full] = lerp(low, high, frac)
+
+    # Constant windows: no rounding left in the std
+    stats['tau_std'][(counts > 1) & (stats['tau_min'] == stats['tau_max'])] = 0.
+
+    if order is not None:
+        for name in stats:
+            values = np.empty_like(stats[name])
+            values[order] = stats[name]
+            stats[name] = values
+
+    return stats
+
+
+# QUANTILE SKETCHES
+# Histograms of tau with fixed, log spaced edges. The bucket k > 0 holds
+# the values in (SKETCH_EDGES[k-1], SKETCH_EDGES[k]], the bucket 0 the
+# values up to SKETCH_MIN and the last one the values above SKETCH_MAX.
+# Every bucket is represented by the value with relative error SKETCH_ALPHA
+# to both edges, so within [SKETCH_MIN, SKETCH_MAX] the quantiles have a
+# relative error of SKETCH_ALPHA at most. The sketches of the same groups
+# are merged adding their counts.
+SKETCH_ALPHA = 0.005
+SKETCH_MIN = 0.001
+SKETCH_MAX = 100.
+SKETCH_GAMMA = (1 + SKETCH_ALPHA)/(1 - SKETCH_ALPHA)
+SKETCH_EDGES = SKETCH_MIN*SKETCH_GAMMA**np.arange(int(np.ceil(np.log(SKETCH_MAX/SKETCH_MIN)/np.log(SKETCH_GAMMA)))+1)
+SKETCH_BUCKETS = len(SKETCH_EDGES) + 1
+# Value of every bucket. The first and last ones take the minimum and
+# maximum of their group
+SKETCH_VALUES = np.concatenate([[np.nan], 2*SKETCH_EDGES[1:]/(1 + SKETCH_GAMMA), [np.nan]])
+
+# Quantile sketches of groups
+#   bins : groups, sorted
+#   buckets : buckets with samples of every group, sorted
+#   counts : samples per bucket
+tau_sketch = namedtuple('tau_sketch', ['bins', 'buckets', 'counts'])
+
+# Mergeable statistics of groups
+#   bins : groups, sorted
+#   count, sum, sumsq : number of samples, sum of tau and of tau squared
+#   tau_min, tau_max : minimum and maximum of tau
+#   sketch : quantile sketch of tau (tau_sketch)
+group_summary = namedtuple('group_summary', ['bins', 'count', 'sum', 'sumsq', 'tau_min', 'tau_max', 'sketch'])
+
+
+def sketch_buckets(tau):
+    """
+        Bucket of every value, as np.searchsorted(SKETCH_EDGES, tau) but
+        from the logarithm, corrected at the edges
+        Parameters
+        ----------
+        tau : float array
+            Opacity, without nan
+        ----------
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        k = np.ceil(np.log(np.maximum(tau, SKETCH_MIN)/SKETCH_MIN)/np.log(SKETCH_GAMMA))
+    k = np.minimum(k, SKETCH_BUCKETS-1).astype(np.int64)
+
+    edges = np.append(SKETCH_EDGES, np.inf)
+    k -= (k > 0) & (tau <= edges[k-1])
+    k += tau > edges[k]
+
+    return k
+
+
+def count_keys(keys, counts=None):
+    """
+        Total count of every key (group*SKETCH_BUCKETS + bucket)
+        Parameters
+        ----------
+        keys : int64 array
+            Keys
+        counts : int array
+            Count of every key (None: one)
+        ----------
+        Returns the distinct keys, sorted, and their counts
+    """
+    if counts is None:
+        counts = np.ones(len(keys), dtype=np.int64)
+    if len(keys) == 0 or np.all(keys[1:] > keys[:-1]):
+        return keys, counts
+
+    # Few groups are counted straight into the histograms, many are sorted
+    first = np.min(keys) - np.min(keys) % SKETCH_BUCKETS
+    span = np.max(keys) - first + 1
+    if span <= max(4*len(keys), SKETCH_BUCKETS):
+        total = np.bincount(keys - first, weights=counts, minlength=span)
+        keys = np.flatnonzero(total)
+        return keys + first, total[keys].astype(np.int64)
+
+    keys, inverse = np.unique(keys, return_inverse=True)
+    return keys, np.bincount(inverse, weights=counts, minlength=len(keys)).astype(np.int64)
+
+
+def sketch_samples(bins, tau):
+    """
+        Quantile sketch of groups of samples
+        Parameters
+        ----------
+        bins : int array
+            Group of every sample
+        tau : float array
+            Opacity of every sample, without nan
+        ----------
+    """
+    keys, counts = count_keys(bins.astype(np.int64)*SKETCH_BUCKETS + sketch_buckets(tau))
+
+    return tau_sketch(keys//SKETCH_BUCKETS, keys % SKETCH_BUCKETS, counts)
+
+
+def merge_sketches(sketches):
+    """
+        Merge quantile sketches, the counts of the same group and bucket
+        are added
+        Parameters
+        ----------
+        sketches : list
+            Sketches, see sketch_samples
+        ----------
+    """
+    keys = np.concatenate([sketch.bins*SKETCH_BUCKETS + sketch.buckets for sketch in sketches])
+    counts = np.concatenate([sketch.counts for sketch in sketches])
+    keys, counts = count_keys(keys, counts)
+
+    return tau_sketch(keys//SKETCH_BUCKETS, keys % SKETCH_BUCKETS, counts)
+
+
+def sketch_quantiles(sketch, q, tau_min, tau_max):
+    """
+        Quantile of every group of a sketch, interpolated between the
+        closest ranks as numpy does
+        Parameters
+        ----------
+        sketch : tau_sketch
+            Quantile sketch
+        q : float
+            Quantile, 0-1
+        tau_min, tau_max : float arrays
+            Minimum and maximum of every group
+        ----------
+        Returns the quantile of every group, with a relative error of
+        SKETCH_ALPHA at most within [SKETCH_MIN, SKETCH_MAX]
+    """
+    if len(sketch.bins) == 0:
+        return np.zeros(0)
+
+    starts = np.flatnonzero(np.concatenate([[True], sketch.bins[1:] != sketch.bins[:-1]]))
+    cum = np.cumsum(sketch.counts)
+    before = np.concatenate([[0], cum[starts[1:]-1]])
+    counts = np.append(cum[starts[1:]-1], cum[-1]) - before
+
+    # Bucket value, or the minimum and maximum in the outer buckets
+    group = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, len(sketch.bins))))
+    values = SKETCH_VALUES[sketch.buckets]
+    values = np.where(sketch.buckets == 0, tau_min[group], values)
+    values = np.where(sketch.buckets == SKETCH_BUCKETS-1, tau_max[group], values)
+
+    pos = q*(counts - 1)
+    low = np.floor(pos).astype(np.int64)
+    high = np.minimum(low + 1, counts - 1)
+    low_value = values[np.searchsorted(cum, before + low, side='right')]
+    high_value = values[np.searchsorted(cum, before + high, side='right')]
+
+    return np.clip(lerp(low_value, high_value, pos - low), tau_min, tau_max)
+
+
+@profiled('reduce')
+def summarize_groups(bins, tau):
+    """
+        Mergeable statistics of groups of samples
+        Parameters
+        ----------
+        bins : int array
+            Group of every sample
+        tau : float array
+            Opacity of every sample, without nan
+        ----------
+        Returns a group_summary
+    """
+    # Samples sorted by date come with their groups sorted
+    if np.any(bins[1:] < bins[:-1]):
+        order = np.argsort(bins, kind='stable')
+        bins = bins[order]
+        tau = tau[order]
+
+    if len(bins) == 0:
+        empty = np.zeros(0)
+        return group_summary(bins.astype(np.int64), empty, empty, empty, empty, empty, sketch_samples(bins, tau))
+
+    starts = np.flatnonzero(np.concatenate([[True], bins[1:] != bins[:-1]]))
+    counts = np.diff(np.append(starts, len(bins))).astype(np.float64)
+
+    return group_summary(bins[starts].astype(np.int64), counts, np.add.reduceat(tau, starts),
+                         np.add.reduceat(tau*tau, starts), np.minimum.reduceat(tau, starts),
+                         np.maximum.reduceat(tau, starts), sketch_samples(bins, tau))
+
+
+@profiled('reduce')
+def merge_summaries(summaries):
+    """
+        Merge the statistics of groups, from different chunks, processes or
+        periods. The statistics of the same group are combined.
+        Parameters
+        ----------
+        summaries : list
+            Statistics of groups, see summarize_groups
+        ----------
+    """
+    bins = np.concatenate([summary.bins for summary in summaries])
+    order = np.argsort(bins, kind='stable')
+    bins = bins[order]
+    if len(bins) == 0:
+        return summaries[0]
+
+    starts = np.flatnonzero(np.concatenate([[True], bins[1:] != bins[:-1]]))
+    merged = [bins[starts]]
+    # The groups without samples have nan limits
+    for k, reduce in enumerate([np.add, np.add, np.add, np.fmin, np.fmax]):
+        values = np.concatenate([summary[k+1] for summary in summaries])[order]
+        merged.append(reduce.reduceat(values, starts))
+    merged.append(merge_sketches([summary.sketch for summary in summaries]))
+
+    return group_summary(*merged)
+
+
+@profiled('reduce')
+def summary_statistics(summary):
+    """
+        Statistics of the groups (STAT_COLUMNS, except Date) from their
+        mergeable statistics, with the quartiles of the sketches
+        Parameters
+        ----------
+        summary : group_summary
+            Statistics of the groups
+        ----------
+        Returns the groups and a dictionary with the statistics, as
+        bin_statistics
+    """
+    count = summary.count
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = summary.sum / count
+        var = np.maximum(summary.sumsq - summary.sum*mean, 0) / (count - 1)
+    std = np.where(count > 1, np.sqrt(var), np.nan)
+
+    stats = {'tau_count': count, 'tau_mean': mean, 'tau_std': std}
+    for name, q in [('tau_25', 0.25), ('tau_50', 0.5), ('tau_75', 0.75)]:
+        stats[name] = sketch_quantiles(summary.sketch, q, summary.tau_min, summary.tau_max)
+    stats['tau_max'] = summary.tau_max
+    stats['tau_min'] = summary.tau_min
+    profile_count('groups', len(summary.bins))
+
+    return summary.bins, stats
+
+
+# STREAMING FUNCTIONS
+# A stream is an iterable of chunks: dictionaries with the CACHE_COLUMNS
+# of consecutive rows sorted by date, see read_tau_chunks
+def stream_filter(chunks, filter_chain, night=NIGHT_HOURS):
+    """
+        Filter a stream of chunks, chunk by chunk
+        Parameters
+        ----------
+        chunks : iterable
+            Stream of chunks
+        filter_chain : string or filter_spec
+            Filter chain, see tau_lmt.filter
+        night : int list
+            Hours of the night, for the ng clause
+        ----------
+        Yields the rows of every chunk accepted by the filter, the empty
+        chunks are skipped
+    """
+    if isinstance(filter_chain, filter_spec):
+        spec = filter_chain
+    else:
+        spec = parse_filter_chain(filter_chain)
+
+    luts = filter_luts(spec, night)
+    for chunk in chunks:
+        n_points = len(chunk['Date'])
+        with profile_stage('mask'):
+            mask = filter_rows(n_points, spec, chunk['Tau'], luts, chunk)
+        n_returned = np.count_nonzero(mask)
+        profile_count('rows_scanned', n_points)
+        profile_count('rows_returned', n_returned)
+        if n_returned == n_points:
+            yield chunk
+        elif n_returned > 0:
+            with profile_stage('gather'):
+                chunk = {name: chunk[name][mask] for name in chunk}
+            yield chunk
+
+
+def stream_statistics(chunks, group_string, quantiles='exact'):
+    """
+        Statistics of a stream of chunks, as tau_lmt.statistics_sample. The
+        groups finished within a chunk are reduced right away, the rows of
+        the last groups wait for the next chunk, so the quantiles are exact
+        and only the rows of a chunk and of its last groups are in memory.
+        Parameters
+        ----------
+        chunks : iterable
+            Stream of chunks
+        group_string : string or group_spec
+            Time scale to get the statistic, as -mn 1
+        quantiles : string
+            'exact' or 'sketch'. With the sketches every chunk is reduced
+            right away and the groups are merged at the end, only the rows
+            of the last two time units wait (see summarize_groups).
+        ----------
+    """
+    if isinstance(group_string, group_spec):
+        cmd, value = group_string
+    else:
+        cmd, value = parse_group_chain(group_string)
+
+    if quantiles not in ['exact', 'sketch']:
+        raise ValueError('Quantiles not valid: '+str(quantiles))
+    if cmd not in ['yr', 'mn', 'dy', 'hr', 'mt']:
+        return pd.DataFrame()
+    reduce = bin_statistics if quantiles == 'exact' else summarize_groups
+
+    init_ns = None
+    # Units and tau of the rows waiting for their groups to finish
+    pending = []
+    parts = []
+    for chunk in chunks:
+        date = chunk['Date']
+        if len(date) == 0:
+            continue
+        if init_ns is None:
+            init_ns = date[0]
+        end_ns = date[-1]
+
+        units, _ = time_units(date, cmd, init_ns, end_ns, chunk)
+        # The group of the unit before the last one may still get rows, and
+        # lose the last ones at the end of the sample (see time_units)
+        if quantiles == 'exact':
+            split = np.searchsorted(units, (units[-1] - 1)//value*value)
+        elif cmd in NS_UNITS:
+            split = np.searchsorted(units, units[-1] - 1)
+        else:
+            split = len(units)
+        if split > 0:
+            done_units = np.concatenate([p[0] for p in pending] + [units[:split]])
+            done_tau = np.concatenate([p[1] for p in pending] + [chunk['Tau'][:split]])
+            valid = ~np.isnan(done_tau)
+            parts.append(reduce(done_units[valid]//value, done_tau[valid]))
+            pending = []
+        pending.append((units[split:], chunk['Tau'][split:]))
+
+    if init_ns is None:
+        return pd.DataFrame()
+
+    # The last groups, up to the end of the sample
+    units = np.concatenate([p[0] for p in pending])
+    tau = np.concatenate([p[1] for p in pending])
+    _, n_units = time_units(np.array([end_ns]), cmd, init_ns, end_ns)
+    valid = (units < n_units) & ~np.isnan(tau)
+    parts.append(reduce(units[valid]//value, tau[valid]))
+
+    if quantiles == 'exact':
+        bins = np.concatenate([part[0] for part in parts])
+        stats = {name: np.concatenate([part[1][name] for part in parts]) for name in parts[0][1]}
+    else:
+        bins, stats = summary_statistics(merge_summaries(parts))
+
+    return statistics_frame(init_ns, cmd, value, bins, stats)
+
+
+# STATISTICS CUBE
+# The tau file pre-aggregated per hour: every (year, month, day, hour) cell
+# keeps the mergeable statistics of its samples (see group_summary) and its
+# first and last dates. The statistics whose filters and groups are made of
+# whole hours are computed from the cells, without reading the samples.
+#   hours : cells, hours since epoch (sorted)
+#   first, last : first and last date of the cells, nanoseconds since epoch
+#   summary : statistics of the cells, bins are the hours. The cells with
+#   nan only have count 0.
+#   offsets : first entry of the sketch of every cell, and the number of
+#   entries at the end
+#   fields : calendar fields of the cells (not saved)
+tau_cube = namedtuple('tau_cube', ['hours', 'first', 'last', 'summary', 'offsets', 'fields'])
+
+# Time groups made of whole hours
+CUBE_GROUPS = ['yr', 'mn', 'dy', 'hr']
+# Arrays of the cube, as stored in the binary cache
+CUBE_ARRAYS = ['hours', 'first', 'last', 'offsets'] + list(group_summary._fields[:-1]) + ['sketch_'+name for name in tau_sketch._fields]
+
+
+@profiled('reduce')
+def build_tau_cube(date, tau):
+    """
+        Statistics cube of a tau file
+        Parameters
+        ----------
+        date : int64 array
+            Timestamps, nanoseconds since epoch, sorted
+        tau : float array
+            Opacity
+        ----------
+    """
+    hours = date // NS_HOUR
+    starts = np.flatnonzero(np.concatenate([[True], hours[1:] != hours[:-1]])) if len(hours) > 0 else np.zeros(0, dtype=np.int64)
+    last = date[np.append(starts[1:], len(date)) - 1] if len(hours) > 0 else np.zeros(0, dtype=np.int64)
+    cells = hours[starts]
+
+    valid = ~np.isnan(tau)
+    summary = summarize_groups(hours[valid], tau[valid])
+
+    # Every cell in the summary, with or without samples
+    if len(summary.bins) < len(cells):
+        taken = np.searchsorted(cells, summary.bins)
+        fields = []
+        for name, fill in zip(['count', 'sum', 'sumsq', 'tau_min', 'tau_max'], [0, 0, 0, np.nan, np.nan]):
+            values = np.full(len(cells), fill, dtype=np.float64)
+            values[taken] = getattr(summary, name)
+            fields.append(values)
+        summary = group_summary(cells, *fields, sketch=summary.sketch)
+
+    offsets = np.searchsorted(summary.sketch.bins, np.append(cells, np.iinfo(np.int64).max))
+
+    return tau_cube(cells, date[starts], last, summary, offsets, calendar_fields(cells*NS_HOUR))
+
+
+def cube_arrays(cube):
+    """
+        Arrays of a statistics cube, named as CUBE_ARRAYS
+        Parameters
+        ----------
+        cube : tau_cube
+            Statistics cube
+        ----------
+    """
+    arrays = {'hours': cube.hours, 'first': cube.first, 'last': cube.last, 'offsets': cube.offsets}
+    for name in group_summary._fields[:-1]:
+        arrays[name] = getattr(cube.summary, name)
+    for name in tau_sketch._fields:
+        arrays['sketch_'+name] = getattr(cube.summary.sketch, name)
+
+    return arrays
+
+
+def array_cube(arrays):
+    """
+        Statistics cube of its arrays, see cube_arrays
+        Parameters
+        ----------
+        arrays : dictionary
+            Arrays of the cube, named as CUBE_ARRAYS
+        ----------
+    """
+    sketch = tau_sketch(*[arrays['sketch_'+name] for name in tau_sketch._fields])
+    summary = group_summary(*[arrays[name] for name in group_summary._fields[:-1]], sketch=sketch)
+    hours = arrays['hours']
+
+    return tau_cube(hours, arrays['first'], arrays['last'], summary, arrays['offsets'], calendar_fields(hours*NS_HOUR))
+
+
+@profiled('reduce')
+def cube_tail(cube, date, tau):
+    """
+        Changes of a statistics cube with new samples, after the ones of
+        the cube. Only the cells of the new samples are computed, the last
+        cell of the cube is merged with them when they share the hour.
+        Parameters
+        ----------
+        cube : tau_cube
+            Statistics cube
+        date : int64 array
+            Timestamps of the new samples, nanoseconds since epoch, sorted
+        tau : float array
+            Opacity of the new samples
+        ----------
+        Returns a dictionary of (first row changed, new rows from it on) per
+        array of the cube (see CUBE_ARRAYS), the rows before are kept.
+        Raises ValueError if the new samples are older than the cube.
+    """
+    new = build_tau_cube(date, tau)
+    if len(cube.hours) > 0 and len(new.hours) > 0 and new.first[0] < cube.last[-1]:
+        raise ValueError('New samples older than the statistics cube')
+
+    # Cells of the cube that do not change
+    shared = int(len(cube.hours) > 0 and len(new.hours) > 0 and new.hours[0] == cube.hours[-1])
+    kept = len(cube.hours) - shared
+    n_entries = int(cube.offsets[kept])
+
+    old = cube.summary
+    tail_sketch = tau_sketch(*[array[n_entries:cube.offsets[-1]] for array in old.sketch])
+    tail = group_summary(*[array[kept:] for array in old[:-1]], sketch=tail_sketch)
+    merged = merge_summaries([tail, new.summary])
+
+    rows = {'hours': (kept, new.hours), 'first': (len(cube.hours), new.first[shared:]), 'last': (kept, new.last),
+            'offsets': (kept, n_entries + np.searchsorted(merged.sketch.bins, np.append(new.hours, np.iinfo(np.int64).max)))}
+    for name in group_summary._fields[:-1]:
+        rows[name] = (kept, getattr(merged, name))
+    for name in tau_sketch._fields:
+        rows['sketch_'+name] = (n_entries, getattr(merged.sketch, name))
+
+    return rows
+
+
+def cube_aligned(spec, cmd):
+    """
+        Check if a filter and a time group are made of whole hours, so the
+        statistics come from the cube
+        Parameters
+        ----------
+        spec : filter_spec
+            Filter
+        cmd : string
+            Time group: yr, mn, dy, hr, mt
+        ----------
+    """
+    hours = all([first % 60 == 0 and end % 60 == 0 for first, end in spec.tm])
+    twilight = spec.ng in TWILIGHTS
+    return spec.t is None and len(spec.mt) == 0 and hours and not twilight and cmd in CUBE_GROUPS
+
+
+@profiled('reduce')
+def cube_statistics(cube, spec, cmd, value, night=NIGHT_HOURS):
+    """
+        Statistics of the samples accepted by a filter, from the cube, as
+        statistics_sample with quantiles='sketch'. The filter and the groups
+        have to be made of whole hours (see cube_aligned).
+        Parameters
+        ----------
+        cube : tau_cube
+            Statistics cube
+        spec : filter_spec
+            Filter
+        cmd : string
+            Time group: yr, mn, dy, hr
+        value : int
+            Time units per group
+        night : int list
+            Hours of the night, for the ng clause
+        ----------
+    """
+    luts = filter_luts(spec, night)
+    if luts or spec.tm:
+        selected = np.flatnonzero(filter_rows(len(cube.hours), spec, None, luts, cube.fields))
+    else:
+        selected = np.arange(len(cube.hours))
+    if len(selected) == 0:
+        return pd.DataFrame()
+
+    # The samples of a cell share the time unit
+    init_ns = cube.first[selected[0]]
+    end_ns = cube.last[selected[-1]]
+    fields = {name: cube.fields[name][selected] for name in ['yr', 'mn']}
+    units, n_units = time_units(cube.hours[selected]*NS_HOUR, cmd, init_ns, end_ns, fields)
+
+    summary = cube.summary
+    keep = (units >= 0) & (units < n_units) & (summary.count[selected] > 0)
+    selected = selected[keep]
+    groups = units[keep]//value
+
+    # Entries of the sketches of the cells
+    lengths = cube.offsets[selected+1] - cube.offsets[selected]
+    entries = np.repeat(cube.offsets[selected] - np.cumsum(lengths) + lengths, lengths) + np.arange(np.sum(lengths))
+    sketch = tau_sketch(np.repeat(groups, lengths), summary.sketch.buckets[entries], summary.sketch.counts[entries])
+
+    cells = group_summary(groups, summary.count[selected], summary.sum[selected], summary.sumsq[selected],
+                          summary.tau_min[selected], summary.tau_max[selected], sketch)
+    bins, stats = summary_statistics(merge_summaries([cells]))
+
+    return statistics_frame(init_ns, cmd, value, bins, stats)
+
+
+def cube_paths(path):
+    """
+        Paths of the statistics cube of a tau file, in its binary cache
+        directory: a .npy file per array and the metadata
+        Parameters
+        ----------
+        path : string
+            Opacity data path
+        ----------
+    """
+    cube_dir = os.path.join(cache_paths(path)[0], 'cube')
+    arrays = {}
+    for name in CUBE_ARRAYS:
+        arrays[name] = os.path.join(cube_dir, name + '.npy')
+
+    return cube_dir, arrays, os.path.join(cube_dir, 'cube.json')
+
+
+def cube_signature(data_meta):
+    """
+        Signature of the data and of the sketches, it invalidates the cube
+        Parameters
+        ----------
+        data_meta : dictionary
+            Signature of the data of the tau file, see data_signature
+        ----------
+    """
+    signature = dict(data_meta)
+    signature.update({'cube_version': CUBE_VERSION, 'sketch': [SKETCH_ALPHA, SKETCH_MIN, SKETCH_MAX]})
+    return signature
+
+
+def load_tau_cube(path, data_meta):
+    """
+        Load the statistics cube of a tau file, as read-only memory maps
+        Parameters
+        ----------
+        path : string
+            Opacity data path
+        data_meta : dictionary
+            Signature of the data of the tau file, see data_signature
+        ----------
+        Returns a tau_cube or None if the cube is missing or out of date
+    """
+    cube_dir, paths, meta_path = cube_paths(path)
+
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+    except (IOError, ValueError):
+        return None
+
+    signature = cube_signature(data_meta)
+    for key in signature:
+        if meta.get(key) != signature[key]:
+            return None
+
+    try:
+        arrays = {}
+        for name in CUBE_ARRAYS:
+            arrays[name] = np.load(paths[name], mmap_mode='r')[:meta['rows'][name]]
+            if len(arrays[name]) != meta['rows'][name]:
+                return None
+        return array_cube(arrays)
+    except (IOError, ValueError, KeyError):
+        return None
+
+
+def save_tau_cube(path, cube, data_meta):
+    """
+        Write the statistics cube of a tau file, next to the binary cache.
+        As save_tau_cache, the files are written to a temporal name and
+        renamed, the metadata goes last.
+        Parameters
+        ----------
+        path : string
+            Opacity data path
+        cube : tau_cube
+            Statistics cube
+        data_meta : dictionary
+            Signature of the data of the tau file, see data_signature
+        ----------
+    """
+    cube_dir, paths, meta_path = cube_paths(path)
+    arrays = cube_arrays(cube)
+
+    if not os.path.isdir(cube_dir):
+        os.makedirs(cube_dir)
+
+    tmp_suffix = '.tmp' + str(os.getpid())
+    for name in CUBE_ARRAYS:
+        with open(paths[name] + tmp_suffix, 'wb') as f:
+            np.save(f, arrays[name])
+        os.replace(paths[name] + tmp_suffix, paths[name])
+
+    save_cube_meta(meta_path, {name: len(arrays[name]) for name in CUBE_ARRAYS}, data_meta)
+
+
+def save_cube_meta(meta_path, rows, data_meta):
+    """
+        Write the metadata of a statistics cube: its signature and the rows
+        of its arrays
+        Parameters
+        ----------
+        meta_path : string
+            Path of the metadata
+        rows : dictionary
+            Rows of every array of the cube
+        data_meta : dictionary
+            Signature of the data of the tau file, see data_signature
+        ----------
+    """
+    meta = cube_signature(data_meta)
+    meta['rows'] = rows
+    save_cache_meta(meta_path, meta)
 
-    return color_alarms[-1] + "ERROR! Type of message not recognized: ", alarm_type, '\033[0m'
+
+def append_tau_cube(path, tail, data_meta):
+    """
+        Write the changes of the statistics cube of a tau file with new
+        samples, in place when they fit (see store_rows). The arrays whose
+        last cell changes (it shares the hour with the new samples) are
+        written again through a temporal name. The metadata goes last.
+        Parameters
+        ----------
+        path : string
+            Opacity data path
+        tail : dictionary
+            Changes of the cube, see cube_tail
+        data_meta : dictionary
+            Signature of the data of the tau file, with the new samples
+        ----------
+        Returns the cube as memory maps, as load_tau_cube
+    """
+    cube_dir, paths, meta_path = cube_paths(path)
+    known = stored_meta(meta_path).get('rows', {})
+
+    rows = {}
+    for name in CUBE_ARRAYS:
+        start, values = tail[name]
+        store_rows(paths[name], start, values, known.get(name, start))
+        rows[name] = start + len(values)
+    save_cube_meta(meta_path, rows, data_meta)
+
+    return array_cube({name: np.load(paths[name], mmap_mode='r')[:rows[name]] for name in CUBE_ARRAYS})
+
+
+# MULTIPLE SERIES
+# Several tau series, from other sites or instruments, each with its own
+# cadence (see tau_sites). They are aligned on a common time grid by an
+# as-of join: every instant of the grid takes the sample of every series
+# closest to it, two binary searches per series instead of comparing the
+# rows of the series with each other.
+ASOF_DIRECTIONS = ['backward', 'forward', 'nearest']
+
+
+def asof_rows(date, at, tolerance=None, direction='backward'):
+    """
+        Row of a series for every instant: the last date up to it
+        (backward), the first date from it (forward) or the closest one
+        (nearest)
+        Parameters
+        ----------
+        date : int64 array
+            Timestamps of the series, nanoseconds since epoch, sorted
+        at : int64 array
+            Instants, nanoseconds since epoch
+        tolerance : int
+            Longest distance between an instant and its date, nanoseconds
+            (None: no limit)
+        direction : string
+            'backward', 'forward' or 'nearest'
+        ----------
+        Returns the rows as an int64 array, -1 where there is no date
+    """
+    if direction not in ASOF_DIRECTIONS:
+        raise ValueError('Direction not valid: '+str(direction))
+
+    n_points = len(date)
+    at = np.asarray(at, dtype=np.int64)
+    if n_points == 0:
+        return np.full(len(at), -1, dtype=np.int64)
+
+    if direction == 'backward':
+        # The last of the repeated dates
+        rows = np.searchsorted(date, at, side='right') - 1
+    elif direction == 'forward':
+        after = np.searchsorted(date, at, side='left')
+        rows = np.where(after < n_points, after, -1)
+    else:
+        after = np.searchsorted(date, at, side='left')
+        before = after - 1
+        closer = (date[np.minimum(after, n_points-1)] - at) <= (at - date[np.maximum(before, 0)])
+        rows = np.where((after < n_points) & ((before < 0) | closer), after, before)
+
+    if tolerance is not None:
+        distance = np.abs(date[np.maximum(rows, 0)] - at)
+        rows[(rows >= 0) & (distance > tolerance)] = -1
+
+    return rows.astype(np.int64, copy=False)
+
+
+# PARALLEL STATISTICS
+# Jobs of statistics run by a pool of processes. The workers get the tau_lmt
+# objects of the parent when they are forked, or open the tau files of their
+# jobs once, as memory maps of their binary caches read only. The samples are
+# shared with the parent and never pickled, only the jobs and the statistics
+# travel between processes.
+#   path : opacity data path
+#   sample : filter chain over the file (string or filter_spec)
+#   group : group chain (string or group_spec)
+statistics_job = namedtuple('statistics_job', ['path', 'sample', 'group'])
+
+# tau_lmt objects of a worker process, per path, see init_worker. The
+# parent process never fills it
+worker_files = {}
+
+
+def init_worker(files):
+    """
+        Initializer of the workers of a pool, the tau_lmt objects of their
+        jobs
+        Parameters
+        ----------
+        files : dictionary
+            tau_lmt objects of the parent per path, inherited by forked
+            workers (empty otherwise)
+        ----------
+    """
+    worker_files.clear()
+    worker_files.update(files)
+
+
+def job_statistics(job, quantiles='exact', compact=False, files=None):
+    """
+        Statistics of a job, in the process running it
+        Parameters
+        ----------
+        job : statistics_job
+            Job
+        quantiles : string
+            'exact' or 'sketch', see tau_lmt.statistics_sample
+        compact : bool
+            Compact samples, see tau_compact
+        files : dictionary
+            tau_lmt objects per path (None: the ones of the worker). The
+            files without an object are opened with the binary cache read
+            only, the processes never write it at the same time
+        ----------
+    """
+    if files is None:
+        files = worker_files
+    if job.path not in files:
+        files[job.path] = tau_lmt(job.path, cache='read', compact=compact)
+
+    return files[job.path].statistics_sample(job.sample, job.group, quantiles=quantiles)
+
+
+def pool_statistics(jobs, workers=None, quantiles='exact', compact=False, files=None):
+    """
+        Statistics of many jobs over a pool of processes
+        Parameters
+        ----------
+        jobs : list
+            statistics_job list
+        workers : int
+            Number of processes (None: one per core, 1: no pool)
+        quantiles : string
+            'exact' or 'sketch', see tau_lmt.statistics_sample
+        compact : bool
+            Compact samples in the workers, see tau_compact
+        files : dictionary
+            tau_lmt objects already loaded, per path. Only forked workers
+            get them, they are not pickled
+        ----------
+        Returns the statistics of all the jobs in one frame, in the order
+        of the jobs, with their position in the 'job' column
+    """
+    jobs = [statistics_job(*job) for job in jobs]
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(jobs)))
+
+    files = dict(files or {})
+    if workers == 1:
+        frames = [job_statistics(job, quantiles, compact, files) for job in jobs]
+    else:
+        # Consecutive jobs go to the same worker, they often share the file
+        chunksize = max(1, len(jobs)//(4*workers))
+        context = multiprocessing.get_context()
+        if context.get_start_method() != 'fork':
+            files = {}
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=init_worker,
+                                                    initargs=(files,)) as pool:
+            frames = list(pool.map(job_statistics, jobs, [quantiles]*len(jobs), [compact]*len(jobs), chunksize=chunksize))
+
+    parts = []
+    for i, frame in enumerate(frames):
+        if frame is not None and len(frame.index) > 0:
+            frame = frame.copy()
+            frame.insert(0, 'job', i)
+            parts.append(frame)
+    if len(parts) == 0:
+        return pd.DataFrame(columns=['job'] + STAT_COLUMNS)
+
+    return pd.concat(parts, ignore_index=True)
 
 
 class tau_lmt():
@@ -60,36 +3414,197 @@ class tau_lmt():
         path : string
             Opacity data path
         *args : additional arguments
-        **kargs : additional keywords (for verbose)
+        **kargs : additional keywords (for verbose and cache)
+            cache : boolean. Use the binary cache next to the csv file
+            (default True). The first load builds it, the following ones
+            memory-map it. 'read' memory-maps it but never writes it, the
+            new lines and the statistics cube stay in memory (as the
+            workers of statistics_jobs do).
+            parser : string. Csv parser, 'fast' (default) or 'infer'. The
+            fast one reads the fixed radiometer layout from the bytes of the
+            file, see read_tau_csv.
+            partitions : string. With a partitioned store as path (see
+            save_partitions), the filter chain of the partitions to load, as
+            '-yr 2016 -mn 3' (default: all of them).
         ----------
     """
+    # Time of the stages and rows of the calls inside a block, see profile:
+    # with tau_lmt.profile() as prof: ...
+    profile = staticmethod(profile)
+
     def __init__(self, path=FILE_TAU_PATH, *args, **kwargs):
         # Check for verbose
         verbose = kwargs.pop('verbose', None)
+        # Binary cache
+        cache = kwargs.pop('cache', True)
+        # Csv parser
+        parser = kwargs.pop('parser', 'fast')
+        # Compact samples, see tau_compact
+        compact = kwargs.pop('compact', False)
+        # Partitions of a partitioned store
+        partitions = kwargs.pop('partitions', None)
 
         # Initiating the class, the tau file is loaded
         print_msg('Loading tau file...', 'info')
-        self.raw_data = pd.read_csv(path, names=['Date', 'Time', 'Tau'], header=None)
-        # Unifying time columns
-        self.raw_data['Date'] = self.raw_data['Date']+'T'+self.raw_data['Time']
-        self.raw_data['Date'] = pd.to_datetime(self.raw_data['Date'])
-        self.raw_data.drop('Time', inplace=True, axis=1)
+        # The partitioned stores are directories, they do not follow a csv
+        # file and have no binary cache
+        self.store = os.path.isdir(path)
+        if self.store:
+            columns, meta = load_tau_partitions(path, partitions)
+            if meta['n_points'] == 0:
+                raise ValueError('No partition of the store matches: '+str(partitions))
+            cache = False
+        else:
+            columns, meta = load_tau_file(path, cache=cache, parser=parser)
+        self.path = path
+        self.cache = cache
+        # The binary cache is written too, unless it is read only
+        self.cache_writes = bool(cache) and cache != 'read'
+        self.parser = parser
+        # Signature of the loaded data, its offset is the end of the
+        # lines loaded (see append)
+        self.meta = meta
+        # Statistics cube, loaded or built when it is needed (see get_cube)
+        self.cube = None
+        # The compact samples hold their own 8 bytes per row
+        self.compact = compact
+        if compact:
+            self.raw_data = compact_sample(columns['Date'], columns['Tau'])
+        # Arrays with room for appended rows, see append
+        self.buffers = {}
 
         # Night definition. From 21:00 pm - 8:00 am
-        self.night = np.array([21,22,23,0,1,2,3,4,5,6,7,8])
+        self.night = np.array(NIGHT_HOURS)
+
+        self.set_columns(columns)
+        # Lines written after the cache
+        self.append()
+
+        if verbose:
+            print_msg('Tau file: '+path, 'verb')
+            print_msg('No. of points: '+str(self.n_points), 'verb')
+            print_msg('Data from: '+str(self.first_date) + ' to: '+str(self.last_date), 'verb')
+        print_msg('File loaded!', 'ok')
+
+
+    def set_columns(self, columns):
+        """
+            Take the columns of the tau file as raw_data
+            Parameters
+            ----------
+            columns : dictionary
+                Arrays of the CACHE_COLUMNS, see load_tau_file
+            ----------
+        """
+        # The columns are not copied, memory maps are shared between
+        # processes. The compact samples keep tau on their own
+        if self.compact:
+            columns = {name: columns[name] for name in columns if name != 'Tau'}
+        else:
+            self.raw_data = pd.DataFrame({'Date': columns['Date'].view('datetime64[ns]'), 'Tau': columns['Tau']}, copy=False)
+
+        # Calendar fields of every row of raw_data. Samples taken from
+        # raw_data keep its row numbers as index, that is how they find
+        # their fields (see sample_rows)
+        self.calendar = {}
+        for name in CALENDAR_FIELDS:
+            self.calendar[name] = columns[name]
+
+        # Timestamps as int64 nanoseconds since epoch, sorted
+        self.timestamps = columns['Date']
+
+        self.columns = columns
 
         # Number of points
-        self.n_points = len(self.raw_data.index)
+        self.n_points = len(self.timestamps)
+        # Segments, gaps and duplicates, built when they are needed (see
+        # get_index)
+        self.index = None
+
+        # Limits of tau list
+        self.first_date = pd.Timestamp(self.timestamps[0])
+        self.last_date = pd.Timestamp(self.timestamps[self.n_points-1])
+
+
+    def append(self, **kwargs):
+        """
+            Append the lines written to the tau file since it was loaded,
+            without parsing it again. Only the whole lines after the last
+            one loaded are read, the arrays (and the binary cache) grow by
+            GROWTH_FACTOR when they are full, and the statistics cube gets
+            the new cells only. Call it to follow a file that is being
+            written.
+            Parameters
+            ----------
+            **kwargs : additional keywords (for verbose)
+            ----------
+            Returns the number of new rows. Raises ValueError if the new
+            lines are older than the last date loaded, nothing is appended.
+        """
+        # Add verbose
+        verbose = kwargs.pop('verbose', None)
 
-        # Limits of tau list
-        self.first_date = self.raw_data['Date'][0]
-        self.last_date = self.raw_data['Date'][self.n_points-1]
+        if self.store:
+            return 0
+
+        new, offset = read_tau_tail(self.path, self.meta['offset'], self.parser)
+        if offset == self.meta['offset']:
+            return 0
+
+        date = new['Date']
+        n_new = len(date)
+        if n_new > 0 and (np.any(date[1:] < date[:-1]) or date[0] < self.timestamps[self.n_points-1]):
+            raise ValueError('New lines not sorted by date, the tau file has to be loaded again')
+
+        n_points = self.n_points + n_new
+        meta = data_signature(self.path, n_points, offset, self.meta)
+        cube = self.cube
+        if cube is None and self.cache and n_new > 0:
+            cube = load_tau_cube(self.path, self.meta)
+
+        if self.compact:
+            seconds = date//NS_SECOND - self.raw_data.epoch
+            if n_new > 0 and seconds[-1] > np.iinfo(np.int32).max:
+                raise ValueError('The dates span more than 68 years, too long for a compact sample')
+            for name, values in [('seconds', seconds), ('tau', new['Tau'])]:
+                self.buffers[name] = grow_array(self.buffers.get(name, getattr(self.raw_data, name)), self.n_points, values)
+            self.raw_data = tau_compact(self.raw_data.epoch, self.buffers['seconds'][:n_points], self.buffers['tau'][:n_points])
+
+        if self.cache_writes:
+            columns = append_tau_cache(self.path, new, meta)
+        else:
+            # The rows live in buffers with room for the next ones
+            columns = {}
+            for name in self.columns:
+                self.buffers[name] = grow_array(self.buffers.get(name, self.columns[name]), self.n_points, new[name])
+                columns[name] = self.buffers[name][:n_points]
+
+        self.meta = meta
+        self.set_columns(columns)
+
+        # Only the cells of the new rows
+        if cube is not None and n_new > 0:
+            tail = cube_tail(cube, date, new['Tau'])
+            self.cube = None
+            if self.cache_writes:
+                try:
+                    self.cube = append_tau_cube(self.path, tail, self.meta)
+                except (IOError, OSError, ValueError) as e:
+                    print_msg('Statistics cube not written: '+str(e), 'warning')
+            if self.cube is None:
+                arrays = cube_arrays(cube)
+                for name in CUBE_ARRAYS:
+                    start, values = tail[name]
+                    buffer = grow_array(self.buffers.get('cube_'+name, arrays[name]), start, values)
+                    self.buffers['cube_'+name] = buffer
+                    arrays[name] = buffer[:start+len(values)]
+                self.cube = array_cube(arrays)
 
         if verbose:
-            print_msg('Tau file: '+FILE_TAU_PATH, 'verb')
-            print_msg('No. of points: '+str(self.n_points), 'verb')
+            print_msg('No. of new points: '+str(n_new), 'verb')
             print_msg('Data from: '+str(self.first_date) + ' to: '+str(self.last_date), 'verb')
-        print_msg('File loaded!', 'ok')
+
+        return n_new
 
 
     def check_availability(self, date_time):
@@ -102,12 +3617,12 @@ class tau_lmt():
             ----------
         """
         # Check min limit
-        if (date_time-self.first_date).total_seconds()/60. < 0:
+        if date_time < self.first_date:
             date_time = self.first_date
             print_msg('Minimum available date: '+str(self.first_date), 'warning')
             print_msg('Date assigned: '+str(self.first_date), 'info')
         # Check max limit
-        elif (date_time-self.last_date).total_seconds()/60 > 0:
+        elif date_time > self.last_date:
             date_time = self.last_date
             print_msg('Maximum available date: '+str(self.last_date), 'warning')
             print_msg('Date assigned: '+str(self.last_date), 'info')
@@ -140,20 +3655,143 @@ class tau_lmt():
         from_date = self.check_availability(from_date)
         to_date = self.check_availability(to_date)
 
-        span_sample = self.raw_data[
-            (self.raw_data['Date'] > from_date ) &
-            (self.raw_data['Date'] < to_date)
-        ]
+        # Rows strictly between both dates
+        first, last = self.span_bounds(from_date.value, to_date.value)
+        span_sample = self.raw_span(first, last)
 
         if verbose:
-            n_points = len(span_sample.index)
-            print_msg('No. of sample points: '+str(n_points), 'verb')
-            if n_points > 0:
-                print_msg('Data from: '+ str(span_sample.iloc[0].Date) + ' to: ' + str(span_sample.iloc[n_points-1].Date), 'verb')
+            print_sample(span_sample)
 
         return span_sample
 
 
+    def span_bounds(self, from_ns, to_ns):
+        """
+            First and last+1 rows strictly between two dates
+            Parameters
+            ----------
+            from_ns : int or int array
+                From date, nanoseconds since epoch
+            to_ns : int or int array
+                To date, nanoseconds since epoch
+            ----------
+        """
+        # Binary search, O(log n) per span
+        first = np.searchsorted(self.timestamps, from_ns, side='right')
+        last = np.searchsorted(self.timestamps, to_ns, side='left')
+
+        return first, np.maximum(first, last)
+
+
+    def time_spans(self, from_dates, to_dates, output='frames', **kwargs):
+        """
+            Choose many time spans at once
+            Parameters
+            ----------
+            from_dates : array of datetimes
+                From dates
+            to_dates : array of datetimes
+                To dates
+            output : string
+                'frames': list of samples, slices of raw_data (compact
+                samples in compact mode)
+                'bounds': first and last+1 rows of every span
+            **kwargs : additional keywords (for verbose)
+            ----------
+            Invalid spans (the first date after the last one) give None
+        """
+        # Add verbose
+        verbose = kwargs.pop('verbose', None)
+
+        from_ns = pd.DatetimeIndex(from_dates).values.astype('datetime64[ns]').view(np.int64)
+        to_ns = pd.DatetimeIndex(to_dates).values.astype('datetime64[ns]').view(np.int64)
+
+        valid = to_ns >= from_ns
+        if not np.all(valid):
+            print_msg(str(np.count_nonzero(~valid))+' periods are not valid, the first date has to be before the last date', 'error')
+
+        first, last = self.span_bounds(from_ns, to_ns)
+
+        if verbose:
+            print_msg('No. of spans: '+str(len(from_ns)), 'verb')
+
+        if output == 'bounds':
+            return first, last
+
+        return [self.raw_span(first[i], last[i]) if valid[i] else None for i in range(len(first))]
+
+
+    def raw_span(self, first, last):
+        """
+            Rows of raw_data from first to last+1, without copies. The
+            compact spans keep the rows of raw_data, see sample_rows
+            Parameters
+            ----------
+            first : int
+                First row
+            last : int
+                Last row + 1
+            ----------
+        """
+        span = sample_span(self.raw_data, first, last)
+        if self.compact:
+            span.rows = np.arange(first, last, dtype=np.int32)
+
+        return span
+
+
+    def sample_rows(self, sample):
+        """
+            Row numbers of a sample in raw_data
+            Parameters
+            ----------
+            sample : pandas dataframe or tau_compact
+                Datetime data sample
+            ----------
+            Returns None if the sample does not come from raw_data
+        """
+        if sample is self.raw_data:
+            return np.arange(self.n_points)
+
+        rows = sample.rows if isinstance(sample, tau_compact) else sample.index.values
+        if rows is None or rows.dtype.kind not in 'iu':
+            return None
+        if len(rows) > 0 and (np.min(rows) < 0 or np.max(rows) >= self.n_points):
+            return None
+
+        # The dates confirm the rows, it costs much less than getting the
+        # calendar fields again
+        date = sample_dates(sample)
+        if not np.array_equal(date, self.timestamps[rows]):
+            return None
+
+        return rows
+
+
+    def sample_calendar(self, sample):
+        """
+            Calendar fields of a sample
+            Parameters
+            ----------
+            sample : pandas dataframe or tau_compact
+                Datetime data sample
+            ----------
+            Returns a dictionary as calendar_fields
+        """
+        if sample is self.raw_data:
+            return self.calendar
+
+        rows = self.sample_rows(sample)
+        if rows is None:
+            return calendar_fields(sample_dates(sample))
+
+        fields = {}
+        for name in CALENDAR_FIELDS:
+            fields[name] = self.calendar[name][rows]
+
+        return fields
+
+
     def validate_dates(self, array_date, field):
         """
             Validate dates
@@ -165,755 +3803,528 @@ class tau_lmt():
                 Temporal scale selected: t, yr, mn, dy, hr, mt
             ----------
         """
-        for item in array_date:
-            if field == 't':
-                if item < 0:
-                    print_msg('Tau value not valid! It will be ignored', 'error')
-                    array_date.remove(item)
-            elif field == 'yr':
-                if item < 0:
-                    print_msg('Year not valid! It will be ignored', 'error')
-                    array_date.remove(item)
-            elif field == 'mn':
-                if item < 1 or item > 12:
-                    print_msg('Month not valid! It will be ignored', 'error')
-                    array_date.remove(item)
-            elif field == 'dy':
-                if item < 1 or item > 31:
-                    print_msg('Day not valid! It will be ignored', 'error')
-                    array_date.remove(item)
-            elif field == 'hr':
-                if item < 0 or item > 23:
-                    print_msg('Hour not valid! It will be ignored', 'error')
-                    array_date.remove(item)
-            elif field == 'mt':
-                if item < 0 or item > 59:
-                    print_msg('Minute not valid! It will be ignored', 'error')
-                    array_date.remove(item)
+        array_date = [item for item in array_date if valid_value(item, field)]
 
         return array_date
 
 
-    def filter(self, sample, filter_chain, **kwargs):
+    def filter_mask(self, sample, spec):
+        """
+            Mask of the rows of a sample accepted by a filter. The clauses
+            are evaluated by blocks of rows, over the calendar fields
+            Parameters
+            ----------
+            sample : pandas dataframe or tau_compact
+                Datetime data sample
+            spec : filter_spec
+                Filter
+            ----------
+        """
+        # Only the months of the -yr and -mn clauses of raw_data are scanned
+        if sample is self.raw_data and (spec.yr or spec.mn):
+            mask = np.zeros(len(sample), dtype=bool)
+            for first, span_mask in self.span_masks(spec):
+                mask[first:first+len(span_mask)] = span_mask
+            return mask
+
+        luts = filter_luts(spec, self.night)
+        profile_count('rows_scanned', len(sample))
+        with profile_stage('mask'):
+            # Calendar fields of the sample, straight from raw_data if possible
+            rows = None
+            fields = self.calendar
+            if (luts or spec.tm or spec.ng) and sample is not self.raw_data:
+                rows = self.sample_rows(sample)
+                if rows is None:
+                    fields = calendar_fields(sample_dates(sample))
+
+            return filter_rows(len(sample), spec, sample_tau(sample), luts, fields, rows)
+
+
+    def span_masks(self, spec):
+        """
+            Masks of the rows of raw_data accepted by a filter, over the
+            spans of rows of its years and months only (see calendar_spans)
+            Parameters
+            ----------
+            spec : filter_spec
+                Filter
+            ----------
+            Returns a list of (first row, mask of the span)
+        """
+        firsts, lasts = calendar_spans(self.timestamps, spec.yr, spec.mn)
+        profile_count('rows_scanned', int(np.sum(lasts - firsts)))
+        # The spans already hold the years and months
+        luts = [(name, lut) for name, lut in filter_luts(spec, self.night) if name not in ['yr', 'mn']]
+        tau = sample_tau(self.raw_data)
+
+        masks = []
+        with profile_stage('mask'):
+            for first, last in zip(firsts, lasts):
+                fields = {name: self.calendar[name][first:last] for name in CALENDAR_FIELDS}
+                masks.append((first, filter_rows(last - first, spec, tau[first:last], luts, fields)))
+
+        return masks
+
+
+    def filter(self, sample, filter_chain, output='frame', **kwargs):
         """
             To filter the data
             Parameters
             ----------
             sample : 
-                Datetime data sample
-            filter_chain : string
+                Datetime data sample (dataframe or tau_compact), or a
+                stream of chunks (see read_tau_chunks). A stream gives a
+                stream of the filtered chunks, see stream_filter.
+            filter_chain : string or filter_spec
                 Filter chain: 
-                Example:-yr 2018 -mn 12 -dy -25
+                Example:-yr 2018 -mn 12 -dy 25
+                Values are separated by commas, and first-last gives a
+                range: -hr 19-6 -mt 30-59. -tm takes intervals of times
+                of day, as -tm 19:30-06:30 (the end is not included). -ng
+                takes the hours of the night, or with a twilight (sun,
+                civil, nautical, astro) the real nights of every date,
+                from the dusk to the dawn. The chains are parsed once, a filter_spec (see
+                parse_filter_chain) skips the parsing.
+            output : string
+                'frame': rows of the sample, a copy of them. When every
+                row passes the filter the sample itself is returned, not
+                a copy: do not modify it in place
+                'positions': positions of the rows in the sample (int array)
+                'mask': boolean mask over the rows of the sample
             **kwargs : additional keywords (for verbose)
             ----------
         """
         # Add verbose
         verbose = kwargs.pop('verbose', None)
 
+        # t:     Filter per tau, below the value
         # yr:    Filter per year
         # mn:    Filter per month
         # dy:    Filter per day
         # hr:    Filter per hour
         # mt:    Filter per minute
-        # ng:    Filter per nights
-
-        ts = []
-        yrs = []
-        mns = []
-        dys = []
-        hrs = []
-        mts = []
-        night = False
-
-        # Auxiliar variables
-        cmd = ''
-        data = ''
-        val = ''
-
-        # Get filter values
-        for i, char in enumerate(filter_chain):
-            if char == '-':
-                flag_cmd = True
-                cmd = ''
-            elif char == ' ' and flag_cmd:
-                flag_cmd = False
-            elif flag_cmd:
-                cmd = cmd + char
-            # Look for years
-            elif cmd == 'yr' and not flag_cmd:
-                if char == ',' or char == ' ':
-                    try:
-                        yrs.append(int(val))
-                    except:
-                        pass
-                    val = ''
-                else:
-                    val = val + char
-                    if i == len(filter_chain)-1:
-                        yrs.append(int(val))
-            # Look for months
-            elif cmd == 'mn' and not flag_cmd:
-                if char == ',' or char == ' ':
-                    try:
-                        mns.append(int(val))
-                    except:
-                        pass
-                    val = ''
-                else:
-                    val = val + char
-                    if i == len(filter_chain)-1:
-                        mns.append(int(val))
-            # Look for days
-            elif cmd == 'dy' and not flag_cmd:
-                if char == ',' or char == ' ':
-                    try:
-                        dys.append(int(val))
-                    except:
-                        pass
-                    val = ''
-                else:
-                    val = val + char
-                    if i == len(filter_chain)-1:
-                        dys.append(int(val))
-            # Look for hours
-            elif cmd == 'hr' and not flag_cmd:
-                if char == ',' or char == ' ':
-                    try:
-                        hrs.append(int(val))
-                    except:
-                        pass
-                    val = ''
-                else:
-                    val = val + char
-                    if i == len(filter_chain)-1:
-                        hrs.append(int(val))
-            # Look for minutes
-            elif cmd == 'mt' and not flag_cmd:
-                if char == ',' or char == ' ':
-                    try:
-                        mts.append(int(val))
-                    except:
-                        pass
-                    val = ''
-                else:
-                    val = val + char
-                    if i == len(filter_chain)-1:
-                        mts.append(int(val))
-            # Look for tau
-            elif cmd == 't' and not flag_cmd:
-                if char == ',' or char == ' ':
+        # ng:    Filter per nights, the hours of the night or between twilights
+        # tm:    Filter per times of day
+        if isinstance(filter_chain, filter_spec):
+            spec = filter_chain
+        else:
+            spec = parse_filter_chain(filter_chain)
+
+        if output not in ['frame', 'positions', 'mask']:
+            raise ValueError('Output not valid: '+str(output))
+
+        # Streams of chunks, filtered chunk by chunk
+        if not is_sample(sample):
+            if output != 'frame':
+                raise ValueError('Output not valid for streams: '+str(output))
+            return stream_filter(sample, spec, self.night)
+
+        # All the clauses go to a single mask, and the rows are taken once.
+        # The -yr and -mn clauses of raw_data take the rows of their months
+        # only, the rest of raw_data is never read
+        if output != 'mask' and sample is self.raw_data and (spec.yr or spec.mn):
+            positions = [first + np.flatnonzero(mask) for first, mask in self.span_masks(spec)]
+            positions = np.concatenate(positions) if positions else np.zeros(0, dtype=np.int64)
+        else:
+            mask = self.filter_mask(sample, spec)
+            if output == 'mask':
+                return mask
+            positions = np.flatnonzero(mask)
+        profile_count('rows_returned', len(positions))
+        if output == 'positions':
+            return positions
+
+        if len(positions) < len(sample):
+            with profile_stage('gather'):
+                taken = sample.take(positions)
+                # The compact samples of raw_data keep its rows, see sample_rows
+                if sample is self.raw_data and self.compact:
+                    taken.rows = positions.astype(np.int32)
+            sample = taken
+
+        if verbose:
+            print_sample(sample)
+
+        return sample
+
+
+    def save_partitions(self, store_dir, **kwargs):
+        """
+            Write the rows as a partitioned store, one directory per year
+            and month (see save_tau_partitions). tau_lmt(store_dir) loads
+            it, and tau_lmt(store_dir, partitions='-yr 2016 -mn 3') only
+            the partitions of a filter.
+            Parameters
+            ----------
+            store_dir : string
+                Directory of the store
+            **kwargs : additional keywords (for verbose)
+            ----------
+            Returns the partitions written: {YYYY-MM: rows}
+        """
+        # Add verbose
+        verbose = kwargs.pop('verbose', None)
+
+        columns = dict(self.columns)
+        columns['Tau'] = sample_tau(self.raw_data).astype(np.float64, copy=False)
+        partitions = save_tau_partitions(store_dir, columns)
+
+        if verbose:
+            print_msg('Partitions: '+str(len(partitions))+' in '+store_dir, 'verb')
+
+        return partitions
+
+
+    def get_cube(self):
+        """
+            Statistics cube of the tau file (see tau_cube). It is built once
+            and kept in the binary cache, when the cache is enabled.
+        """
+        if self.cube is None:
+            if self.cache:
+                self.cube = load_tau_cube(self.path, self.meta)
+            if self.cube is None:
+                self.cube = build_tau_cube(self.timestamps, sample_tau(self.raw_data).astype(np.float64, copy=False))
+                if self.cache_writes:
                     try:
-                        ts.append(float(val))
-                    except:
-                        pass
-                    val = ''
-                else:
-                    val = val + char
-                    if i == len(filter_chain)-1:
-                        ts.append(float(val))
-            # Look for the nights
-            elif cmd == 'ng' and not flag_cmd:
-                night = True
+                        save_tau_cube(self.path, self.cube, self.meta)
+                    except (IOError, OSError) as e:
+                        print_msg('Statistics cube not written: '+str(e), 'warning')
 
-            if i == len(filter_chain)-1:
-                if cmd == 'ng':
-                    night = True
+        return self.cube
 
-        ts = self.validate_dates(ts, 't')
-        yrs = self.validate_dates(yrs, 'yr')
-        mns = self.validate_dates(mns, 'mn')
-        dys = self.validate_dates(dys, 'dy')
-        hrs = self.validate_dates(hrs, 'hr')
-        mts = self.validate_dates(mts, 'mt')
 
-        # Applying the filters
-        # For tau
-        if ts:
-            t = np.min(ts)
-            mask_tau = sample['Tau'].values < t
-            sample = sample[mask_tau]
-        # For years
-        if yrs:
-            mask_year = np.in1d(pd.DatetimeIndex(sample['Date']).year.values , yrs)
-            sample = sample[mask_year]
-        # For months
-        if mns:
-            mask_month = np.in1d(pd.DatetimeIndex(sample['Date']).month.values , mns)
-            sample = sample[mask_month]
-        # For days
-        if dys:
-            mask_day = np.in1d(pd.DatetimeIndex(sample['Date']).day.values , dys)
-            sample = sample[mask_day]
-        # For hours
-        if night:  # Defining nights
-            hrs = self.night
-            mask_hour = np.in1d(pd.DatetimeIndex(sample['Date']).hour.values , hrs)
-            sample = sample[mask_hour]
-        elif hrs:
-            mask_hour = np.in1d(pd.DatetimeIndex(sample['Date']).hour.values , hrs)
-            sample = sample[mask_hour]
-        # For minute
-        if mts:
-            mask_minute = np.in1d(pd.DatetimeIndex(sample['Date']).minute.values , mts)
-            sample = sample[mask_minute]
+    def get_index(self):
+        """
+            Index of the segments, gaps and duplicated dates of the tau file
+            (see series_index). It is built once, O(n), and again after new
+            lines are appended.
+        """
+        if self.index is None:
+            self.index = index_series(self.timestamps)
+
+        return self.index
+
+
+    def segments(self, **kwargs):
+        """
+            Segments of the tau file sampled without gaps (steps up to
+            GAP_CADENCES times the cadence)
+            Parameters
+            ----------
+            **kwargs : additional keywords (for verbose)
+            ----------
+            Returns a frame with the first and last dates of every segment,
+            its number of points and the gap before it
+        """
+        # Add verbose
+        verbose = kwargs.pop('verbose', None)
+
+        index = self.get_index()
+        date_from = self.timestamps[index.starts]
+        date_to = self.timestamps[index.ends - 1]
+        gap = np.concatenate([[np.iinfo(np.int64).min], date_from[1:] - date_to[:-1]])
+        segments = pd.DataFrame({'from': date_from.view('datetime64[ns]'), 'to': date_to.view('datetime64[ns]'),
+                                 'n_points': index.ends - index.starts, 'gap': gap.view('timedelta64[ns]')})
 
         if verbose:
-            n_points = len(sample.index)
-            print_msg('No. of sample points: '+str(n_points), 'verb')
-            if n_points > 0:
-                print_msg('Data from: '+ str(sample.iloc[0].Date) + ' to: ' + str(sample.iloc[n_points-1].Date), 'verb')
+            print_msg('Cadence: '+str(pd.Timedelta(index.cadence))+', No. of segments: '+str(len(segments.index))+
+                      ', duplicated dates: '+str(len(index.duplicates)), 'verb')
+            print_msg(str(segments), 'verb')
 
-        return sample
+        return segments
 
 
-    def statistics_sample(self, sample, group_string, **kwargs):
+    def coverage(self, group='mn', **kwargs):
         """
-            To get the statistics
+            Coverage of every year or month of the tau file, from the index
+            (see coverage_frame), without a pass over the samples
             Parameters
             ----------
-            sample : 
-                Datetime data sample
-            group_string : string
-                Time scale to get the statistic
+            group : string
+                'yr' or 'mn'
             **kwargs : additional keywords (for verbose)
             ----------
         """
         # Add verbose
         verbose = kwargs.pop('verbose', None)
 
-        # Decode the string instructions
-        flag_cmd = False
-        flag_value = False
-        val = ''
-        for i, char in enumerate(group_string):
-            if char == '-':
-                flag_value = True
-                flag_cmd = True
-                cmd = ''
-            elif char == ' ' and flag_cmd:
-                flag_cmd = False
-            elif char == ' ' and flag_value:
-                flag_value = False
-                flag_cmd = False
-                break
-            elif flag_cmd:
-                cmd = cmd + char
-            # Read the value of the command
-            elif flag_value and not flag_cmd:
-                val = val + char
+        coverage = coverage_frame(self.timestamps, self.get_index(), group)
 
-        time_groups = ['yr', 'mn', 'dy', 'ng', 'hr', 'mt']
+        if verbose:
+            print_msg(str(coverage), 'verb')
 
-        # Check the command is valid
-        if not cmd in time_groups:
-            print_msg('Command: '+ cmd +' is not valid', 'error')
-            return
+        return coverage
 
-        # Check that value is valid
-        try:
-            value = int(val)
-        except:
-            print_msg('Value: '+ val +' is not valid', 'error')
-            return
 
-        # Grouping year
-        n_points = len(sample.index)
+    def statistics_sample(self, sample, group_string, quantiles='exact', **kwargs):
+        """
+            To get the statistics
+            Parameters
+            ----------
+            sample : 
+                Datetime data sample (dataframe or tau_compact), or a
+                stream of chunks (see read_tau_chunks and
+                stream_statistics), or a filter chain
+                (string or filter_spec) over raw_data. With the sketches,
+                raw_data and the filters of whole hours (no -t nor -mt
+                clauses, -tm on the hour) are answered from the statistics
+                cube when the groups are years, months, days or hours (see
+                get_cube).
+            group_string : string or group_spec
+                Time scale to get the statistic, as -mn 1
+            quantiles : string
+                'exact': quartiles of the sorted samples of every group
+                'sketch': quartiles of mergeable histograms, without
+                sorting, with a relative error of SKETCH_ALPHA (0.5%) at
+                most for tau within [SKETCH_MIN, SKETCH_MAX]. The rest of
+                the statistics are the same (up to rounding).
+            **kwargs : additional keywords (for verbose)
+            ----------
+            The sample is divided in groups of consecutive years, months,
+            days, hours or minutes, counted from the first date of the
+            sample. Every group gets the date of its first unit (the first
+            date plus the units before it) and the statistics of tau:
+            count, mean, std, quartiles, max and min. The groups are
+            computed all at once (see bin_statistics).
+        """
+        # Add verbose
+        verbose = kwargs.pop('verbose', None)
+
+        # Decode the string instructions
+        if isinstance(group_string, group_spec):
+            cmd, value = group_string
+        else:
+            try:
+                cmd, value = parse_group_chain(group_string)
+            except ValueError as e:
+                print_msg(str(e), 'error')
+                return
+
+        if quantiles not in ['exact', 'sketch']:
+            raise ValueError('Quantiles not valid: '+str(quantiles))
+
+        # Filter chains over raw_data
+        spec = None
+        if isinstance(sample, filter_spec):
+            spec = sample
+        elif isinstance(sample, str):
+            spec = parse_filter_chain(sample)
+        elif sample is self.raw_data:
+            spec = parse_filter_chain('')
+
+        if spec is not None and quantiles == 'sketch' and cube_aligned(spec, cmd):
+            stats = cube_statistics(self.get_cube(), spec, cmd, value, self.night)
+            if verbose:
+                print_msg('No. of groups: '+str(len(stats.index))+', from the statistics cube', 'verb')
+                print_msg(str(stats), 'verb')
+            return stats
+
+        if spec is not None and sample is not self.raw_data:
+            sample = self.filter(self.raw_data, spec)
+
+        # Streams of chunks, see read_tau_chunks
+        if not is_sample(sample):
+            stats = stream_statistics(sample, group_spec(cmd, value), quantiles)
+            if verbose:
+                print_msg('No. of groups: '+str(len(stats.index)), 'verb')
+                print_msg(str(stats), 'verb')
+            return stats
+
+        # Groups of the nights are not defined
+        n_points = len(sample)
+        if cmd not in ['yr', 'mn', 'dy', 'hr', 'mt'] or n_points == 0:
+            return pd.DataFrame()
+
+        date = sample_dates(sample)
+        tau = sample_tau(sample).astype(np.float64, copy=False)
 
         # Date limits
-        init_date = sample['Date'].iloc[0]
-        end_date = sample['Date'].iloc[n_points-1]
+        init_ns = date[0]
+        end_ns = date[n_points-1]
+
+        # Time unit of every sample, then its group
+        fields = self.sample_calendar(sample) if cmd in ['yr', 'mn'] else None
+        bins, stats, n_units = group_statistics(date, tau, cmd, value, init_ns, end_ns, fields, quantiles)
 
         # Create data frame to store the stats
-        rows_data_stat = []
+        stats = statistics_frame(init_ns, cmd, value, bins, stats)
 
-        # Y E A R S
-        if cmd == 'yr':
-            # Number of days to read
-            init_yr = init_date.year
-            end_yr = end_date.year
-
-            # Range of dates with an increasing factor of one day
-            yrs = np.arange(init_yr, end_yr+1, 1)
-
-            # Initial date mask
-            # Step in months
-            delta = pd.DateOffset(years=value)
-            # Definition of one month
-            one_year = pd.DateOffset(years=1)
-
-            year_array_movil = sample[
-                (sample['Date'] >= init_date ) &
-                (sample['Date'] <= init_date+delta )
-            ]
-
-            date_mask = pd.DatetimeIndex(year_array_movil['Date'])
-
-            # Auxiliar variables
-            cnc_year = []
-            cnt_year = 0
-            trigger_year = False
-
-            for yr in yrs:
-                # Get year mask
-                mask = np.in1d(date_mask.year.values , yr)
-
-                # Trigger the counting
-                if np.count_nonzero(mask) > 0:
-                    trigger_year = True
-
-                # Starting the day adquisition
-                if trigger_year:
-
-                    cnt_year = cnt_year + 1
-                    cnc_year.append(yr)
-
-                    # Averaging val samples
-                    if cnt_year == value or yr == yrs[-1]:
-                        mask = np.in1d(date_mask.year.values , cnc_year)
-                        year_sample = year_array_movil[mask]
-
-                        cnt_year = 0
-                        cnc_year = []
-
-                        if np.count_nonzero(mask) > 0:
-                            mg = year_sample.describe().values.flatten()
-                            cols_data = {}
-                            cols_data.update({'Date': init_date, 'tau_count':mg[0], 'tau_mean':mg[1],
-                                      'tau_std': mg[2], 'tau_25':mg[4], 'tau_50':mg[5], 'tau_75':mg[6], 'tau_max':mg[7],
-                                      'tau_min': mg[3]
-                                     })
-                            rows_data_stat.append(cols_data)
-                            if verbose:
-                                print (year_sample.describe())
-                        else:
-                            if verbose:
-                                print_msg('Empty span', 'warning')
-
-                        # Re-define the sample size and boundaries
-                        year_array_movil = sample[
-                            (sample['Date'] >= init_date ) &
-                            (sample['Date'] <= init_date+delta )
-                        ]
-
-                        # Updating the boundaries
-                        init_date = init_date + delta
-
-                        date_mask = pd.DatetimeIndex(year_array_movil['Date'])
-        # M O N T H S
-        elif cmd == 'mn':
-            # Number of days to read
-            nummonths = (end_date.year - init_date.year) * 12 + (end_date.month - init_date.month) + 1
-
-            # Range of dates with an increasing factor of one day
-            mns = []
-            mn_count = init_date.month
-            for i in range(nummonths):
-                if mn_count > 12:
-                    mn_count = 1
-                mns.append(mn_count)
-                mn_count += 1
-            mns = np.array(mns)
-
-            # Initial date mask
-            # Step in months
-            delta = pd.DateOffset(months=value)
-            # Definition of one month
-            one_month = pd.DateOffset(months=1)
-
-            month_array_movil = sample[
-                (sample['Date'] >= init_date-one_month ) &
-                (sample['Date'] <= init_date+delta+one_month)
-            ]
-
-            date_mask = pd.DatetimeIndex(month_array_movil['Date'])
-
-            # Auxiliar variables
-            cnc_month = []
-            cnt_month = 0
-            trigger_month = False
-
-            for i, mn in enumerate(mns):
-                # Get month and mask
-                mask = np.in1d(date_mask.month.values , mn)
-
-                # Trigger the counting
-                if np.count_nonzero(mask) > 0:
-                    trigger_month = True
-
-                # Starting the month adquisition
-                if trigger_month:
-
-                    cnt_month = cnt_month + 1
-                    cnc_month.append(mn)
-
-                    # Averaging val samples
-                    if cnt_month == value or i == len(mns)-1:
-                        mask = np.in1d(date_mask.month.values , cnc_month)
-                        month_sample = month_array_movil[mask]
-
-                        cnt_month = 0
-                        cnc_month = []
-
-                        if np.count_nonzero(mask) > 0:
-                            print (month_sample['Date'].iloc[0], month_sample['Date'].iloc[len(month_sample.index)-1])
-                            mg = month_sample.describe().values.flatten()
-                            cols_data = {}
-                            cols_data.update({'Date': init_date, 'tau_count':mg[0], 'tau_mean':mg[1],
-                                      'tau_std': mg[2], 'tau_25':mg[4], 'tau_50':mg[5], 'tau_75':mg[6], 'tau_max':mg[7],
-                                      'tau_min': mg[3]
-                                     })
-                            rows_data_stat.append(cols_data)
-                            if verbose:
-                                print (month_sample.describe())
-
-                        else:
-                            if verbose:
-                                print_msg('Empty span', 'warning')
-
-                        # Re-define the sample size and boundaries
-                        month_array_movil = sample[
-                            (sample['Date'] >= init_date-one_month ) &
-                            (sample['Date'] <= init_date+delta+one_month)
-                        ]
-
-                        # Updating the boundaries
-                        init_date = init_date + delta
-
-                        date_mask = pd.DatetimeIndex(month_array_movil['Date'])
-
-        # D A Y S
-        elif cmd == 'dy':
-            # Number of days to read
-            numdays = (end_date-init_date).days
-
-            # Range of dates with an increasing factor of one day
-            dys = [init_date + pd.Timedelta(days=x) for x in range(numdays)]
-
-            # Initial date mask
-            # Step in days
-            delta = pd.Timedelta(days=value)
-            # Definition of one day
-            one_day = pd.Timedelta(days=1)
-
-            day_array_movil = sample[
-                (sample['Date'] >= init_date-one_day ) &
-                (sample['Date'] <= init_date+delta+one_day)
-            ]
-
-            date_mask = pd.DatetimeIndex(day_array_movil['Date'])
-
-            # Auxiliar variables
-            cnc_day = []
-            cnt_day = 0
-            trigger_day = False
-
-            for i, date_day in enumerate(dys):
-                # Get day and mask
-                dy = date_day.day
-                mask = np.in1d(date_mask.day.values , dy)
-
-                # Trigger the counting
-                if np.count_nonzero(mask) > 0:
-                    trigger_day = True
-
-                # Starting the day adquisition
-                if trigger_day:
-
-                    cnt_day = cnt_day + 1
-                    cnc_day.append(dy)
-
-                    # Averaging val samples
-                    if cnt_day == value or i == len(dys)-1:
-                        mask = np.in1d(date_mask.day.values , cnc_day)
-                        day_sample = day_array_movil[mask]
-
-                        cnt_day = 0
-                        cnc_day = []
-
-                        if np.count_nonzero(mask) > 0:
-                            mg = day_sample.describe().values.flatten()
-                            cols_data = {}
-                            cols_data.update({'Date': init_date, 'tau_count':mg[0], 'tau_mean':mg[1],
-                                      'tau_std': mg[2], 'tau_25':mg[4], 'tau_50':mg[5], 'tau_75':mg[6], 'tau_max':mg[7],
-                                      'tau_min': mg[3]
-                                     })
-                            rows_data_stat.append(cols_data)
-                            if verbose:
-                                print (day_sample.describe())
-
-                        else:
-                            if verbose:
-                                print_msg('Empty span', 'warning')
-
-                        # Re-define the sample size and boundaries
-                        day_array_movil = sample[
-                            (sample['Date'] >= init_date-one_day ) &
-                            (sample['Date'] <= init_date+delta+one_day)
-                        ]
-
-                        # Updating the boundaries
-                        init_date = init_date + delta
-
-                        date_mask = pd.DatetimeIndex(day_array_movil['Date'])
-
-        # H O U R S
-        elif cmd == 'hr':
-            # Number of hours to read
-            numhours = int(np.ceil((end_date-init_date)/np.timedelta64(1, 'h')))
-
-            # Range of dates with an increasing factor of one day
-            hrs = []
-            hr_count = init_date.hour
-            for i in range(numhours):
-                if hr_count > 23:
-                    hr_count = 0
-                hrs.append(hr_count)
-                hr_count += 1
-            hrs = np.array(hrs)
-
-            # Initial date mask
-            # Step in hours
-            delta = pd.to_timedelta(val.zfill(2)+':00:00')
-            # Definition of one hour
-            one_hour = pd.to_timedelta('01:00:00')
-
-            hour_array_movil = sample[
-                (sample['Date'] >= init_date-one_hour ) &
-                (sample['Date'] <= init_date+delta+one_hour)
-            ]
-
-            date_mask = pd.DatetimeIndex(hour_array_movil['Date'])
-
-            # Auxiliar variables
-            cnc_hour = []
-            cnt_hour = 0
-            trigger_hour = False
-
-            for i, hr in enumerate(hrs):
-                # Get hour and mask
-                mask = np.in1d(date_mask.hour.values , hr)
-
-                # Trigger the counting
-                if np.count_nonzero(mask) > 0:
-                    trigger_hour = True
-
-                # Starting the hour adquisition
-                if trigger_hour:
-
-                    cnt_hour = cnt_hour + 1
-                    cnc_hour.append(hr)
-
-                    # Averaging val samples
-                    if cnt_hour == value or i == len(hrs)-1:
-                        mask = np.in1d(date_mask.hour.values , cnc_hour)
-                        hour_sample = hour_array_movil[mask]
-
-                        cnt_hour = 0
-                        cnc_hour = []
-
-                        if np.count_nonzero(mask) > 0:
-                            mg = hour_sample.describe().values.flatten()
-                            cols_data = {}
-                            cols_data.update({'Date': init_date, 'tau_count':mg[0], 'tau_mean':mg[1],
-                                      'tau_std': mg[2], 'tau_25':mg[4], 'tau_50':mg[5], 'tau_75':mg[6], 'tau_max':mg[7],
-                                      'tau_min': mg[3]
-                                     })
-                            rows_data_stat.append(cols_data)
-                            if verbose:
-                                print(hour_sample.describe())
-
-                        else:
-                            if verbose:
-                                print_msg('Empty span', 'warning')
-
-                        # Re-define the sample size and boundaries
-                        hour_array_movil = sample[
-                            (sample['Date'] >= init_date-one_hour ) &
-                            (sample['Date'] <= init_date+delta+one_hour)
-                        ]
-
-                        # Updating the boundaries
-                        init_date = init_date + delta
-
-                        date_mask = pd.DatetimeIndex(hour_array_movil['Date'])
-
-        # M I N U T E S
-        elif cmd == 'mt':
-            # Number of hours to read
-            numminutes = int(np.ceil((end_date-init_date)/np.timedelta64(1, 'm')))
-
-            # Range of dates with an increasing factor of one day
-            mts = []
-            mt_count = init_date.minute
-            for i in range(numminutes):
-                if mt_count > 59:
-                    mt_count = 0
-                mts.append(mt_count)
-                mt_count += 1
-            mts = np.array(mts)
-
-            # Initial date mask
-            # Step in hours
-            delta = pd.to_timedelta('00:'+val.zfill(2)+':00')
-            # Definition of one hour
-            one_minute = pd.to_timedelta('00:01:00')
-
-            minute_array_movil = sample[
-                (sample['Date'] >= init_date-one_minute ) &
-                (sample['Date'] <= init_date+delta+one_minute )
-            ]
-
-            date_mask = pd.DatetimeIndex(minute_array_movil['Date'])
-
-            # Auxiliar variables
-            cnc_minute = []
-            cnt_minute = 0
-            trigger_minute = False
-
-            for i, mt in enumerate(mts):
-                # Get hour and mask
-                mask = np.in1d(date_mask.minute.values , mt)
-
-                # Trigger the counting
-                if np.count_nonzero(mask) > 0:
-                    trigger_minute = True
-
-                # Starting the hour adquisition
-                if trigger_minute:
-
-                    cnt_minute = cnt_minute + 1
-                    cnc_minute.append(mt)
-
-                    # Averaging val samples
-                    if cnt_minute == value or i == len(mts)-1:
-                        mask = np.in1d(date_mask.minute.values , cnc_minute)
-                        minute_sample = minute_array_movil[mask]
-
-                        cnt_minute = 0
-                        cnc_minute = []
-
-                        if np.count_nonzero(mask) > 0:
-                            mg = minute_sample.describe().values.flatten()
-                            cols_data = {}
-                            cols_data.update({'Date': init_date, 'tau_count':mg[0], 'tau_mean':mg[1],
-                                      'tau_std': mg[2], 'tau_25':mg[4], 'tau_50':mg[5], 'tau_75':mg[6], 'tau_max':mg[7],
-                                      'tau_min': mg[3]
-                                     })
-                            rows_data_stat.append(cols_data)
-                            if verbose:
-                                print(minute_sample.describe())
-                        else:
-                            if verbose:
-                                print_msg('Empty span', 'warning')
-
-                        # Re-define the sample size and boundaries
-                        minute_array_movil = sample[
-                            (sample['Date'] >= init_date-one_minute ) &
-                            (sample['Date'] <= init_date+delta+one_minute )
-                        ]
-
-                        # Updating the boundaries
-                        init_date = init_date + delta
-
-                        date_mask = pd.DatetimeIndex(minute_array_movil['Date'])
-
-        return pd.DataFrame(rows_data_stat)
+        if verbose:
+            n_groups = -(-n_units//value)
+            print_msg('No. of groups: '+str(len(stats.index))+', empty: '+str(n_groups-len(stats.index)), 'verb')
+            print_msg(str(stats), 'verb')
 
+        return stats
 
-    def tau_plotter(self, dataframe, figs, mean=True, boxplot=True, mean_color='r', edge_color='k', med_color='blue', **kwargs):
+
+    def window_statistics(self, window, years=None, sample=None, quantiles='exact', **kwargs):
         """
-            Tau plotter tool
+            Statistics of the daily window of every month, for all the
+            years and months in a single pass over the data
             Parameters
             ----------
-            dataframe : pandas dataframe
-                Dataframe with tau data
-            figs : array
-                figs[0]: figure
-                figs[1]: axes
-            mean : boolean
-                Show the mean
-            boxplot : bool
-                Show statistics as boxplot figures
-            mean_color : string
-                Color to show the mean
-            edge_color : string
-                Color to show the quartils
-            med_color : string
-                Color to show the median
-            **kwargs : additional keywords (for verbose)           
+            window : window_spec
+                Daily window of every month, see seasonal_windows
+            years : int list
+                Years to take (None: all)
+            sample : pandas dataframe or tau_compact
+                Datetime data sample (None: raw_data)
+            quantiles : string
+                'exact' or 'sketch', see statistics_sample
+            **kwargs : additional keywords (for verbose)
             ----------
+            Returns the statistics of every year and month with samples in
+            the window, dated the first day of the month (STAT_COLUMNS)
         """
-        fig = figs[0]
-        axes = figs[1]
+        # Add verbose
+        verbose = kwargs.pop('verbose', None)
+
+        if quantiles not in ['exact', 'sketch']:
+            raise ValueError('Quantiles not valid: '+str(quantiles))
 
-        #fig, axes = subplots(nrows=1, ncols=1, figsize=(6, 6), sharey=True)
-        fig.subplots_adjust(bottom=0.15, top=0.95, left=0.08, right=0.95)
+        if sample is None:
+            sample = self.raw_data
+        fields = self.sample_calendar(sample)
+        tau = sample_tau(sample).astype(np.float64, copy=False)
 
-        row_stats = []
-        n_points = len(dataframe.index)
+        # Every row goes to the window of its year and month
+        profile_count('rows_scanned', len(tau))
+        with profile_stage('mask'):
+            in_window = window_rows(fields, window) & ~np.isnan(tau)
+            if years is not None:
+                in_window &= np.isin(fields['yr'], np.asarray(years, dtype=np.int64))
+        with profile_stage('gather'):
+            months = fields['yr'][in_window].astype(np.int64)*12 + fields['mn'][in_window] - 1
 
-        # Extract the percentils
-        q1 = dataframe['tau_25'].values
-        med = dataframe['tau_50'].values
-        q3 = dataframe['tau_75'].values
+        if quantiles == 'exact':
+            bins, stats = bin_statistics(months, tau[in_window])
+        else:
+            bins, stats = summary_statistics(summarize_groups(months, tau[in_window]))
 
-        # Extract the limits
-        low = dataframe['tau_min'].values
-        high = dataframe['tau_max'].values
+        stats['Date'] = (bins - 1970*12).astype('datetime64[M]').astype('datetime64[ns]')
+        stats = pd.DataFrame(stats, columns=STAT_COLUMNS)
 
-        # Extract the mean
-        avg = dataframe['tau_mean'].values
+        if verbose:
+            print_msg('No. of windows: '+str(len(stats.index))+', samples: '+str(np.sum(in_window)), 'verb')
+            print_msg(str(stats), 'verb')
 
-        # Extract x axis
-        n_points = len(dataframe.index)
+        return stats
 
-        # Date limits
-        init_date = dataframe['Date'].iloc[0]
-        end_date = dataframe['Date'].iloc[n_points-1]
 
-        pos_x = ((dataframe['Date']-init_date)/np.timedelta64(1,'m')).values
-        step = np.min(np.diff(pos_x))
+    def statistics_jobs(self, jobs, workers=None, quantiles='exact', **kwargs):
+        """
+            Statistics of many filters at once, over a pool of processes
+            attached to the binary cache of the tau file
+            Parameters
+            ----------
+            jobs : list
+                (filter chain, group chain) pairs, as ('-yr 2016 -hr 19-6',
+                '-mn 1'). The chains can be strings or filter_spec and
+                group_spec
+            workers : int
+                Number of processes (None: one per core, 1: no pool)
+            quantiles : string
+                'exact' or 'sketch', see statistics_sample
+            **kwargs : additional keywords (for verbose)
+            ----------
+            Returns the statistics of all the jobs in one frame, in the
+            order of the jobs, with their position in the 'job' column
+        """
+        # Add verbose
+        verbose = kwargs.pop('verbose', None)
+
+        # Without the binary cache every worker would parse the file
+        if not self.cache and workers != 1:
+            print_msg('The workers need the binary cache, running the jobs in this process', 'warning')
+            workers = 1
+
+        # This process holds the data already, the forked workers inherit it
+        jobs = [statistics_job(self.path, sample, group) for sample, group in jobs]
+
+        stats = pool_statistics(jobs, workers, quantiles, self.compact, {self.path: self})
+
+        if verbose:
+            print_msg('No. of jobs: '+str(len(jobs))+', groups: '+str(len(stats.index)), 'verb')
+            print_msg(str(stats), 'verb')
+
+        return stats
+
+
+    def rolling_statistics(self, sample, window, at=None, **kwargs):
+        """
+            Rolling statistics: the statistics of tau in a time window that
+            ends at every sample, as the median of the last 3 hours. The
+            window is a time, so it follows the irregular spacing of the
+            samples.
+            Parameters
+            ----------
+            sample : 
+                Datetime data sample (dataframe or tau_compact), or a
+                filter chain (string or filter_spec) over raw_data
+            window : string or timedelta
+                Length of the window, as '3h' or '30min'. The window of a
+                date is (date - window, date]
+            at : array of datetimes
+                Ends of the windows, in any order (None: the dates of the
+                samples)
+            **kwargs : additional keywords (for verbose)
+            ----------
+            Returns the statistics of every window (STAT_COLUMNS), Date is
+            its end. The windows without samples get nan. Every window
+            costs O(log n), whatever its length (see rolling_statistics).
+        """
+        # Add verbose
+        verbose = kwargs.pop('verbose', None)
 
-        widths = 0.85*step*np.ones_like(pos_x)
+        if isinstance(sample, (str, filter_spec)):
+            sample = self.filter(self.raw_data, sample)
+        if not is_sample(sample):
+            raise ValueError('Rolling statistics need a sample in memory, not a stream')
 
-        if boxplot:
-            for i in range(n_points):
-                stats = {}
-                stats.update({
-                    "med": med[i],      # Median or 50%
-                    "q1": q1[i],        # 25%
-                    "q3": q3[i],        # 75%
-                    "whislo": low[i],   # Minimum
-                    "whishi": high[i],  # Maximum
-                    "fliers": []
-                    })
+        window_ns = pd.Timedelta(window).value
+        if window_ns <= 0:
+            raise ValueError('Window not valid: '+str(window))
 
-                row_stats.append(stats)
+        date = sample_dates(sample)
+        if at is not None:
+            at = pd.DatetimeIndex(at).values.astype('datetime64[ns]').view(np.int64)
 
-            box = axes.bxp(row_stats, positions=pos_x, widths=widths)#, patch_artist=True)
-            for element in ['boxes', 'whiskers', 'fliers', 'means', 'medians', 'caps']:
-                setp(box[element], color=edge_color)
+        stats = rolling_statistics(date, sample_tau(sample), window_ns, at)
+        stats['Date'] = (date if at is None else at).view('datetime64[ns]')
+        stats = pd.DataFrame(stats, columns=STAT_COLUMNS)
 
-            for element in ['medians']:
-                setp(box[element], color=med_color)
+        if verbose:
+            print_msg('No. of windows: '+str(len(stats.index))+', window: '+str(pd.Timedelta(window)), 'verb')
+            print_msg(str(stats), 'verb')
 
-        if mean:
-            axes.plot(pos_x, avg, mean_color+'s-')
+        return stats
 
-        if mean or boxplot:
-            axes.set_xticklabels( dataframe['Date'], rotation=45 )
-            axes.set_xlim(np.min(pos_x) - step, np.max(pos_x) + step)
-            axes.set_ylabel(r'Opacity $\tau$',fontsize=20)
-            axes.tick_params(axis='y', labelsize=20)
 
-            show()
+    def tau_plotter(self, dataframe, figs, mean=True, boxplot=True, mean_color='r', edge_color='k', med_color='blue', **kwargs):
+        """
+            Tau plotter tool, see tau_plot.tau_plotter
+            Parameters
+            ----------
+            dataframe : pandas dataframe
+                Dataframe with tau data
+            figs : array
+                figs[0]: figure
+                figs[1]: axes
+            ----------
+        """
+        # matplotlib is loaded on the first plot
+        from tau_plot import tau_plotter
 
-        return 0
+        return tau_plotter(dataframe, figs, mean=mean, boxplot=boxplot, mean_color=mean_color,
+                           edge_color=edge_color, med_color=med_color, **kwargs)
 
 
     def tau_plotter_hughes_format(self, dataframe, figs, show_limits=False, **kwargs):
         """
-            To plot tau as D. Hughes suggests
+            To plot tau as D. Hughes suggests, see
+            tau_plot.tau_plotter_hughes_format
             Parameters
             ----------
             dataframe : pandas dataframe
@@ -921,59 +4332,242 @@ class tau_lmt():
             figs : array
                 figs[0]: figure
                 figs[1]: axes
-            show_limits : boolean
-                Show the 2mm and 8mm PWV limits
-            **kwargs : additional keywords (for verbose)           
             ----------
         """
-        fig = figs[0]
-        axes = figs[1]
+        # matplotlib is loaded on the first plot
+        from tau_plot import tau_plotter_hughes_format
+
+        return tau_plotter_hughes_format(dataframe, figs, show_limits=show_limits, **kwargs)
 
-        fig.subplots_adjust(bottom=0.1, top=0.95, left=0.08, right=0.95)
 
-        row_stats = []
-        n_points = len(dataframe.index)
+class tau_sites():
+    """
+        Tau series of several sites or instruments, by name. Every series
+        is a tau_lmt object with its own file and cadence. The filters and
+        the statistics run over all of them in one call, and align puts
+        them side by side on a common time grid.
+        Parameters
+        ----------
+        series : dictionary
+            tau_lmt objects or opacity data paths, by name
+        **kwargs : keywords of tau_lmt for the paths (cache, parser,
+        compact, verbose)
+        ----------
+    """
+    def __init__(self, series, **kwargs):
+        self.series = {}
+        for name, data in series.items():
+            self.series[name] = data if isinstance(data, tau_lmt) else tau_lmt(data, **dict(kwargs))
+        self.names = list(self.series)
 
-        # Extract the percentiles
-        q1 = dataframe['tau_25'].values
-        med = dataframe['tau_50'].values
-        q3 = dataframe['tau_75'].values
 
-        # Extract the mean
-        avg = dataframe['tau_mean'].values
+    def __getitem__(self, name):
+        return self.series[name]
 
-        # Extract x axis
-        n_points = len(dataframe.index)
 
-        # Date limits
-        init_date = dataframe['Date'].iloc[0]
-        end_date = dataframe['Date'].iloc[n_points-1]
+    def samples(self, samples=None):
+        """
+            Sample of every series
+            Parameters
+            ----------
+            samples : dictionary, string or filter_spec
+                Samples by name (the missing ones: raw_data), or a filter
+                chain over the raw_data of every series (None: raw_data)
+            ----------
+        """
+        if samples is None:
+            return {name: self.series[name].raw_data for name in self.names}
+        if isinstance(samples, (str, filter_spec)):
+            return self.filter(samples)
+
+        return {name: samples.get(name, self.series[name].raw_data) for name in self.names}
+
+
+    def filter(self, filter_chain, samples=None, **kwargs):
+        """
+            Filter the samples of every series with the same chain, parsed
+            once
+            Parameters
+            ----------
+            filter_chain : string or filter_spec
+                Filter chain, see tau_lmt.filter
+            samples : dictionary
+                Samples by name (None: raw_data of every series)
+            **kwargs : keywords of tau_lmt.filter (output, verbose)
+            ----------
+            Returns the filtered samples by name
+        """
+        spec = filter_chain if isinstance(filter_chain, filter_spec) else parse_filter_chain(filter_chain)
+        samples = self.samples(samples)
+
+        return {name: self.series[name].filter(samples[name], spec, **dict(kwargs)) for name in self.names}
+
+
+    def cadences(self):
+        """
+            Sampling period of every series, nanoseconds (see series_index)
+        """
+        return {name: self.series[name].get_index().cadence for name in self.names}
+
+
+    def grid(self, samples=None, cadence=None):
+        """
+            Common time grid of the samples, within the period that all of
+            them cover
+            Parameters
+            ----------
+            samples : dictionary, string or filter_spec
+                Samples, see samples
+            cadence : string or timedelta
+                Period of a regular grid, as '5min' (None: the dates of the
+                series with the longest cadence)
+            ----------
+            Returns int64 nanoseconds since epoch
+        """
+        dates = {name: sample_dates(sample) for name, sample in self.samples(samples).items()}
+        if any([len(date) == 0 for date in dates.values()]):
+            return np.zeros(0, dtype=np.int64)
+
+        first = max([date[0] for date in dates.values()])
+        last = min([date[-1] for date in dates.values()])
+
+        if cadence is None:
+            cadences = self.cadences()
+            date = dates[max(self.names, key=lambda name: cadences[name])]
+            return date[np.searchsorted(date, first, side='left'):np.searchsorted(date, last, side='right')]
+
+        step = pd.Timedelta(cadence).value
+        return np.arange(-(-first//step)*step, last+1, step, dtype=np.int64)
+
+
+    def align(self, samples=None, at=None, cadence=None, tolerance=None, direction='backward', complete=True, **kwargs):
+        """
+            Series side by side on a common time grid, with an as-of join
+            (see asof_rows)
+            Parameters
+            ----------
+            samples : dictionary, string or filter_spec
+                Samples, see samples
+            at : array of datetimes
+                Instants of the grid (None: see grid)
+            cadence : string or timedelta
+                Period of a regular grid, see grid
+            tolerance : string or timedelta
+                Longest distance from an instant to its sample (None: the
+                longest cadence of the series)
+            direction : string
+                'backward': the last sample up to every instant, 'forward':
+                the first one from it, 'nearest': the closest one
+            complete : bool
+                Only the instants with a sample of every series
+            **kwargs : additional keywords (for verbose)
+            ----------
+            Returns a dataframe with the Date of the grid and the tau of
+            every series, by name (NaN: no sample within the tolerance)
+        """
+        # Add verbose
+        verbose = kwargs.pop('verbose', None)
 
-        pos_x = ((dataframe['Date']-init_date)/np.timedelta64(1,'m')).values
+        samples = self.samples(samples)
+        if at is None:
+            at = self.grid(samples, cadence)
+        else:
+            at = pd.DatetimeIndex(at).values.astype('datetime64[ns]').view(np.int64)
+
+        if tolerance is None:
+            tolerance = max(self.cadences().values())
+        else:
+            tolerance = pd.Timedelta(tolerance).value
+
+        columns = {}
+        found = np.ones(len(at), dtype=bool)
+        for name in self.names:
+            rows = asof_rows(sample_dates(samples[name]), at, tolerance, direction)
+            tau = sample_tau(samples[name]).astype(np.float64, copy=False)
+            columns[name] = np.where(rows >= 0, tau[np.maximum(rows, 0)] if len(tau) > 0 else np.nan, np.nan)
+            found &= rows >= 0
+
+        if complete:
+            at = at[found]
+            columns = {name: values[found] for name, values in columns.items()}
+        aligned = pd.DataFrame(dict({'Date': at.view('datetime64[ns]')}, **columns), columns=['Date'] + self.names)
+
+        if verbose:
+            print_msg('Aligned instants: '+str(len(at))+', complete: '+str(int(np.sum(found))), 'verb')
 
-        axes.plot(pos_x, q1, 'bs-', label=r'First Quartile')
-        axes.plot(pos_x, med, 'gs--', label=r'Median')
-        axes.plot(pos_x, q3, 'rs-.', label=r'Third Quartile')
+        return aligned
 
-        # If limits are adjusted
-        if show_limits:
-            axes.axhline(0.1, color='k', linestyle='--')
-            axes.axhline(0.4, color='k', linestyle='--')
-            axes.text(pos_x[-1], 0.11, r'2mm PWV')
-            axes.text(pos_x[-1], 0.41, r'8mm PWV')
 
-        axes.set_xticks(pos_x)
-        #axes.set_xticklabels(dataframe['Date'], rotation=45)
-        axes.set_xticklabels(['January','February','March','April','May','June','July','August','September','October', 'November','December'], rotation=0)
+    def statistics_sample(self, samples, group_string, quantiles='exact', aligned=False, **kwargs):
+        """
+            Statistics of every series side by side, on the same groups
+            Parameters
+            ----------
+            samples : dictionary, string or filter_spec
+                Samples, see samples
+            group_string : string or group_spec
+                Time scale of the statistics, see tau_lmt.statistics_sample
+            quantiles : string
+                'exact' or 'sketch', see tau_lmt.statistics_sample
+            aligned : bool
+                Statistics of the instants aligned with every series only
+                (see align), else of all the samples of every series
+            **kwargs : additional keywords (for verbose), and the keywords
+            of align
+            ----------
+            Every series is reduced on its own, the groups are counted from
+            the first date of all the samples, so the groups of the series
+            match. Returns one row per group with samples, the Date and the
+            STAT_COLUMNS of every series as <name>_<column> (count 0 and
+            NaN statistics for the series without samples in the group).
+        """
+        # Add verbose
+        verbose = kwargs.pop('verbose', None)
 
-        #axes.set_xlim(np.min(pos_x) - step, np.max(pos_x) + step)
-        axes.set_ylabel(r'Opacity $\tau$')
-        axes.set_xlabel(r'\textbf{Month of year}')
-        axes.tick_params(axis='y')
+        cmd, value = group_string if isinstance(group_string, group_spec) else parse_group_chain(group_string)
+        if quantiles not in ['exact', 'sketch']:
+            raise ValueError('Quantiles not valid: '+str(quantiles))
+
+        samples = self.samples(samples)
+        if aligned:
+            frame = self.align(samples, **kwargs)
+            samples = {name: pd.DataFrame({'Date': frame['Date'].values, 'Tau': frame[name].values}) for name in self.names}
+
+        dates = {name: sample_dates(sample) for name, sample in samples.items()}
+        filled = [date for date in dates.values() if len(date) > 0]
+        # Groups of the nights are not defined
+        if cmd not in ['yr', 'mn', 'dy', 'hr', 'mt'] or len(filled) == 0:
+            return pd.DataFrame()
+
+        # The same first and last dates for every series
+        init_ns = min([date[0] for date in filled])
+        end_ns = max([date[-1] for date in filled])
+
+        reduced = {}
+        for name in self.names:
+            if len(dates[name]) == 0:
+                continue
+            fields = self.series[name].sample_calendar(samples[name]) if cmd in ['yr', 'mn'] and not aligned else None
+            tau = sample_tau(samples[name]).astype(np.float64, copy=False)
+            bins, stats, n_units = group_statistics(dates[name], tau, cmd, value, init_ns, end_ns, fields, quantiles)
+            reduced[name] = (bins, stats)
+
+        # Every series takes its groups in the union of the groups
+        groups = np.unique(np.concatenate([bins for bins, stats in reduced.values()]))
+        stats = {'Date': bin_labels(init_ns, cmd, value, groups)}
+        for name in self.names:
+            positions = np.searchsorted(groups, reduced[name][0]) if name in reduced else []
+            for column in STAT_COLUMNS[1:]:
+                stats[name+'_'+column] = np.zeros(len(groups)) if column == 'tau_count' else np.full(len(groups), np.nan)
+                if name in reduced:
+                    stats[name+'_'+column][positions] = reduced[name][1][column]
+        stats = pd.DataFrame(stats)
 
-        axes.legend()
+        if verbose:
+            print_msg('No. of groups: '+str(len(stats.index)), 'verb')
+            print_msg(str(stats), 'verb')
 
-        return 0
+        return stats
 
 
 # period_filtered = tau.filter(tau.raw_data, '-hr 7,8,9,10,11', verbose=True)
@@ -1044,35 +4638,6 @@ class tau_lmt():
 
 
 
-# Morning
-months = np.array([[7,8,9,10],
-                   [7,8,9,10],
-                   [7,8,9,10],
-                   [7,8,9,10],
-                   [7,8,9,10],
-                   [7,8,9,10],
-                   [7,8,9,10],
-                   [7,8,9,10],
-                   [7,8,9,10],
-                   [7,8,9,10],
-                   [7,8,9,10],
-                   [7,8,9,10]])
-
-mask_30min = np.array([[False, False],
-                 [False, False],
-                 [False, False],
-                 [False, False],
-                 [False, False],
-                 [False, False],
-                 [False, False],
-                 [False, False],
-                 [False, False],
-                 [False, False],
-                 [False, False],
-                 [False, False]])
-
-
-
 # Tau LMT object
 #tau = tau_lmt(verbose=True)
 
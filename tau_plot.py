@@ -0,0 +1,365 @@
+# -*- coding: utf-8 -*-
+# --------------------------------------------------------------------------------- #
+# "LMT opacity library" tau_plot.py
+# Plotting tools of the statistics of tau_lmt. Imported on the first plot, so
+# the filters and the statistics do not load matplotlib
+#
+# Marcial Becerril, @ May 2020
+# Latest Revision: Feb 2021, 21:57 GMT-6
+#
+# For all kind of problems, requests of enhancements and bug reports, please
+# write to me at:
+#
+# mbecerrilt92@gmail.com
+# mbecerrilt@inaoep.mx
+#
+# --------------------------------------------------------------------------------- #
+
+import os
+import shutil
+import concurrent.futures
+from collections import namedtuple
+
+import numpy as np
+from matplotlib.pyplot import *
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from tau_lmt import print_msg, profiled
+
+
+# PLOTTING FUNCTIONS
+@profiled('render')
+def tau_plotter(dataframe, figs, mean=True, boxplot=True, mean_color='r', edge_color='k', med_color='blue', **kwargs):
+    """
+        Tau plotter tool
+        Parameters
+        ----------
+        dataframe : pandas dataframe
+            Dataframe with tau data
+        figs : array
+            figs[0]: figure
+            figs[1]: axes
+        mean : boolean
+            Show the mean
+        boxplot : bool
+            Show statistics as boxplot figures
+        mean_color : string
+            Color to show the mean
+        edge_color : string
+            Color to show the quartils
+        med_color : string
+            Color to show the median
+        **kwargs : additional keywords (for verbose)           
+        ----------
+    """
+    fig = figs[0]
+    axes = figs[1]
+
+    #fig, axes = subplots(nrows=1, ncols=1, figsize=(6, 6), sharey=True)
+    fig.subplots_adjust(bottom=0.15, top=0.95, left=0.08, right=0.95)
+
+    row_stats = []
+    n_points = len(dataframe.index)
+
+    # Extract the percentils
+    q1 = dataframe['tau_25'].values
+    med = dataframe['tau_50'].values
+    q3 = dataframe['tau_75'].values
+
+    # Extract the limits
+    low = dataframe['tau_min'].values
+    high = dataframe['tau_max'].values
+
+    # Extract the mean
+    avg = dataframe['tau_mean'].values
+
+    # Extract x axis
+    n_points = len(dataframe.index)
+
+    # Date limits
+    init_date = dataframe['Date'].iloc[0]
+    end_date = dataframe['Date'].iloc[n_points-1]
+
+    pos_x = ((dataframe['Date']-init_date)/np.timedelta64(1,'m')).values
+    step = np.min(np.diff(pos_x))
+
+    widths = 0.85*step*np.ones_like(pos_x)
+
+    if boxplot:
+        for i in range(n_points):
+            stats = {}
+            stats.update({
+                "med": med[i],      # Median or 50%
+                "q1": q1[i],        # 25%
+                "q3": q3[i],        # 75%
+                "whislo": low[i],   # Minimum
+                "whishi": high[i],  # Maximum
+                "fliers": []
+                })
+
+            row_stats.append(stats)
+
+        box = axes.bxp(row_stats, positions=pos_x, widths=widths)#, patch_artist=True)
+        for element in ['boxes', 'whiskers', 'fliers', 'means', 'medians', 'caps']:
+            setp(box[element], color=edge_color)
+
+        for element in ['medians']:
+            setp(box[element], color=med_color)
+
+    if mean:
+        axes.plot(pos_x, avg, mean_color+'s-')
+
+    if mean or boxplot:
+        axes.set_xticklabels( dataframe['Date'], rotation=45 )
+        axes.set_xlim(np.min(pos_x) - step, np.max(pos_x) + step)
+        axes.set_ylabel(r'Opacity $\tau$',fontsize=20)
+        axes.tick_params(axis='y', labelsize=20)
+
+        show(block=False)
+
+    return 0
+
+
+@profiled('render')
+def tau_plotter_hughes_format(dataframe, figs, show_limits=False, **kwargs):
+    """
+        To plot tau as D. Hughes suggests
+        Parameters
+        ----------
+        dataframe : pandas dataframe
+            Dataframe with tau data
+        figs : array
+            figs[0]: figure
+            figs[1]: axes
+        show_limits : boolean
+            Show the 2mm and 8mm PWV limits
+        **kwargs : additional keywords (for verbose)           
+        ----------
+    """
+    fig = figs[0]
+    axes = figs[1]
+
+    fig.subplots_adjust(bottom=0.1, top=0.95, left=0.08, right=0.95)
+
+    row_stats = []
+    n_points = len(dataframe.index)
+
+    # Extract the percentiles
+    q1 = dataframe['tau_25'].values
+    med = dataframe['tau_50'].values
+    q3 = dataframe['tau_75'].values
+
+    # Extract the mean
+    avg = dataframe['tau_mean'].values
+
+    # Extract x axis
+    n_points = len(dataframe.index)
+
+    # Date limits
+    init_date = dataframe['Date'].iloc[0]
+    end_date = dataframe['Date'].iloc[n_points-1]
+
+    pos_x = ((dataframe['Date']-init_date)/np.timedelta64(1,'m')).values
+
+    axes.plot(pos_x, q1, 'bs-', label=r'First Quartile')
+    axes.plot(pos_x, med, 'gs--', label=r'Median')
+    axes.plot(pos_x, q3, 'rs-.', label=r'Third Quartile')
+
+    # If limits are adjusted
+    if show_limits:
+        axes.axhline(0.1, color='k', linestyle='--')
+        axes.axhline(0.4, color='k', linestyle='--')
+        axes.text(pos_x[-1], 0.11, r'2mm PWV')
+        axes.text(pos_x[-1], 0.41, r'8mm PWV')
+
+    axes.set_xticks(pos_x)
+    #axes.set_xticklabels(dataframe['Date'], rotation=45)
+    month_names = ['January','February','March','April','May','June','July','August','September','October', 'November','December']
+    axes.set_xticklabels([month_names[date.month-1] for date in dataframe['Date']], rotation=0)
+
+    #axes.set_xlim(np.min(pos_x) - step, np.max(pos_x) + step)
+    axes.set_ylabel(r'Opacity $\tau$')
+    axes.set_xlabel(r'\textbf{Month of year}')
+    axes.tick_params(axis='y')
+
+    axes.legend()
+
+    return 0
+
+
+# BATCH RENDERING
+# Figures written to files without a display: Agg canvases outside of
+# pyplot, one template per process whose lines and labels are updated for
+# every frame instead of being created again.
+#   stats : pandas dataframe, statistics of one figure (STAT_COLUMNS)
+#   path : string, output file, the format comes from the extension (png, pdf)
+#   title : string, title of the figure
+render_job = namedtuple('render_job', ['stats', 'path', 'title'])
+# Month labels of the x axis
+MONTH_NAMES = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+# Style of the figures
+RENDER_STYLE = {'font.size': 20, 'font.family': 'serif'}
+# Templates of the process, by options
+worker_templates = {}
+
+
+class hughes_template():
+    """
+        Figure of tau_plotter_hughes_format kept to render many frames: the
+        quartile lines, the PWV limits and the legend are created once
+        Parameters
+        ----------
+        usetex : bool
+            Text through LaTeX, else through the mathtext of matplotlib
+        show_limits : boolean
+            Show the 2mm and 8mm PWV limits
+        month_names : list
+            Labels of the months
+        figsize : tuple
+            Size of the figure, inches
+        ----------
+    """
+    def __init__(self, usetex=False, show_limits=True, month_names=MONTH_NAMES, figsize=(6, 6)):
+        self.usetex = usetex
+        self.month_names = month_names
+        self.style = dict(RENDER_STYLE, **{'text.usetex': usetex})
+
+        with rc_context(self.style):
+            self.fig = Figure(figsize=figsize)
+            FigureCanvasAgg(self.fig)
+            # Room for the labels at the font size of the style, nothing
+            # is adjusted when the figures are written
+            self.fig.subplots_adjust(bottom=0.14, top=0.92, left=0.18, right=0.95)
+            self.axes = self.fig.add_subplot(1, 1, 1)
+
+            axes = self.axes
+            self.lines = [axes.plot([], [], 'bs-', label=r'First Quartile')[0],
+                          axes.plot([], [], 'gs--', label=r'Median')[0],
+                          axes.plot([], [], 'rs-.', label=r'Third Quartile')[0]]
+            self.limits = []
+            if show_limits:
+                axes.axhline(0.1, color='k', linestyle='--')
+                axes.axhline(0.4, color='k', linestyle='--')
+                self.limits = [axes.text(0, 0.11, r'2mm PWV', ha='right'), axes.text(0, 0.41, r'8mm PWV', ha='right')]
+
+            axes.set_ylabel(r'Opacity $\tau$')
+            # \textbf needs LaTeX
+            axes.set_xlabel(r'\textbf{Month of year}' if usetex else r'$\mathbf{Month\ of\ year}$')
+            axes.legend()
+
+
+    def update(self, dataframe, title=None):
+        """
+            Show the statistics of a frame
+            Parameters
+            ----------
+            dataframe : pandas dataframe
+                Dataframe with tau data
+            title : string
+                Title of the figure
+            ----------
+        """
+        init_date = dataframe['Date'].iloc[0]
+        pos_x = ((dataframe['Date']-init_date)/np.timedelta64(1,'m')).values
+
+        with rc_context(self.style):
+            self.draw(dataframe, pos_x, title)
+
+
+    def draw(self, dataframe, pos_x, title):
+        """
+            Move the artists to the statistics of a frame, see update
+        """
+        for line, name in zip(self.lines, ['tau_25', 'tau_50', 'tau_75']):
+            line.set_data(pos_x, dataframe[name].values)
+        for text in self.limits:
+            text.set_x(pos_x[-1])
+
+        axes = self.axes
+        axes.set_xticks(pos_x)
+        axes.set_xticklabels([self.month_names[date.month-1] for date in dataframe['Date']], rotation=0)
+        axes.set_title('' if title is None else title)
+        axes.relim()
+        axes.autoscale_view()
+
+
+    def save(self, path):
+        """
+            Write the figure
+            Parameters
+            ----------
+            path : string
+                Output file, png or pdf
+            ----------
+        """
+        with rc_context(self.style):
+            self.fig.savefig(path)
+
+
+def latex_available():
+    """
+        Check whether LaTeX and dvipng are installed, as text.usetex needs
+    """
+    return shutil.which('latex') is not None and shutil.which('dvipng') is not None
+
+
+@profiled('render')
+def render_frame(job, options):
+    """
+        Render one job with the template of the process
+        Parameters
+        ----------
+        job : render_job
+            Frame to render
+        options : tuple
+            Items of the template keywords, see hughes_template
+        ----------
+        Returns the output path
+    """
+    if options not in worker_templates:
+        worker_templates[options] = hughes_template(**dict(options))
+    template = worker_templates[options]
+
+    template.update(job.stats, job.title)
+    template.save(job.path)
+
+    return job.path
+
+
+def render_batch(jobs, workers=None, usetex=False, **kwargs):
+    """
+        Render many statistics frames to files, as tau_plotter_hughes_format,
+        without a display. Every process keeps one figure and updates it.
+        Parameters
+        ----------
+        jobs : list
+            render_job list, (stats, path, title)
+        workers : int
+            Number of processes (None: one per core, 1: no pool)
+        usetex : bool
+            Text through LaTeX. Without LaTeX installed, and by default,
+            the mathtext of matplotlib is used (no process per figure)
+        **kwargs : keywords of the template (show_limits, month_names,
+            figsize), see hughes_template
+        ----------
+        Returns the output paths
+    """
+    jobs = [render_job(*job) for job in jobs]
+    if usetex and not latex_available():
+        print_msg('LaTeX not found, mathtext is used', 'warning')
+        usetex = False
+    options = dict(kwargs, usetex=usetex)
+    options = tuple(sorted((name, tuple(value) if isinstance(value, list) else value) for name, value in options.items()))
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(jobs)))
+
+    if workers == 1:
+        return [render_frame(job, options) for job in jobs]
+
+    # Consecutive jobs go to the same worker, it renders them on its template
+    chunksize = max(1, len(jobs)//(4*workers))
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(render_frame, jobs, [options]*len(jobs), chunksize=chunksize))
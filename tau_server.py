@@ -0,0 +1,643 @@
+# -*- coding: utf-8 -*-
+# --------------------------------------------------------------------------------- #
+# "LMT opacity library" tau_server.py
+# Local query service: the tau file is loaded once and kept in memory, the
+# filters, time spans and statistics are asked over HTTP on localhost with the
+# chains of tau_lmt. tau_client has the methods of tau_lmt, so scripts switch
+# to the server by changing the object only.
+#
+# Usage: python tau_server.py [tau_file] [port]
+#
+# --------------------------------------------------------------------------------- #
+
+import io
+import sys
+import json
+import threading
+import http.client
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from tau_lmt import tau_lmt, print_msg, log_to_console, sample_dates, sample_tau, filter_spec, FILE_TAU_PATH
+
+
+# Address of the server, localhost only
+SERVER_HOST = '127.0.0.1'
+SERVER_PORT = 8642
+# Limits of the result cache: entries and bytes of the encoded results
+CACHE_ENTRIES = 256
+CACHE_BYTES = 256*1024*1024
+# Content types of the requests and results
+JSON_TYPE = 'application/json'
+NPZ_TYPE = 'application/x-npz'
+
+
+# ENCODING
+# Results and uploaded samples travel as npz (numpy arrays, no parsing), or
+# as json for other clients (?format=json). A frame is a set of columns plus
+# its index (the rows of raw_data for the samples). The filter chains travel
+# as strings, or as {'spec': fields} for the parsed ones (filter_spec).
+def encode_chain(filter_chain):
+    """
+        Filter chain as json: a string as it is, a filter_spec as its fields
+        Parameters
+        ----------
+        filter_chain : string or filter_spec
+            Filter chain
+        ----------
+    """
+    if not isinstance(filter_chain, filter_spec):
+        return filter_chain
+
+    fields = {name: [int(value) for value in getattr(filter_chain, name)] for name in ['yr', 'mn', 'dy', 'hr', 'mt']}
+    fields.update({'t': None if filter_chain.t is None else float(filter_chain.t), 'ng': filter_chain.ng,
+                   'tm': [[int(first), int(end)] for first, end in filter_chain.tm]})
+    return {'spec': fields}
+
+
+def decode_chain(chain):
+    """
+        Filter chain of its json, see encode_chain. The filter_spec is
+        built again with tuples, as parse_filter_chain does.
+    """
+    if not isinstance(chain, dict):
+        return chain
+    if 'spec' not in chain:
+        raise ValueError('Filter chain not valid: '+str(chain))
+
+    fields = chain['spec']
+    return filter_spec(fields['t'], *[tuple(fields[name]) for name in ['yr', 'mn', 'dy', 'hr', 'mt']],
+                       ng=fields['ng'], tm=tuple([tuple(interval) for interval in fields['tm']]))
+
+
+def encode_npz(arrays):
+    """
+        Arrays as the bytes of an uncompressed npz file
+        Parameters
+        ----------
+        arrays : dictionary
+            Arrays by name
+        ----------
+    """
+    buf = io.BytesIO()
+    np.savez(buf, **arrays)
+    return buf.getvalue()
+
+
+def decode_npz(body):
+    """
+        Arrays of the bytes of a npz file, as a dictionary
+    """
+    with np.load(io.BytesIO(body), allow_pickle=False) as npz:
+        return {name: npz[name] for name in npz.files}
+
+
+def result_arrays(result):
+    """
+        Arrays of a result: a frame, a compact sample, an array or None
+        Parameters
+        ----------
+        result :
+            Result of a tau_lmt method
+        ----------
+        Returns a dictionary of arrays, with 'kind' (frame, array or none)
+    """
+    if result is None:
+        return {'kind': np.array('none')}
+    if isinstance(result, np.ndarray):
+        return {'kind': np.array('array'), 'values': result}
+    if not isinstance(result, pd.DataFrame):
+        # Compact samples travel as frames
+        rows = result.rows if result.rows is not None else np.arange(len(result))
+        result = pd.DataFrame({'Date': sample_dates(result).view('datetime64[ns]'), 'Tau': sample_tau(result)}, index=rows)
+
+    arrays = {'kind': np.array('frame'), 'columns': np.array(list(result.columns), dtype=str), 'index': result.index.values}
+    for k, name in enumerate(result.columns):
+        arrays['column_'+str(k)] = result[name].values
+
+    return arrays
+
+
+def arrays_result(arrays):
+    """
+        Result of its arrays, see result_arrays
+    """
+    kind = str(arrays['kind'])
+    if kind == 'none':
+        return None
+    if kind == 'array':
+        return arrays['values']
+
+    columns = [str(name) for name in arrays['columns']]
+    data = {name: arrays['column_'+str(k)] for k, name in enumerate(columns)}
+    return pd.DataFrame(data, index=arrays['index'], columns=columns)
+
+
+def result_json(result):
+    """
+        Result as json: frames in the 'split' layout with ISO dates
+    """
+    if result is None:
+        return json.dumps({'result': None}).encode()
+    if isinstance(result, np.ndarray):
+        return json.dumps({'result': result.tolist()}).encode()
+    if not isinstance(result, pd.DataFrame):
+        result = arrays_result(result_arrays(result))
+
+    return ('{"result": '+result.to_json(orient='split', date_format='iso', date_unit='ns')+'}').encode()
+
+
+# SERVER
+class result_cache():
+    """
+        LRU cache of encoded results, limited in entries and bytes
+        Parameters
+        ----------
+        entries : int
+            Maximum number of results
+        n_bytes : int
+            Maximum bytes of all the results
+        ----------
+    """
+    def __init__(self, entries=CACHE_ENTRIES, n_bytes=CACHE_BYTES):
+        self.entries = entries
+        self.n_bytes = n_bytes
+        self.results = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        # Clears of the cache, the results computed before one are stale
+        self.generation = 0
+        self.lock = threading.Lock()
+
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.results:
+                self.misses += 1
+                return None
+            self.results.move_to_end(key)
+            self.hits += 1
+            return self.results[key]
+
+
+    def put(self, key, value, generation=None):
+        """
+            Keep a result. With the generation of the cache when it was
+            computed, only if the cache was not cleared meanwhile
+        """
+        with self.lock:
+            if generation is not None and generation != self.generation:
+                return
+            if key in self.results or len(value) > self.n_bytes:
+                return
+            self.results[key] = value
+            self.size += len(value)
+            while len(self.results) > self.entries or self.size > self.n_bytes:
+                _, old = self.results.popitem(last=False)
+                self.size -= len(old)
+
+
+    def clear(self):
+        with self.lock:
+            self.results.clear()
+            self.size = 0
+            self.generation += 1
+
+
+class rw_lock():
+    """
+        Lock of many readers (the queries) or one writer (the appends)
+    """
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.readers = 0
+        self.writing = False
+
+
+    def acquire_read(self):
+        with self.condition:
+            while self.writing:
+                self.condition.wait()
+            self.readers += 1
+
+
+    def release_read(self):
+        with self.condition:
+            self.readers -= 1
+            if self.readers == 0:
+                self.condition.notify_all()
+
+
+    def acquire_write(self):
+        with self.condition:
+            while self.writing or self.readers > 0:
+                self.condition.wait()
+            self.writing = True
+
+
+    def release_write(self):
+        with self.condition:
+            self.writing = False
+            self.condition.notify_all()
+
+
+class tau_service():
+    """
+        Queries of a tau_lmt object kept in memory
+        Parameters
+        ----------
+        tau : tau_lmt
+            Tau object
+        ----------
+    """
+    def __init__(self, tau):
+        self.tau = tau
+        self.cache = result_cache()
+        self.lock = rw_lock()
+        # Statistics cube, built once before the queries
+        self.tau.get_cube()
+
+
+    def sample(self, ref, uploaded=None):
+        """
+            Sample of a reference:
+                {'raw': true}: raw_data
+                {'span': [from_date, to_date]}: time_span of raw_data
+                {'filter': chain, 'sample': reference}: filter of a sample
+                {'data': true}: the uploaded sample
+                a string or {'spec': fields}: a filter chain, for
+                statistics_sample
+            Parameters
+            ----------
+            ref : dictionary or string
+                Reference of the sample
+            uploaded : pandas dataframe
+                Sample uploaded with the request
+            ----------
+        """
+        if isinstance(ref, str):
+            return ref
+        if not isinstance(ref, dict):
+            raise ValueError('Sample not valid: '+str(ref))
+        if 'spec' in ref:
+            return decode_chain(ref)
+        if ref.get('raw'):
+            return self.tau.raw_data
+        if 'span' in ref:
+            return self.tau.time_span(*ref['span'])
+        if 'filter' in ref:
+            return self.tau.filter(self.sample(ref.get('sample', {'raw': True}), uploaded), decode_chain(ref['filter']))
+        if ref.get('data'):
+            if uploaded is None:
+                raise ValueError('No sample uploaded')
+            return uploaded
+
+        raise ValueError('Sample not valid: '+str(ref))
+
+
+    def run(self, method, query, uploaded=None):
+        """
+            Result of a query
+            Parameters
+            ----------
+            method : string
+                sample, filter or statistics_sample
+            query : dictionary
+                Arguments of the method
+            uploaded : pandas dataframe
+                Sample uploaded with the request
+            ----------
+        """
+        tau = self.tau
+        if method == 'filter':
+            return tau.filter(self.sample(query['sample'], uploaded), decode_chain(query['filter_chain']),
+                              output=query.get('output', 'frame'))
+        if method == 'sample' and isinstance(query['sample'], dict):
+            return self.sample(query['sample'], uploaded)
+        if method == 'statistics_sample':
+            return tau.statistics_sample(self.sample(query['sample'], uploaded), query['group_string'],
+                                         quantiles=query.get('quantiles', 'exact'))
+
+        raise ValueError('Method not valid: '+str(method))
+
+
+    def info(self):
+        """
+            Size and dates of the data, and use of the cache
+        """
+        return {'path': self.tau.path, 'n_points': int(self.tau.n_points), 'first_date': str(self.tau.first_date),
+                'last_date': str(self.tau.last_date), 'cache_entries': len(self.cache.results),
+                'cache_bytes': self.cache.size, 'hits': self.cache.hits, 'misses': self.cache.misses}
+
+
+    def append(self):
+        """
+            Append the new lines of the tau file, the cached results are
+            dropped
+        """
+        self.lock.acquire_write()
+        try:
+            n_new = self.tau.append()
+            if n_new > 0:
+                self.cache.clear()
+        finally:
+            self.lock.release_write()
+
+        return n_new
+
+
+    def query(self, method, query, uploaded=None, fmt='npz'):
+        """
+            Encoded result of a query, from the cache if possible. The
+            queries with uploaded samples are not cached.
+        """
+        key = None
+        if uploaded is None:
+            key = json.dumps([method, query, fmt], sort_keys=True)
+            body = self.cache.get(key)
+            if body is not None:
+                return body
+
+        self.lock.acquire_read()
+        try:
+            generation = self.cache.generation
+            result = self.run(method, query, uploaded)
+        finally:
+            self.lock.release_read()
+
+        body = encode_npz(result_arrays(result)) if fmt == 'npz' else result_json(result)
+        if key is not None:
+            self.cache.put(key, body, generation)
+
+        return body
+
+
+class tau_handler(BaseHTTPRequestHandler):
+    """
+        Requests of the server: POST /sample, /filter or /statistics_sample
+        with the arguments as json (or as npz, with a 'query' json and the
+        uploaded Date and Tau). The results are npz, json with ?format=json.
+        GET /info gives the size of the data and the use of the cache,
+        POST /append reads the new lines of the tau file.
+    """
+    protocol_version = 'HTTP/1.1'
+    # The headers and the result are written apart, without Nagle they do
+    # not wait for the acknowledgement of the client
+    disable_nagle_algorithm = True
+
+    def reply(self, code, body, content_type=JSON_TYPE):
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+    def do_GET(self):
+        if self.path.split('?')[0] == '/info':
+            self.reply(200, json.dumps(self.server.service.info()).encode())
+        else:
+            self.reply(404, json.dumps({'error': 'Not found: '+self.path}).encode())
+
+
+    def do_POST(self):
+        service = self.server.service
+        method, _, options = self.path.lstrip('/').partition('?')
+        fmt = 'json' if 'format=json' in options else 'npz'
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+        try:
+            if method == 'append':
+                self.reply(200, json.dumps({'n_new': service.append()}).encode())
+                return
+
+            uploaded = None
+            if self.headers.get('Content-Type') == NPZ_TYPE:
+                arrays = decode_npz(body)
+                query = json.loads(str(arrays['query']))
+                uploaded = pd.DataFrame({'Date': arrays['Date'].astype('datetime64[ns]'), 'Tau': arrays['Tau']})
+            else:
+                query = json.loads(body.decode() or '{}')
+
+            result = service.query(method, query, uploaded, fmt)
+            self.reply(200, result, NPZ_TYPE if fmt == 'npz' else JSON_TYPE)
+        except (ValueError, KeyError, TypeError) as e:
+            self.reply(400, json.dumps({'error': type(e).__name__+': '+str(e)}).encode())
+        except Exception as e:
+            self.reply(500, json.dumps({'error': type(e).__name__+': '+str(e)}).encode())
+
+
+    def log_message(self, format, *args):
+        print_msg(self.address_string()+' '+format % args, 'verb')
+
+
+def serve(path=FILE_TAU_PATH, port=SERVER_PORT, host=SERVER_HOST, **kwargs):
+    """
+        Load a tau file and answer its queries until interrupted
+        Parameters
+        ----------
+        path : string
+            Opacity data path
+        port : int
+            Port of the server
+        host : string
+            Address of the server (localhost by default)
+        **kwargs : keywords of tau_lmt (cache, parser, compact)
+        ----------
+    """
+    server = ThreadingHTTPServer((host, port), tau_handler)
+    server.daemon_threads = True
+    server.service = tau_service(tau_lmt(path, **kwargs))
+    print_msg('Serving '+path+' on http://'+host+':'+str(port), 'ok')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+# CLIENT
+class remote_sample():
+    """
+        Sample kept by the server, known by its query. Its rows are
+        downloaded the first time they are used (columns, length, ...), the
+        queries over it send the query only.
+        Parameters
+        ----------
+        client : tau_client
+            Client of the server
+        ref : dictionary
+            Query of the sample, see tau_service.sample
+        ----------
+    """
+    def __init__(self, client, ref):
+        self.client = client
+        self.ref = ref
+        self.data = None
+
+
+    def frame(self):
+        """
+            Rows of the sample, as a dataframe
+        """
+        if self.data is None:
+            self.data = self.client.request('POST', 'sample', json.dumps({'sample': self.ref}).encode())
+        return self.data
+
+
+    def __getattr__(self, name):
+        return getattr(self.frame(), name)
+
+
+    def __getitem__(self, key):
+        return self.frame()[key]
+
+
+    def __len__(self):
+        return len(self.frame())
+
+
+    def __repr__(self):
+        return repr(self.frame())
+
+
+class tau_client():
+    """
+        Client of a tau server, with the methods of tau_lmt. raw_data, the
+        time spans and the filters of them are remote samples, see
+        remote_sample; other samples are uploaded with the query.
+        Parameters
+        ----------
+        host : string
+            Address of the server
+        port : int
+            Port of the server
+        timeout : float
+            Seconds to wait for a result
+        ----------
+    """
+    def __init__(self, host=SERVER_HOST, port=SERVER_PORT, timeout=600):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        # One connection per thread, kept alive
+        self.local = threading.local()
+
+        self.raw_data = remote_sample(self, {'raw': True})
+        self.update_info()
+
+
+    def update_info(self):
+        """
+            Size and dates of the data of the server, and use of its cache
+        """
+        info = self.request('GET', 'info')
+        self.path = info['path']
+        self.n_points = info['n_points']
+        self.first_date = pd.Timestamp(info['first_date'])
+        self.last_date = pd.Timestamp(info['last_date'])
+
+        return info
+
+
+    def connection(self):
+        if getattr(self.local, 'connection', None) is None:
+            self.local.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        return self.local.connection
+
+
+    def request(self, verb, method, body=None, content_type=JSON_TYPE):
+        """
+            Send a request, the connection is opened again once if the
+            server closed it. Raises ValueError with the error of the
+            server.
+        """
+        for attempt in range(2):
+            connection = self.connection()
+            try:
+                connection.request(verb, '/'+method, body=body, headers={'Content-Type': content_type})
+                response = connection.getresponse()
+                data = response.read()
+                break
+            except (http.client.HTTPException, ConnectionError):
+                connection.close()
+                self.local.connection = None
+                if attempt == 1:
+                    raise
+
+        if response.status != 200:
+            raise ValueError(json.loads(data.decode())['error'])
+        if response.getheader('Content-Type') == NPZ_TYPE:
+            return arrays_result(decode_npz(data))
+
+        return json.loads(data.decode())
+
+
+    def query(self, method, query, sample):
+        """
+            Ask a query over a sample: a filter chain, a remote sample (its
+            query is sent) or a local sample (uploaded)
+        """
+        if isinstance(sample, remote_sample):
+            sample = sample.ref
+        elif isinstance(sample, filter_spec):
+            sample = encode_chain(sample)
+        if isinstance(sample, (str, dict)):
+            return self.request('POST', method, json.dumps(dict(query, sample=sample)).encode())
+
+        body = encode_npz({'query': np.array(json.dumps(dict(query, sample={'data': True}))),
+                           'Date': sample_dates(sample), 'Tau': sample_tau(sample)})
+        return self.request('POST', method, body, NPZ_TYPE)
+
+
+    def filter(self, sample, filter_chain, output='frame', **kwargs):
+        """
+            Filter a sample, see tau_lmt.filter. The filters of remote
+            samples are remote samples.
+        """
+        if output == 'frame' and isinstance(sample, remote_sample):
+            return remote_sample(self, {'filter': encode_chain(filter_chain), 'sample': sample.ref})
+
+        return self.query('filter', {'filter_chain': encode_chain(filter_chain), 'output': output}, sample)
+
+
+    def time_span(self, from_date, to_date, **kwargs):
+        """
+            Time span of raw_data, see tau_lmt.time_span. It is a remote
+            sample.
+        """
+        from_date = pd.Timestamp(from_date)
+        to_date = pd.Timestamp(to_date)
+
+        if (to_date - from_date).total_seconds()/60. < 0:
+            print_msg('Period is not valid, the first date has to be before the last date', 'error')
+            return
+
+        return remote_sample(self, {'span': [str(from_date), str(to_date)]})
+
+
+    def statistics_sample(self, sample, group_string, quantiles='exact', **kwargs):
+        """
+            Statistics of a sample, see tau_lmt.statistics_sample
+        """
+        return self.query('statistics_sample', {'group_string': group_string, 'quantiles': quantiles}, sample)
+
+
+    def append(self, **kwargs):
+        """
+            Append the new lines of the tau file on the server
+        """
+        n_new = self.request('POST', 'append')['n_new']
+        self.update_info()
+
+        return n_new
+
+
+if __name__ == '__main__':
+    log_to_console()
+    serve(*sys.argv[1:2], *[int(arg) for arg in sys.argv[2:3]])
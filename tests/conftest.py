@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+# Tests of the LMT opacity library, from the root of the repository:
+#   python -m pytest tests
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
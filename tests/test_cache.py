@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+# Binary cache of the tau files: kept for appended lines, rebuilt for any
+# other change of the file
+
+import os
+
+import numpy as np
+
+from tau_lmt import tau_lmt, cube_arrays, TAU_OFFSET, NS_HOUR
+from benchmarks.synthetic import synthetic_tau, tau_lines
+
+
+LINE_BYTES = 26
+
+
+def write_lines(path, n_points, n_total=5100):
+    """
+        First lines of a synthetic tau file, and the timestamps and tau of
+        all of them
+    """
+    date, tau = synthetic_tau(n_total)
+    with open(path, 'wb') as f:
+        f.write(tau_lines(date[:n_points], tau[:n_points]))
+
+    return date, tau
+
+
+def touch(path):
+    """
+        Move the modification time of a file one second ahead
+    """
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1000000000))
+
+
+def test_cache_edit_in_place(tmp_path):
+    path = str(tmp_path / 'tau.csv')
+    write_lines(path, 5000)
+    row = 1234
+    cached = tau_lmt(path).raw_data['Tau'].values[row]
+    assert cached != 9.999
+
+    # Same length edit of one tau value
+    with open(path, 'r+b') as f:
+        f.seek(row*LINE_BYTES + TAU_OFFSET)
+        f.write(b'9.999')
+    touch(path)
+
+    tau = tau_lmt(path)
+    assert tau.raw_data['Tau'].values[row] == 9.999
+    assert tau.n_points == 5000
+
+
+def test_cache_edit_and_append(tmp_path):
+    path = str(tmp_path / 'tau.csv')
+    date, tau = write_lines(path, 5000)
+    tau_lmt(path)
+
+    with open(path, 'r+b') as f:
+        f.seek(10*LINE_BYTES + TAU_OFFSET)
+        f.write(b'9.999')
+        f.seek(0, os.SEEK_END)
+        f.write(tau_lines(date[5000:], tau[5000:]))
+
+    data = tau_lmt(path)
+    assert data.n_points == 5100
+    assert data.raw_data['Tau'].values[10] == 9.999
+
+
+def test_cache_append(tmp_path):
+    path = str(tmp_path / 'tau.csv')
+    date, tau = write_lines(path, 5000)
+    tau_lmt(path)
+
+    with open(path, 'ab') as f:
+        f.write(tau_lines(date[5000:], tau[5000:]))
+
+    data = tau_lmt(path)
+    assert data.n_points == 5100
+    assert np.array_equal(data.timestamps, date)
+    assert np.array_equal(data.raw_data['Tau'].values, tau)
+    # The appended cache is loaded as it is
+    assert tau_lmt(path).meta == data.meta
+
+
+def test_append_with_readers(tmp_path):
+    path = str(tmp_path / 'tau.csv')
+    date, tau = write_lines(path, 4990)
+    tau_lmt(path).get_cube()
+    # The first append gives the files room for the next ones
+    with open(path, 'ab') as f:
+        f.write(tau_lines(date[4990:5000], tau[4990:5000]))
+    tau_lmt(path)
+
+    reader = tau_lmt(path)
+    cube = reader.get_cube()
+    arrays = {name: np.array(values) for name, values in cube_arrays(cube).items()}
+    columns = {name: np.array(values) for name, values in reader.columns.items()}
+
+    # Another instance appends lines of the last hour of the cube
+    with open(path, 'ab') as f:
+        f.write(tau_lines(date[5000:5010], tau[5000:5010]))
+    writer = tau_lmt(path)
+    assert writer.n_points == 5010
+    assert writer.get_cube().summary.count[-1] == cube.summary.count[-1] + 10
+
+    # The maps of the reader keep its rows
+    for name, values in cube_arrays(cube).items():
+        assert np.array_equal(values, arrays[name], equal_nan=True), name
+    for name, values in reader.columns.items():
+        assert np.array_equal(values, columns[name]), name
+    last_hour = reader.timestamps//NS_HOUR == reader.timestamps[-1]//NS_HOUR
+    assert cube.summary.count[-1] == np.count_nonzero(last_hour)
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+# Messages of the library: nothing on import, stdout with log_to_console
+
+import os
+import sys
+import subprocess
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run(code):
+    return subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+
+
+def test_import_is_quiet():
+    result = run("import logging, tau_lmt\n"
+                 "logger = logging.getLogger('tau_lmt')\n"
+                 "print(logger.propagate, [type(h).__name__ for h in logger.handlers])\n"
+                 "tau_lmt.print_msg('Quiet', 'warning')")
+    assert result.stdout == "True ['NullHandler']\n"
+    assert result.stderr == ''
+
+
+def test_log_to_console():
+    result = run("import tau_lmt\n"
+                 "tau_lmt.log_to_console()\n"
+                 "tau_lmt.print_msg('Loud', 'ok')")
+    assert 'Loud' in result.stdout
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+# Statistics of many jobs over a pool of processes against the same jobs in
+# this process, and the binary cache left as it is by the workers
+
+import os
+
+import tau_lmt as lmt
+from tau_lmt import tau_lmt, statistics_job, pool_statistics
+from benchmarks.synthetic import synthetic_tau, tau_lines
+
+
+JOBS = [('-mn '+str(month)+' -hr 19-6', '-dy 1') for month in [1, 2]] + [('-t 0.2', '-hr 6')]
+
+
+def cache_times(path):
+    cache_dir = path+'.cache'
+    return {name: os.stat(os.path.join(cache_dir, name)).st_mtime_ns for name in os.listdir(cache_dir)}
+
+
+def test_statistics_jobs(tmp_path):
+    path = str(tmp_path / 'tau.csv')
+    date, tau = synthetic_tau(90*288, cadence=300)
+    with open(path, 'wb') as f:
+        f.write(tau_lines(date, tau))
+    data = tau_lmt(path)
+
+    serial = data.statistics_jobs(JOBS, workers=1)
+    parallel = data.statistics_jobs(JOBS, workers=2)
+    assert len(serial.index) > 0
+    assert serial.equals(parallel)
+    # The parent does not keep the objects of the jobs
+    assert lmt.worker_files == {}
+
+
+def test_workers_read_the_cache(tmp_path):
+    path = str(tmp_path / 'tau.csv')
+    date, tau = synthetic_tau(90*288, cadence=300)
+    with open(path, 'wb') as f:
+        f.write(tau_lines(date[:60*288], tau[:60*288]))
+    tau_lmt(path)
+
+    # New lines after the cache: the workers read them, the cache is not written
+    with open(path, 'ab') as f:
+        f.write(tau_lines(date[60*288:], tau[60*288:]))
+    times = cache_times(path)
+    jobs = [statistics_job(path, sample, group) for sample, group in JOBS]
+    stats = pool_statistics(jobs, workers=2)
+
+    assert stats.equals(tau_lmt(path, cache=False).statistics_jobs(JOBS, workers=1))
+    assert cache_times(path) == times
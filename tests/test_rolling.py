@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+# Rolling statistics against pandas rolling, at the samples and at other
+# ends of the windows, sorted or not
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tau_lmt import tau_lmt, STAT_COLUMNS
+from benchmarks.synthetic import synthetic_model, synthetic_chunk, tau_lines
+
+
+WINDOW = '1h'
+
+
+@pytest.fixture(scope='module')
+def tau(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('rolling') / 'tau.csv')
+    archive = synthetic_model(288*120, start='2015-01-01', cadence=300, seed=5, outages=40)
+    date, tau = synthetic_chunk(archive, 0, archive.n_points)
+    with open(path, 'wb') as f:
+        f.write(tau_lines(date, tau))
+
+    return tau_lmt(path, cache=False)
+
+
+def pandas_rolling(sample, at=None):
+    """
+        Statistics of the windows with pandas rolling. The ends of the
+        windows are rows without tau after the samples of the same date
+    """
+    series = pd.Series(sample['Tau'].values, index=pd.DatetimeIndex(sample['Date'].values))
+    is_end = np.zeros(len(series), dtype=bool)
+    if at is not None:
+        order = np.argsort(pd.DatetimeIndex(at).values, kind='stable')
+        series = pd.concat([series, pd.Series(np.nan, index=pd.DatetimeIndex(at)[order])])
+        is_end = np.concatenate([is_end, np.ones(len(at), dtype=bool)])
+        position = np.argsort(series.index.values, kind='stable')
+        series = series.iloc[position]
+        is_end = is_end[position]
+    rolling = series.rolling(WINDOW)
+    stats = pd.DataFrame({'Date': series.index, 'tau_count': rolling.count().values, 'tau_mean': rolling.mean().values,
+                          'tau_std': rolling.std().values, 'tau_25': rolling.quantile(0.25).values,
+                          'tau_50': rolling.median().values, 'tau_75': rolling.quantile(0.75).values,
+                          'tau_max': rolling.max().values, 'tau_min': rolling.min().values}, columns=STAT_COLUMNS)
+    if at is None:
+        return stats
+
+    # Back to the order of at
+    stats = stats[is_end].reset_index(drop=True)
+    values = stats.copy()
+    values.iloc[order] = stats.values
+    return values
+
+
+def assert_same_rolling(stats, expected):
+    assert np.array_equal(stats['Date'].values, expected['Date'].values)
+    assert np.array_equal(stats['tau_count'].values, np.nan_to_num(expected['tau_count'].values))
+    for name in STAT_COLUMNS[2:]:
+        assert np.allclose(stats[name].values, expected[name].values, rtol=1e-9, atol=1e-12, equal_nan=True), name
+
+
+def test_rolling_at_the_samples(tau):
+    sample = tau.filter(tau.raw_data, '-hr 19-6')
+    assert_same_rolling(tau.rolling_statistics(sample, WINDOW), pandas_rolling(sample))
+
+
+@pytest.mark.parametrize('shuffle', [False, True])
+def test_rolling_at_other_ends(tau, shuffle):
+    sample = tau.raw_data
+    # From before the first sample, the outages give windows without samples
+    at = pd.date_range(tau.first_date - pd.Timedelta(hours=3), tau.last_date, freq='20min').values
+    if shuffle:
+        at = at[np.random.default_rng(0).permutation(len(at))]
+
+    stats = tau.rolling_statistics(sample, WINDOW, at=at)
+    expected = pandas_rolling(sample, at)
+    assert np.count_nonzero(stats['tau_count'] == 0) > 9
+    assert_same_rolling(stats, expected)
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+# Queries to a tau server against the same queries to tau_lmt: filter chains
+# as strings and as filter_spec, time spans, uploaded samples, json results,
+# errors, concurrent clients and the result cache across appends
+
+import json
+import threading
+import http.client
+from http.server import ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tau_lmt import tau_lmt, parse_filter_chain
+from tau_server import tau_service, tau_handler, tau_client, result_cache, SERVER_HOST
+from benchmarks.synthetic import synthetic_tau, tau_lines
+
+
+FILTER_CHAIN = '-t 0.3 -mn 1-3 -hr 19-6 -tm 20:00-05:30'
+
+
+def start_server(tau):
+    """
+        Server of a tau object on a free port, in this process
+    """
+    httpd = ThreadingHTTPServer((SERVER_HOST, 0), tau_handler)
+    httpd.daemon_threads = True
+    httpd.service = tau_service(tau)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+
+    return httpd, tau_client(port=httpd.server_address[1])
+
+
+def stop_server(httpd):
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def post(httpd, path, body):
+    """
+        Status and json body of a request, without the client
+    """
+    connection = http.client.HTTPConnection(SERVER_HOST, httpd.server_address[1], timeout=60)
+    connection.request('POST', path, body=json.dumps(body).encode(), headers={'Content-Type': 'application/json'})
+    response = connection.getresponse()
+    data = json.loads(response.read().decode())
+    connection.close()
+
+    return response.status, data
+
+
+@pytest.fixture(scope='module')
+def server(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('server') / 'tau.csv')
+    date, tau = synthetic_tau(2*365*288, start='2015-01-01', cadence=300, outages=12)
+    with open(path, 'wb') as f:
+        f.write(tau_lines(date, tau))
+    tau = tau_lmt(path, cache=False)
+
+    httpd, client = start_server(tau)
+    yield tau, client, httpd
+    stop_server(httpd)
+
+
+@pytest.mark.parametrize('chain', [FILTER_CHAIN, parse_filter_chain(FILTER_CHAIN)])
+def test_filter_round_trip(server, chain):
+    tau, client, _ = server
+    local = tau.filter(tau.raw_data, chain)
+
+    # A remote sample, and the positions asked at once
+    remote = client.filter(client.raw_data, chain)
+    assert len(local.index) > 0
+    assert local.equals(remote.frame())
+    positions = client.filter(client.raw_data, chain, output='positions')
+    assert (positions == tau.filter(tau.raw_data, chain, output='positions')).all()
+
+    stats = client.statistics_sample(remote, '-dy 1')
+    assert stats.equals(tau.statistics_sample(local, '-dy 1'))
+
+
+def test_statistics_of_a_spec(server):
+    tau, client, _ = server
+    spec = parse_filter_chain(FILTER_CHAIN)
+
+    stats = client.statistics_sample(spec, '-mn 1', quantiles='sketch')
+    assert stats.equals(tau.statistics_sample(spec, '-mn 1', quantiles='sketch'))
+
+
+def test_time_span(server):
+    tau, client, _ = server
+    span = client.time_span('2015-03-01', '2015-03-15')
+    local = tau.time_span('2015-03-01', '2015-03-15')
+
+    assert len(local.index) > 0
+    assert local.equals(span.frame())
+    assert client.filter(span, '-hr 0-6').frame().equals(tau.filter(local, '-hr 0-6'))
+    assert client.statistics_sample(span, '-hr 1').equals(tau.statistics_sample(local, '-hr 1'))
+
+
+def test_uploaded_sample(server):
+    tau, client, _ = server
+    local = tau.filter(tau.raw_data, '-mn 6 -hr 10-16')
+    entries = client.update_info()['cache_entries']
+
+    # The sample travels with the query, as npz
+    stats = client.statistics_sample(local, '-dy 1')
+    assert stats.equals(tau.statistics_sample(local, '-dy 1'))
+    filtered = client.filter(local, '-t 0.2')
+    expected = tau.filter(local, '-t 0.2')
+    assert len(expected.index) > 0
+    assert np.array_equal(filtered['Date'].values, expected['Date'].values)
+    assert np.array_equal(filtered['Tau'].values, expected['Tau'].values)
+
+    # The queries with uploaded samples are not cached
+    assert client.update_info()['cache_entries'] == entries
+
+
+def test_json_result(server):
+    tau, _, httpd = server
+    status, data = post(httpd, '/statistics_sample?format=json', {'sample': {'raw': True}, 'group_string': '-mn 1'})
+    expected = tau.statistics_sample(tau.raw_data, '-mn 1')
+
+    assert status == 200
+    result = data['result']
+    assert result['columns'] == list(expected.columns)
+    rows = pd.DataFrame(result['data'], columns=result['columns'])
+    assert np.array_equal(pd.DatetimeIndex(rows['Date']).values, expected['Date'].values)
+    for name in ['tau_count', 'tau_mean', 'tau_50']:
+        assert np.allclose(rows[name].values.astype(float), expected[name].values)
+
+
+def test_errors(server):
+    _, client, httpd = server
+    for path, body in [('/statistics_sample', {'sample': {'unknown': True}, 'group_string': '-dy 1'}),
+                       ('/nothing', {'sample': {'raw': True}}),
+                       ('/filter', {'sample': {'raw': True}, 'filter_chain': {'unknown': []}})]:
+        status, data = post(httpd, path, body)
+        assert status == 400
+        assert 'error' in data
+
+    # The client raises the error of the server
+    with pytest.raises(ValueError):
+        client.request('POST', 'statistics_sample', json.dumps({'sample': {'unknown': True}}).encode())
+
+
+def test_concurrent_clients(server):
+    tau, client, _ = server
+    chains = ['-mn '+str(month)+' -hr 19-6' for month in range(1, 9)]
+    results = {}
+
+    def ask(chain):
+        results[chain] = client.statistics_sample(client.filter(client.raw_data, chain), '-dy 1')
+
+    threads = [threading.Thread(target=ask, args=(chain,)) for chain in chains]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for chain in chains:
+        assert results[chain].equals(tau.statistics_sample(tau.filter(tau.raw_data, chain), '-dy 1'))
+
+
+def test_append_clears_the_cache(tmp_path):
+    path = str(tmp_path / 'tau.csv')
+    date, tau = synthetic_tau(40*288, start='2015-01-01', cadence=300)
+    with open(path, 'wb') as f:
+        f.write(tau_lines(date[:30*288], tau[:30*288]))
+
+    httpd, client = start_server(tau_lmt(path, cache=False))
+    try:
+        before = client.statistics_sample(client.raw_data, '-dy 1')
+        assert client.statistics_sample(client.raw_data, '-dy 1').equals(before)
+        assert client.update_info()['hits'] == 1
+
+        with open(path, 'ab') as f:
+            f.write(tau_lines(date[30*288:], tau[30*288:]))
+        assert client.append() == 10*288
+        assert client.update_info()['cache_entries'] == 0
+
+        after = client.statistics_sample(client.raw_data, '-dy 1')
+        assert len(after.index) > len(before.index)
+        expected = tau_lmt(path, cache=False)
+        assert after.equals(expected.statistics_sample(expected.raw_data, '-dy 1'))
+    finally:
+        stop_server(httpd)
+
+
+def test_stale_results_are_not_cached():
+    cache = result_cache()
+    generation = cache.generation
+    # An append clears the cache while the result is computed
+    cache.clear()
+    cache.put('key', b'result', generation)
+    assert cache.get('key') is None
+
+    cache.put('key', b'result', cache.generation)
+    assert cache.get('key') == b'result'
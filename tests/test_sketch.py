@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+# Quantile sketches: quartiles of statistics_sample with quantiles='sketch'
+# against the exact ones, and sketches of chunks merged against the sketch
+# of the whole series
+
+import numpy as np
+import pytest
+
+from tau_lmt import (tau_lmt, SKETCH_ALPHA, SKETCH_MIN, SKETCH_MAX,
+                     summarize_groups, merge_summaries, time_units)
+from benchmarks.synthetic import write_synthetic_csv
+
+
+QUARTILES = ['tau_25', 'tau_50', 'tau_75']
+
+
+@pytest.fixture(scope='module')
+def tau(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('sketch') / 'tau.csv')
+    write_synthetic_csv(path, int(3*365.25*86400/600), cadence=600, outages=12)
+
+    return tau_lmt(path, cache=False)
+
+
+@pytest.mark.parametrize('group', ['-yr 1', '-mn 1', '-dy 1', '-hr 1'])
+def test_sketch_error(tau, group):
+    exact = tau.statistics_sample(tau.raw_data, group)
+    sketch = tau.statistics_sample(tau.raw_data, group, quantiles='sketch')
+    assert np.array_equal(exact['Date'].values, sketch['Date'].values)
+
+    # The bound holds for the quantiles within the range of the edges
+    exact_q = exact[QUARTILES].values
+    inside = (exact_q >= SKETCH_MIN) & (exact_q <= SKETCH_MAX)
+    assert np.count_nonzero(inside) > 0
+    error = np.abs(sketch[QUARTILES].values - exact_q)[inside]/exact_q[inside]
+    assert np.max(error) <= SKETCH_ALPHA*(1 + 1e-9)
+
+
+@pytest.mark.parametrize('cmd', ['yr', 'dy'])
+def test_merged_chunks(tau, cmd):
+    date = tau.raw_data['Date'].values.astype(np.int64)
+    values = tau.raw_data['Tau'].values
+    valid = ~np.isnan(values)
+    date, values = date[valid], values[valid]
+    bins, n_units = time_units(date, cmd, date[0], date[-1])
+
+    # Chunks that do not follow the groups
+    edges = np.linspace(0, len(date), 8).astype(np.int64)
+    summaries = [summarize_groups(bins[start:end], values[start:end]) for start, end in zip(edges[:-1], edges[1:])]
+    merged = merge_summaries(summaries)
+    whole = summarize_groups(bins, values)
+
+    for name in ['bins', 'buckets', 'counts']:
+        assert np.array_equal(getattr(merged.sketch, name), getattr(whole.sketch, name)), name
+    for name in ['bins', 'count', 'tau_min', 'tau_max']:
+        assert np.array_equal(getattr(merged, name), getattr(whole, name)), name
+    assert np.allclose(merged.sum, whole.sum)
+    assert np.allclose(merged.sumsq, whole.sumsq)
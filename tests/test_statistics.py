@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+# Grouped statistics of statistics_sample against the loop it replaced, and
+# the changes of behaviour documented for -yr and groups of more than one unit
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tau_lmt import tau_lmt, STAT_COLUMNS
+from benchmarks.synthetic import synthetic_model, synthetic_chunk, tau_lines
+
+
+# A sample that starts in the middle of a day, with outages
+START = '2015-01-30T13:17'
+
+
+@pytest.fixture(scope='module')
+def tau(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('statistics') / 'tau.csv')
+    archive = synthetic_model(60*24*75, start=START, cadence=60, seed=3, outages=40)
+    date, tau = synthetic_chunk(archive, 0, archive.n_points)
+    with open(path, 'wb') as f:
+        f.write(tau_lines(date, tau))
+
+    return tau_lmt(path, cache=False)
+
+
+@pytest.fixture(scope='module')
+def years(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('years') / 'tau.csv')
+    archive = synthetic_model(6*24*900, start='2014-09-12T08:00', cadence=600, seed=4, outages=12)
+    date, tau = synthetic_chunk(archive, 0, archive.n_points)
+    with open(path, 'wb') as f:
+        f.write(tau_lines(date, tau))
+
+    return tau_lmt(path, cache=False)
+
+
+def describe_statistics(sample, cmd):
+    """
+        The loop of statistics_sample before the vectorized engine, at one
+        unit per group: every unit from the first date takes the samples of
+        its calendar field, inside a window around the unit, and their
+        describe(). describe() is taken over Tau only, as the old call
+        misaligns with pandas >= 2.
+    """
+    n_points = len(sample.index)
+    init_date = sample['Date'].iloc[0]
+    end_date = sample['Date'].iloc[n_points-1]
+
+    if cmd == 'mn':
+        n_units = (end_date.year - init_date.year)*12 + (end_date.month - init_date.month) + 1
+        units = [(init_date.month - 1 + i) % 12 + 1 for i in range(n_units)]
+        delta = pd.DateOffset(months=1)
+        margin = pd.DateOffset(months=1)
+        field = 'month'
+    elif cmd == 'dy':
+        n_units = (end_date - init_date).days
+        units = [(init_date + pd.Timedelta(days=x)).day for x in range(n_units)]
+        delta = margin = pd.Timedelta(days=1)
+        field = 'day'
+    else:
+        n_units = int(np.ceil((end_date - init_date)/np.timedelta64(1, 'h')))
+        units = [(init_date.hour + i) % 24 for i in range(n_units)]
+        delta = margin = pd.Timedelta(hours=1)
+        field = 'hour'
+
+    def window(date):
+        return sample[(sample['Date'] >= date - margin) & (sample['Date'] <= date + delta + margin)]
+
+    rows = []
+    movil = window(init_date)
+    started = False
+    for i, unit in enumerate(units):
+        values = getattr(pd.DatetimeIndex(movil['Date']), field).values
+        if np.count_nonzero(values == unit) > 0:
+            started = True
+        if not started:
+            continue
+
+        mask = values == unit
+        if np.count_nonzero(mask) > 0:
+            mg = movil[mask][['Tau']].describe().values.flatten()
+            rows.append({'Date': init_date, 'tau_count': mg[0], 'tau_mean': mg[1], 'tau_std': mg[2],
+                         'tau_25': mg[4], 'tau_50': mg[5], 'tau_75': mg[6], 'tau_max': mg[7], 'tau_min': mg[3]})
+        movil = window(init_date)
+        init_date = init_date + delta
+
+    return pd.DataFrame(rows, columns=STAT_COLUMNS)
+
+
+def assert_same_statistics(stats, expected):
+    assert len(stats.index) == len(expected.index)
+    assert np.array_equal(stats['Date'].values, pd.DatetimeIndex(expected['Date']).values)
+    for name in STAT_COLUMNS[1:]:
+        assert np.allclose(stats[name].values, expected[name].values, rtol=1e-12, atol=1e-12, equal_nan=True), name
+
+
+def grouped_statistics(sample, units, n_units, value, labels):
+    """
+        Statistics of groups of value consecutive units with pandas, every
+        group dated by its label. The units out of [0, n_units) are left out
+    """
+    valid = (units >= 0) & (units < n_units)
+    groups = sample['Tau'][valid].groupby(units[valid]//value)
+    stats = groups.describe()
+    return pd.DataFrame({'Date': [labels(k) for k in stats.index], 'tau_count': stats['count'].values,
+                         'tau_mean': stats['mean'].values, 'tau_std': stats['std'].values,
+                         'tau_25': stats['25%'].values, 'tau_50': stats['50%'].values,
+                         'tau_75': stats['75%'].values, 'tau_max': stats['max'].values,
+                         'tau_min': stats['min'].values}, columns=STAT_COLUMNS)
+
+
+@pytest.mark.parametrize('cmd, days', [('mn', 75), ('dy', 75), ('hr', 6)])
+def test_one_unit_as_the_describe_loop(tau, cmd, days):
+    # The hours are checked over a few days, the old loop is slow
+    sample = tau.filter(tau.raw_data, '-t 9')
+    sample = sample[sample['Date'] < sample['Date'].iloc[0] + pd.Timedelta(days=days)]
+    stats = tau.statistics_sample(sample, '-'+cmd+' 1')
+    expected = describe_statistics(sample, cmd)
+
+    # Including the last group
+    assert stats['Date'].iloc[-1] == expected['Date'].iloc[-1]
+    assert_same_statistics(stats, expected)
+
+
+@pytest.mark.parametrize('cmd, value', [('hr', 3), ('dy', 2), ('dy', 7), ('mn', 2)])
+def test_consecutive_groups_of_units(tau, cmd, value):
+    sample = tau.raw_data
+    date = pd.DatetimeIndex(sample['Date'])
+    init, end = date[0], date[-1]
+
+    # Groups of value consecutive calendar units from the first date. The
+    # period has as many days as complete days between the first and last dates
+    if cmd == 'hr':
+        units = ((date.floor('h') - init.floor('h'))//pd.Timedelta(hours=1)).values
+        n_units = int(np.ceil((end - init)/pd.Timedelta(hours=1)))
+        labels = lambda k: init + pd.Timedelta(hours=value*k)
+    elif cmd == 'dy':
+        units = ((date.floor('D') - init.floor('D'))//pd.Timedelta(days=1)).values
+        n_units = (end - init).days
+        labels = lambda k: init + pd.Timedelta(days=value*k)
+    else:
+        units = ((date.year - init.year)*12 + date.month - init.month).values
+        n_units = (end.year - init.year)*12 + end.month - init.month + 1
+        labels = lambda k: init + pd.DateOffset(months=value*k)
+
+    expected = grouped_statistics(sample, units, n_units, value, labels)
+    stats = tau.statistics_sample(sample, '-'+cmd+' '+str(value))
+
+    assert_same_statistics(stats, expected)
+
+
+def test_calendar_years(years):
+    sample = years.raw_data
+    date = pd.DatetimeIndex(sample['Date'])
+    stats = years.statistics_sample(sample, '-yr 1')
+
+    # Calendar years, not the years from the first date: the first group
+    # ends on December 31
+    in_year = (date >= date[0]) & (date < date[0] + pd.DateOffset(years=1))
+    assert stats['tau_count'].iloc[0] != np.count_nonzero(in_year)
+
+    # Complete calendar years, dated from the first date, the last one too
+    calendar = np.unique(date.year)
+    assert len(calendar) == 4
+    assert len(stats.index) == len(calendar)
+    for k, year in enumerate(calendar):
+        values = sample['Tau'].values[date.year == year]
+        assert stats['tau_count'].iloc[k] == len(values)
+        assert np.isclose(stats['tau_mean'].iloc[k], np.mean(values))
+        assert np.isclose(stats['tau_50'].iloc[k], np.median(values))
+        assert stats['Date'].iloc[k] == date[0] + pd.DateOffset(years=k)
+
+
+def test_group_values(tau, capsys):
+    assert tau.statistics_sample(tau.raw_data, '-mn 0') is None
+    capsys.readouterr()
+
+    # The months do not print anything
+    tau.statistics_sample(tau.raw_data, '-mn 1')
+    assert capsys.readouterr().out == ''